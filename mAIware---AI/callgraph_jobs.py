@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""Call graph generation as background jobs keyed by file SHA-256.
+
+Building an angr CFG takes far longer than scoring, so ``predict_single.py
+--async-cfg`` returns the verdict with ``cfg_status: pending`` and leaves the
+image to a job. Job state lives in files next to the outputs in the CFG
+cache, so any process can poll a job another one started::
+
+    python callgraph_jobs.py status <sha256>
+    python callgraph_jobs.py wait <sha256> --timeout 120
+
+Files per job (``<key>`` is the SHA-256):
+
+- ``<key>.callgraph.svg`` / ``.dot``: the finished image, drawn in-process
+  without Graphviz (a ``.png`` from older runs is still preferred)
+- ``<key>.callgraph.json``: nodes and edges for client-side layout
+- ``<key>.callgraph.job``: JSON ``{"pid", "started"}`` while a job runs
+- ``<key>.callgraph.failed``: why the last attempt produced nothing
+- ``<key>.callgraph.log``: stderr of a detached job
+- ``<key>.<mode>.cg.json.gz``: the recovered call graph, reused by any later
+  selection or re-render (see extract_callgraph.CallgraphSnapshot)
+
+The directory is an LRU cache: using a key refreshes its mtime, and
+``prune_cache`` drops keys unused for ``CACHE_MAX_AGE_DAYS`` and then the
+least recently used ones until it fits in ``CACHE_MAX_MB``. Generation
+prunes at most every ``PRUNE_INTERVAL_SECONDS``; to prune by hand::
+
+    python callgraph_jobs.py prune --max-mb 256 --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from callgraph_pool import CallgraphPool
+
+BASE_DIR = Path(__file__).resolve().parent
+CALLGRAPH_SCRIPT = BASE_DIR / "extract_callgraph.py"
+CALLGRAPH_CACHE = BASE_DIR / "tmp_cfg_cache"
+CALLGRAPH_MAX_NODES = 20
+# A 20-node picture only needs the functions around the entry point, not a
+# whole-program CFG (see extract_callgraph.bounded_callgraph).
+CALLGRAPH_BOUNDED = True
+# A job file older than this is treated as abandoned even if its pid is in use.
+JOB_STALE_SECONDS = 3600
+WAIT_POLL_SECONDS = 0.5
+# Eviction policy for CALLGRAPH_CACHE; the environment overrides the defaults.
+CACHE_MAX_MB = float(os.environ.get('CFG_CACHE_MAX_MB', 512))
+CACHE_MAX_AGE_DAYS = float(os.environ.get('CFG_CACHE_MAX_AGE_DAYS', 30))
+PRUNE_INTERVAL_SECONDS = 600
+
+VERBOSE = os.environ.get('VERBOSE_TIMING', '').lower() in ('1', 'true', 'yes')
+IS_WINDOWS = platform.system() == 'Windows'
+
+_CACHE_KEY = re.compile(r'^[0-9a-f]{64}$')
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def log_time(msg: str, start_time: float) -> None:
+    if VERBOSE:
+        elapsed = time.time() - start_time
+        print(f"[TIMING] {msg}: {elapsed:.3f}s", file=sys.stderr)
+
+
+def is_cache_key(value: str) -> bool:
+    return bool(_CACHE_KEY.match(value or ''))
+
+
+def _job_files(cache_key: str, cache_dir: Path = CALLGRAPH_CACHE) -> Dict[str, Path]:
+    prefix = cache_dir / cache_key
+    return {
+        'png': prefix.with_suffix('.callgraph.png'),
+        'svg': prefix.with_suffix('.callgraph.svg'),
+        'graph': prefix.with_suffix('.callgraph.json'),
+        'dot': prefix.with_suffix('.callgraph.dot'),
+        'job': prefix.with_suffix('.callgraph.job'),
+        'failed': prefix.with_suffix('.callgraph.failed'),
+        'log': prefix.with_suffix('.callgraph.log'),
+    }
+
+
+def _subprocess_flags() -> dict:
+    if IS_WINDOWS:
+        # CREATE_NO_WINDOW prevents console window creation issues on Windows
+        return {'creationflags': getattr(subprocess, 'CREATE_NO_WINDOW', 0)}
+    return {}
+
+
+def _generate_on_pool(pool: 'CallgraphPool', file_path: Path, prefix: Path) -> Optional[str]:
+    from callgraph_pool import CallgraphJobError
+
+    try:
+        result = pool.run(str(file_path), str(prefix), max_nodes=CALLGRAPH_MAX_NODES, svg=True,
+                          json_doc=True, no_load_libs=IS_WINDOWS, bounded=CALLGRAPH_BOUNDED,
+                          graph_cache=str(CALLGRAPH_CACHE))
+    except CallgraphJobError as exc:
+        print(f"Warning: Callgraph generation failed: {exc}", file=sys.stderr)
+        return None
+    return result['svg'] or result['dot']
+
+
+def generate_callgraph_image(file_path: Path, cache_key: str,
+                             pool: Optional['CallgraphPool'] = None) -> Optional[str]:
+    """Generate (or reuse cached) call graph image for the binary.
+
+    ``cache_key`` is the SHA-256 of the file contents. With a ``pool`` the
+    graph is built on a warm angr worker instead of a fresh subprocess.
+    """
+    start = time.time()
+    if not CALLGRAPH_SCRIPT.exists():
+        return None
+
+    try:
+        CALLGRAPH_CACHE.mkdir(parents=True, exist_ok=True)
+    except OSError as exc:
+        print(f"Warning: Unable to create CFG cache directory: {exc}", file=sys.stderr)
+        return None
+
+    prefix = CALLGRAPH_CACHE / cache_key
+    files = _job_files(cache_key)
+    cached = [files['png'], files['svg']]
+    # An oversized graph only ever gets a DOT; while a job runs the DOT may
+    # just be ahead of its SVG (as in ``status``).
+    if not _job_running(files['job']):
+        cached.append(files['dot'])
+    for path in cached:
+        if path.exists():
+            _touch(path)
+            log_time("generate_callgraph_image (cached)", start)
+            return str(path)
+
+    maybe_prune()
+
+    if pool is not None:
+        pool_start = time.time()
+        image = _generate_on_pool(pool, file_path, prefix)
+        log_time("generate_callgraph_image (warm worker)", pool_start)
+        return image
+
+    # Pass verbose flag if enabled
+    cmd = [
+        sys.executable,
+        str(CALLGRAPH_SCRIPT),
+        str(file_path),
+        '-o',
+        str(prefix),
+        '--svg',
+        '--json',
+        '--max-nodes',
+        str(CALLGRAPH_MAX_NODES),
+        '--graph-cache',
+        str(CALLGRAPH_CACHE),
+    ]
+    if CALLGRAPH_BOUNDED:
+        cmd.append('--bounded')
+    if VERBOSE:
+        cmd.append('--verbose')
+
+    # On Windows, ensure no-load-libs is used to prevent DLL loading hangs
+    if IS_WINDOWS:
+        cmd.append('--no-load-libs')
+        if VERBOSE:
+            print(f"[TIMING] Adding --no-load-libs for Windows", file=sys.stderr)
+
+    try:
+        subprocess_start = time.time()
+        if VERBOSE:
+            print(f"[TIMING] Starting callgraph subprocess...", file=sys.stderr)
+
+        completed = subprocess.run(
+            cmd,
+            cwd=str(BASE_DIR),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False,
+            **_subprocess_flags(),
+        )
+        log_time("callgraph subprocess execution", subprocess_start)
+    except OSError as exc:
+        print(f"Warning: Failed to execute callgraph helper: {exc}", file=sys.stderr)
+        return None
+
+    # Check if DOT file was generated (the SVG is skipped for oversized graphs)
+    if files['dot'].exists():
+        if files['svg'].exists():
+            log_time("generate_callgraph_image (generated SVG)", start)
+            return str(files['svg'])
+        if VERBOSE or completed.returncode != 0:
+            print("Info: Callgraph DOT generated successfully. SVG not created.", file=sys.stderr)
+        log_time("generate_callgraph_image (generated DOT)", start)
+        return str(files['dot'])
+
+    # Complete failure - no DOT file generated
+    if completed.returncode != 0:
+        msg = completed.stderr.strip() or completed.stdout.strip()
+        if msg and VERBOSE:
+            print(f"Warning: Callgraph generation failed: {msg}", file=sys.stderr)
+
+    return None
+
+
+def _touch(path: Path) -> None:
+    """Mark a cache entry as used; eviction goes by mtime (atime is often off)."""
+    with contextlib.suppress(OSError):
+        os.utime(path)
+
+
+def prune_cache(cache_dir: Path = CALLGRAPH_CACHE, max_mb: float = CACHE_MAX_MB,
+                max_age_days: float = CACHE_MAX_AGE_DAYS, dry_run: bool = False) -> dict:
+    """Evict whole keys: first those unused for ``max_age_days``, then the
+    least recently used until the cache fits in ``max_mb``.
+
+    A key's last use is the newest mtime among its files. Keys with a
+    running job are never evicted. Returns counts of what was (or, with
+    ``dry_run``, would be) removed and kept.
+    """
+    entries: Dict[str, dict] = {}
+    try:
+        listing = list(os.scandir(cache_dir))
+    except OSError:
+        listing = []
+    for entry in listing:
+        key = entry.name.split('.', 1)[0]
+        if not is_cache_key(key) or not entry.is_file():
+            continue
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        group = entries.setdefault(key, {'paths': [], 'bytes': 0, 'used': 0.0})
+        group['paths'].append(Path(entry.path))
+        group['bytes'] += st.st_size
+        group['used'] = max(group['used'], st.st_mtime)
+
+    now = time.time()
+    max_bytes = max_mb * 1024 * 1024
+    total = sum(group['bytes'] for group in entries.values())
+    evict = []
+    for key, group in sorted(entries.items(), key=lambda item: item[1]['used']):
+        expired = now - group['used'] > max_age_days * 86400
+        if not expired and total <= max_bytes:
+            break
+        if _job_running(_job_files(key, cache_dir)['job']):
+            continue
+        evict.append(key)
+        total -= group['bytes']
+
+    if not dry_run:
+        for key in evict:
+            for path in entries[key]['paths']:
+                with contextlib.suppress(OSError):
+                    path.unlink()
+    freed = sum(entries[key]['bytes'] for key in evict)
+    return {'evicted_keys': len(evict), 'freed_bytes': freed,
+            'kept_keys': len(entries) - len(evict), 'kept_bytes': total}
+
+
+def maybe_prune() -> None:
+    """``prune_cache`` unless this process pruned within PRUNE_INTERVAL_SECONDS."""
+    global _last_prune
+    with _prune_lock:
+        if time.time() - _last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        _last_prune = time.time()
+    prune_start = time.time()
+    result = prune_cache()
+    if result['evicted_keys'] and VERBOSE:
+        print(f"[TIMING] Evicted {result['evicted_keys']} call graph cache keys "
+              f"({result['freed_bytes'] / 1e6:.1f} MB)", file=sys.stderr)
+    log_time("prune_cache", prune_start)
+
+
+def _pid_alive(pid: int) -> bool:
+    if IS_WINDOWS:
+        # os.kill(pid, 0) would terminate the process on Windows; rely on the age check.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _job_running(job_path: Path) -> bool:
+    try:
+        with open(job_path, 'r') as fh:
+            job = json.load(fh)
+        if time.time() - float(job['started']) > JOB_STALE_SECONDS:
+            return False
+        return _pid_alive(int(job['pid']))
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError, KeyError, TypeError):
+        # Claimed but not yet written: running unless it has been that way too long.
+        with contextlib.suppress(OSError):
+            return time.time() - job_path.stat().st_mtime < JOB_STALE_SECONDS
+        return False
+
+
+def graph_document_path(cache_key: str, cache_dir: Path = CALLGRAPH_CACHE) -> Optional[str]:
+    """The ``.callgraph.json`` written next to the image, if there is one."""
+    path = _job_files(cache_key, cache_dir)['graph']
+    return str(path) if path.exists() else None
+
+
+def status(cache_key: str, cache_dir: Path = CALLGRAPH_CACHE) -> dict:
+    """Return ``{"cfg_key", "cfg_status"[, "cfg_image" | "cfg_error"]}`` for a job.
+
+    Ready jobs also report ``cfg_graph``, the JSON document, when it exists.
+
+    ``cfg_status`` is ``ready``, ``pending``, ``failed`` or ``missing`` (never
+    submitted, or abandoned by a process that died).
+    """
+    files = _job_files(cache_key, cache_dir)
+    info = {'cfg_key': cache_key}
+    if files['png'].exists():
+        info.update(cfg_status='ready', cfg_image=str(files['png']))
+    elif files['svg'].exists():
+        info.update(cfg_status='ready', cfg_image=str(files['svg']))
+    elif _job_running(files['job']):
+        # extract_callgraph writes the DOT before the JSON and SVG.
+        info['cfg_status'] = 'pending'
+    elif files['dot'].exists():
+        info.update(cfg_status='ready', cfg_image=str(files['dot']))
+    elif files['failed'].exists():
+        info['cfg_status'] = 'failed'
+        with contextlib.suppress(OSError):
+            info['cfg_error'] = files['failed'].read_text(errors='replace').strip()
+    else:
+        info['cfg_status'] = 'missing'
+    if info['cfg_status'] == 'ready' and files['graph'].exists():
+        info['cfg_graph'] = str(files['graph'])
+    return info
+
+
+def wait(cache_key: str, timeout: float | None = None, cache_dir: Path = CALLGRAPH_CACHE) -> dict:
+    """Poll until the job leaves ``pending`` or ``timeout`` seconds pass."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        info = status(cache_key, cache_dir)
+        if info['cfg_status'] != 'pending':
+            return info
+        if deadline is not None and time.monotonic() >= deadline:
+            return info
+        time.sleep(WAIT_POLL_SECONDS)
+
+
+def _claim(job_path: Path) -> bool:
+    """Create the job file exclusively; False if another live job holds it."""
+    for _ in range(2):
+        try:
+            fd = os.open(str(job_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _job_running(job_path):
+                return False
+            with contextlib.suppress(OSError):
+                job_path.unlink()
+            continue
+        os.close(fd)
+        return True
+    return False
+
+
+def _record_job(job_path: Path, pid: int) -> None:
+    tmp_path = job_path.with_name(job_path.name + '.tmp')
+    with open(tmp_path, 'w') as fh:
+        json.dump({'pid': pid, 'started': time.time()}, fh)
+    os.replace(tmp_path, job_path)
+
+
+def run_job(file_path: Path, cache_key: str, pool: Optional['CallgraphPool'] = None) -> dict:
+    """Generate the image now, recording failure, and release the job file."""
+    files = _job_files(cache_key)
+    try:
+        image = generate_callgraph_image(file_path, cache_key, pool)
+        if image is None:
+            files['failed'].write_text('Call graph generation produced no output\n')
+        else:
+            with contextlib.suppress(OSError):
+                files['log'].unlink()
+    except Exception as exc:
+        with contextlib.suppress(OSError):
+            files['failed'].write_text(f'{exc}\n')
+    finally:
+        with contextlib.suppress(OSError):
+            files['job'].unlink()
+    return status(cache_key)
+
+
+class CallgraphQueue:
+    """Runs call graph jobs off the request path.
+
+    In a long-lived process jobs run on ``workers`` background threads, so
+    at most that many angr builds compete with scoring. With ``detached``
+    each job is a separate process that outlives the caller, for one-shot
+    CLI runs that exit right after printing the verdict. Threaded jobs run
+    on ``pool``'s warm angr workers when one is given.
+    """
+
+    def __init__(self, workers: int = 1, detached: bool = False, retry_failed: bool = False,
+                 pool: Optional['CallgraphPool'] = None):
+        self.detached = detached
+        self.retry_failed = retry_failed
+        self.pool = pool
+        self._executor = None if detached else ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix='callgraph')
+        self._lock = threading.Lock()
+
+    def submit(self, file_path: Path, cache_key: str) -> dict:
+        """Start a job unless the image exists or a job is running; return its status."""
+        info = status(cache_key)
+        if info['cfg_status'] in ('ready', 'pending'):
+            return info
+        if info['cfg_status'] == 'failed' and not self.retry_failed:
+            return info
+        if not CALLGRAPH_SCRIPT.exists():
+            return {'cfg_key': cache_key, 'cfg_status': 'unavailable'}
+        try:
+            CALLGRAPH_CACHE.mkdir(parents=True, exist_ok=True)
+        except OSError as exc:
+            return {'cfg_key': cache_key, 'cfg_status': 'failed', 'cfg_error': str(exc)}
+
+        files = _job_files(cache_key)
+        with self._lock:
+            if not _claim(files['job']):
+                return status(cache_key)
+            with contextlib.suppress(OSError):
+                files['failed'].unlink()
+            try:
+                if self.detached:
+                    self._spawn(file_path, cache_key, files)
+                else:
+                    _record_job(files['job'], os.getpid())
+                    self._executor.submit(run_job, file_path, cache_key, self.pool)
+            except Exception as exc:
+                with contextlib.suppress(OSError):
+                    files['job'].unlink()
+                return {'cfg_key': cache_key, 'cfg_status': 'failed', 'cfg_error': str(exc)}
+        return {'cfg_key': cache_key, 'cfg_status': 'pending'}
+
+    def _spawn(self, file_path: Path, cache_key: str, files: Dict[str, Path]) -> None:
+        cmd = [sys.executable, str(Path(__file__).resolve()), 'run', str(file_path), '--key', cache_key]
+        kwargs = _subprocess_flags()
+        if IS_WINDOWS:
+            kwargs['creationflags'] |= getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP', 0)
+        else:
+            kwargs['start_new_session'] = True
+        with open(files['log'], 'w') as log:
+            proc = subprocess.Popen(cmd, cwd=str(BASE_DIR), stdin=subprocess.DEVNULL,
+                                    stdout=log, stderr=subprocess.STDOUT, **kwargs)
+        _record_job(files['job'], proc.pid)
+
+    def shutdown(self, wait_for_jobs: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait_for_jobs)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Inspect or run background call graph jobs.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    status_p = sub.add_parser('status', help='Print a job\'s status as JSON')
+    status_p.add_argument('key', help='SHA-256 of the binary (the cfg_key field)')
+
+    wait_p = sub.add_parser('wait', help='Block until a job finishes, then print its status')
+    wait_p.add_argument('key', help='SHA-256 of the binary (the cfg_key field)')
+    wait_p.add_argument('--timeout', type=float, help='Give up after this many seconds')
+
+    run_p = sub.add_parser('run', help='Generate a call graph now (what a detached job executes)')
+    run_p.add_argument('file', type=Path, help='PE file to analyse')
+    run_p.add_argument('--key', help='SHA-256 of the file (computed when omitted)')
+    run_p.add_argument('--verbose', action='store_true', help='Print per-stage timings to stderr')
+
+    prune_p = sub.add_parser('prune', help='Evict old and least recently used cache entries')
+    prune_p.add_argument('--max-mb', type=float, default=CACHE_MAX_MB,
+                         help=f'Size to shrink the cache to (default: {CACHE_MAX_MB:g})')
+    prune_p.add_argument('--max-age-days', type=float, default=CACHE_MAX_AGE_DAYS,
+                         help=f'Evict entries unused for this long (default: {CACHE_MAX_AGE_DAYS:g})')
+    prune_p.add_argument('--dry-run', action='store_true', help='Report what would be evicted')
+    return parser.parse_args()
+
+
+def main() -> int:
+    global VERBOSE
+    args = parse_args()
+    if args.command == 'prune':
+        print(json.dumps(prune_cache(max_mb=args.max_mb, max_age_days=args.max_age_days,
+                                     dry_run=args.dry_run), indent=2))
+        return 0
+    if args.command == 'run':
+        VERBOSE = VERBOSE or args.verbose
+        key = args.key
+        if key is None:
+            import hashlib
+
+            with open(args.file, 'rb') as fh:
+                key = hashlib.sha256(fh.read()).hexdigest()
+        info = run_job(args.file, key)
+    else:
+        if not is_cache_key(args.key):
+            print(json.dumps({'error': 'Invalid cfg_key'}))
+            return 1
+        info = status(args.key) if args.command == 'status' else wait(args.key, args.timeout)
+    print(json.dumps(info, indent=2))
+    return 0 if info['cfg_status'] in ('ready', 'pending') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
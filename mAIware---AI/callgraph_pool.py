@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Pool of long-lived call graph workers that keep angr imported.
+
+Each uncached call graph used to start ``extract_callgraph.py`` in a fresh
+interpreter and pay the angr import before any analysis. A
+:class:`CallgraphPool` keeps ``workers`` processes with angr already loaded
+and hands them jobs of the form (binary, out_prefix, max_nodes, start).
+
+- every job has a timeout; a worker that overruns it is killed and replaced;
+- on POSIX each worker runs under an address-space ceiling (RLIMIT_AS), so
+  a runaway analysis fails with MemoryError instead of exhausting the host;
+- a worker is recycled after ``max_jobs`` jobs, or after any failed job, to
+  contain angr's memory growth and any state a failure leaves behind.
+
+Quick check from the shell::
+
+    python callgraph_pool.py sample.exe other.exe --workers 2 --timeout 120
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from typing import List, Optional
+
+DEFAULT_JOB_TIMEOUT = 120.0
+DEFAULT_MEMORY_LIMIT_MB = 4096
+DEFAULT_MAX_JOBS = 25
+_STOP = None
+
+
+class CallgraphJobError(RuntimeError):
+    """A pooled call graph job failed, timed out or lost its worker."""
+
+
+def _apply_memory_limit(memory_limit_mb: int) -> None:
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:  # Windows: no rlimits; the timeout still applies
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _worker_main(conn, memory_limit_mb: int, verbose: bool) -> None:
+    """Worker loop: import angr once, then answer jobs until told to stop."""
+    # Progress prints must never reach the parent's stdout (the service
+    # writes JSON responses there).
+    with contextlib.suppress(OSError, ValueError):
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    _apply_memory_limit(memory_limit_mb)
+    import angr  # noqa: F401  (extract_callgraph defers it; warm it before the first job)
+    import extract_callgraph
+
+    extract_callgraph.VERBOSE = verbose
+    conn.send({'ready': True})
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is _STOP:
+            return
+        start = time.time()
+        try:
+            result = extract_callgraph.extract(**job)
+            reply = {'ok': True, 'result': result}
+        except MemoryError:
+            reply = {'ok': False, 'error': f'Memory limit of {memory_limit_mb} MB exceeded'}
+        except Exception as exc:
+            reply = {'ok': False, 'error': f'{type(exc).__name__}: {exc}'}
+        reply['seconds'] = time.time() - start
+        try:
+            conn.send(reply)
+        except (BrokenPipeError, EOFError):
+            return
+
+
+class _Worker:
+    def __init__(self, ctx, memory_limit_mb: int, verbose: bool):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_limit_mb, verbose),
+                                   name='callgraph-worker', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = bool(self.conn.recv().get('ready'))  # EOFError: died while starting
+        return self.ready
+
+    def stop(self) -> None:
+        with contextlib.suppress(OSError, BrokenPipeError):
+            self.conn.send(_STOP)
+        self.process.join(timeout=5)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        with contextlib.suppress(OSError):
+            self.conn.close()
+
+
+class CallgraphPool:
+    """Long-lived angr worker processes with per-job timeout and recycling.
+
+    Thread-safe: ``run`` blocks until a worker is free. Workers start on the
+    first ``start``/``run`` in the owning process, so a pool created before
+    ``os.fork`` is rebuilt in each child rather than shared.
+    """
+
+    def __init__(self, workers: int = 1, job_timeout: float = DEFAULT_JOB_TIMEOUT,
+                 memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB, max_jobs: int = DEFAULT_MAX_JOBS,
+                 verbose: bool = False):
+        self.workers = max(1, workers)
+        self.job_timeout = job_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs = max(1, max_jobs)
+        self.verbose = verbose
+        # spawn, not fork: the parent may hold models and threads.
+        self._ctx = mp.get_context('spawn')
+        self._lock = threading.Lock()
+        self._owner_pid: Optional[int] = None
+        self._idle: 'queue.Queue[_Worker]' = queue.Queue()
+        self._all: List[_Worker] = []
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.memory_limit_mb, self.verbose)
+        with self._lock:
+            self._all.append(worker)
+        return worker
+
+    def _retire(self, worker: _Worker, kill: bool = False) -> None:
+        worker.kill() if kill else worker.stop()
+        with self._lock:
+            if worker in self._all:
+                self._all.remove(worker)
+        self._idle.put(self._spawn())
+
+    def start(self) -> 'CallgraphPool':
+        """Start the workers now so the first job does not pay the angr import."""
+        with self._lock:
+            if self._owner_pid == os.getpid():
+                return self
+            # Inherited across fork: the parent's workers and pipes are not ours.
+            self._owner_pid = os.getpid()
+            self._idle = queue.Queue()
+            self._all = []
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+        return self
+
+    def run(self, binary: str, out_prefix: str, max_nodes: int = 15, start: str = '',
+            render: bool = False, no_load_libs: bool = False, bounded: bool = False,
+            graph_cache: str | None = None, json_doc: bool = False, svg: bool = False,
+            timeout: float | None = None) -> dict:
+        """Run ``extract_callgraph.extract`` on a warm worker; raise CallgraphJobError on failure."""
+        self.start()
+        timeout = self.job_timeout if timeout is None else timeout
+        job = {'binary': binary, 'out_prefix': out_prefix, 'max_nodes': max_nodes, 'start': start,
+               'render': render, 'no_load_libs': no_load_libs, 'bounded': bounded,
+               'graph_cache': graph_cache, 'json_doc': json_doc, 'svg': svg}
+        worker = self._idle.get()
+        deadline = time.monotonic() + timeout
+        try:
+            # A fresh worker may still be importing angr; that counts against the job.
+            if not worker.wait_ready(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError
+            worker.conn.send(job)
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError
+            reply = worker.conn.recv()
+        except TimeoutError:
+            self._retire(worker, kill=True)
+            raise CallgraphJobError(f'Call graph job timed out after {timeout:.0f}s: {binary}')
+        except (EOFError, OSError, BrokenPipeError):
+            worker.process.join(timeout=1)
+            code = worker.process.exitcode
+            self._retire(worker, kill=True)
+            raise CallgraphJobError(f'Call graph worker died (exit code {code}): {binary}')
+
+        worker.jobs_done += 1
+        if not reply['ok'] or worker.jobs_done >= self.max_jobs:
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+        if not reply['ok']:
+            raise CallgraphJobError(reply['error'])
+        return reply['result']
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._all = self._all, []
+            owned = self._owner_pid == os.getpid()
+            self._owner_pid = None
+        if owned:
+            for worker in workers:
+                worker.stop()
+
+    def __enter__(self) -> 'CallgraphPool':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Extract call graphs on a pool of warm angr workers.')
+    parser.add_argument('binaries', nargs='+', help='PE/ELF binaries to process')
+    parser.add_argument('-o', '--out-dir', default='.', help='Directory for <name>.callgraph.dot outputs')
+    parser.add_argument('--max-nodes', type=int, default=15, help='Maximum number of callgraph nodes to keep')
+    parser.add_argument('--start', default='', help='Start function (name substring or address)')
+    parser.add_argument('--render', action='store_true', help='Render PNG with graphviz')
+    parser.add_argument('--json', action='store_true', help='Also write <name>.callgraph.json')
+    parser.add_argument('--svg', action='store_true', help='Also draw <name>.callgraph.svg without Graphviz')
+    parser.add_argument('--bounded', action='store_true',
+                        help='Recover only the functions near the start (no full CFG)')
+    parser.add_argument('--graph-cache', metavar='DIR',
+                        help='Keep recovered call graphs in DIR and reuse them for later selections')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes (default: 1)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_JOB_TIMEOUT, help='Seconds allowed per job')
+    parser.add_argument('--memory-limit-mb', type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help='Address-space ceiling per worker in MB (0 = none; POSIX only)')
+    parser.add_argument('--max-jobs', type=int, default=DEFAULT_MAX_JOBS,
+                        help='Jobs a worker runs before it is replaced')
+    parser.add_argument('--verbose', action='store_true', help='Enable verbose timing output')
+    return parser.parse_args()
+
+
+def main() -> int:
+    from concurrent.futures import ThreadPoolExecutor
+
+    args = parse_args()
+    os.makedirs(args.out_dir, exist_ok=True)
+    failures = 0
+    with CallgraphPool(args.workers, args.timeout, args.memory_limit_mb, args.max_jobs, args.verbose) as pool:
+        def one(binary: str):
+            prefix = os.path.join(args.out_dir, os.path.splitext(os.path.basename(binary))[0])
+            started = time.time()
+            try:
+                return binary, pool.run(binary, prefix, args.max_nodes, args.start, args.render,
+                                          bounded=args.bounded, graph_cache=args.graph_cache,
+                                          json_doc=args.json, svg=args.svg), \
+                    time.time() - started
+            except CallgraphJobError as exc:
+                return binary, exc, time.time() - started
+
+        with ThreadPoolExecutor(max_workers=pool.workers) as executor:
+            for binary, outcome, seconds in executor.map(one, args.binaries):
+                if isinstance(outcome, CallgraphJobError):
+                    failures += 1
+                    print(f'[!] {binary}: {outcome} ({seconds:.1f}s)')
+                else:
+                    print(f"[+] {binary}: {outcome['nodes']} nodes -> {outcome['dot']} ({seconds:.1f}s)")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
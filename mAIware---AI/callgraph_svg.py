@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Render a small call graph document to SVG without Graphviz.
+
+Lays out the JSON document written by ``extract_callgraph.py --json``
+(see ``extract_callgraph.graph_document``) in layers by call depth from the
+entry node, orders each layer by the barycenter of its callers, and draws
+straight edges between node boxes. The colours follow ``write_dot``'s
+theme. Meant for the few dozen nodes a readable picture holds; larger
+graphs are refused rather than drawn as a hairball::
+
+    python callgraph_svg.py out.callgraph.json -o out.callgraph.svg
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+from collections import deque
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+SVG_MAX_NODES = 60
+
+_CHAR_WIDTH = 6.8  # 11px monospace
+_LINE_HEIGHT = 15
+_NODE_HEIGHT = 42
+_PAD_X = 12
+_GAP_X = 28
+_GAP_Y = 70
+_MARGIN = 24
+_BARYCENTER_SWEEPS = 4
+# Wider layers wrap onto extra rows so a big fan-out stays on screen.
+_MAX_ROW_NODES = 8
+
+# kind -> (fill top, fill bottom, stroke, font colour), as in write_dot.
+_NODE_COLORS = {
+    'entry': ('#14919b', '#0d7377', '#2ec4b6', '#ffffff'),
+    'suspicious': ('#780000', '#c1121f', '#ff006e', '#ffffff'),
+    'unknown': ('#1e2749', '#1e2749', '#4361ee', '#e0e0e0'),
+    'standard': ('#264653', '#1a535c', '#4ecdc4', '#e0e0e0'),
+    'unnamed': ('#1a1f3a', '#1a1f3a', '#3d5a80', '#e0e0e0'),
+}
+_BACKGROUND = '#0a0e27'
+_EDGE_COLOR = '#4a9eff'
+
+
+def _labels(node: dict) -> List[str]:
+    return [node['id']] if node.get('name') is None else [node['name'], node['id']]
+
+
+def _layers(ids: List[str], edges: List[Tuple[str, str]], entry: str | None) -> Dict[str, int]:
+    """Call depth of every node: BFS from the entry and from nodes nobody calls.
+
+    Nodes only reachable against the edges (callers of the entry) take the
+    layer above their shallowest callee.
+    """
+    succ: Dict[str, List[str]] = {n: [] for n in ids}
+    pred: Dict[str, List[str]] = {n: [] for n in ids}
+    for src, dst in edges:
+        if src != dst:
+            succ[src].append(dst)
+            pred[dst].append(src)
+    roots = [entry] if entry in succ else []
+    roots += [n for n in ids if not pred[n] and n not in roots]
+    depth: Dict[str, int] = {}
+    queue = deque()
+    for root in roots:
+        if root not in depth:
+            depth[root] = 0
+            queue.append(root)
+        while queue:
+            node = queue.popleft()
+            for callee in succ[node]:
+                if callee not in depth:
+                    depth[callee] = depth[node] + 1
+                    queue.append(callee)
+    pending = [n for n in ids if n not in depth]
+    while pending:
+        placed = False
+        for node in pending:
+            known = [depth[c] for c in succ[node] if c in depth]
+            if known:
+                depth[node] = min(known) - 1
+                placed = True
+            elif any(c in depth for c in pred[node]):
+                depth[node] = min(depth[c] for c in pred[node] if c in depth) + 1
+                placed = True
+        if not placed:
+            depth[pending[0]] = 0  # a cycle cut off from everything else
+        pending = [n for n in pending if n not in depth]
+    low = min(depth.values())
+    return {n: d - low for n, d in depth.items()}
+
+
+def layout(document: dict) -> Tuple[Dict[str, Tuple[float, float, float]], float, float]:
+    """Return ``({id: (centre_x, centre_y, width)}, canvas_width, canvas_height)``."""
+    nodes = document['nodes']
+    ids = [n['id'] for n in nodes]
+    edges = [(e['from'], e['to']) for e in document['edges']]
+    depth = _layers(ids, edges, document.get('entry'))
+    widths = {n['id']: max(len(line) for line in _labels(n)) * _CHAR_WIDTH + 2 * _PAD_X for n in nodes}
+
+    rows: List[List[str]] = [[] for _ in range(max(depth.values()) + 1)]
+    for node in ids:
+        rows[depth[node]].append(node)
+    neighbours: Dict[str, List[str]] = {n: [] for n in ids}
+    for src, dst in edges:
+        if src != dst:
+            neighbours[src].append(dst)
+            neighbours[dst].append(src)
+    # Alternate downward and upward sweeps, ordering each row by the mean
+    # position of its neighbours in the row just fixed.
+    for sweep in range(_BARYCENTER_SWEEPS):
+        order = range(1, len(rows)) if sweep % 2 == 0 else range(len(rows) - 2, -1, -1)
+        for r in order:
+            ref = rows[r - 1] if sweep % 2 == 0 else rows[r + 1]
+            index = {n: i for i, n in enumerate(ref)}
+            def barycenter(node: str, pos: int) -> float:
+                linked = [index[m] for m in neighbours[node] if m in index]
+                return sum(linked) / len(linked) if linked else pos
+            rows[r] = [n for _, n in sorted((barycenter(n, i), n) for i, n in enumerate(rows[r]))]
+    rows = [row[i:i + _MAX_ROW_NODES] for row in rows for i in range(0, len(row), _MAX_ROW_NODES)]
+
+    row_widths = [sum(widths[n] for n in row) + _GAP_X * (len(row) - 1) for row in rows]
+    canvas_w = max(row_widths) + 2 * _MARGIN
+    canvas_h = len(rows) * _NODE_HEIGHT + (len(rows) - 1) * _GAP_Y + 2 * _MARGIN
+    placed: Dict[str, Tuple[float, float, float]] = {}
+    for r, row in enumerate(rows):
+        x = (canvas_w - row_widths[r]) / 2
+        y = _MARGIN + r * (_NODE_HEIGHT + _GAP_Y) + _NODE_HEIGHT / 2
+        for node in row:
+            placed[node] = (x + widths[node] / 2, y, widths[node])
+            x += widths[node] + _GAP_X
+    return placed, canvas_w, canvas_h
+
+
+def _border_point(box: Tuple[float, float, float], tx: float, ty: float) -> Tuple[float, float]:
+    """Where the line from the box centre towards (tx, ty) leaves the box."""
+    cx, cy, w = box
+    dx, dy = tx - cx, ty - cy
+    if dx == 0 and dy == 0:
+        return cx, cy
+    scale = min(w / 2 / abs(dx) if dx else math.inf, _NODE_HEIGHT / 2 / abs(dy) if dy else math.inf)
+    return cx + dx * scale, cy + dy * scale
+
+
+def render_svg(document: dict) -> str:
+    """SVG markup for a graph document; ValueError above SVG_MAX_NODES nodes."""
+    if len(document['nodes']) > SVG_MAX_NODES:
+        raise ValueError(f"{len(document['nodes'])} nodes is too many for the SVG renderer "
+                         f"(max {SVG_MAX_NODES})")
+    if not document['nodes']:
+        raise ValueError('Graph document has no nodes')
+    placed, width, height = layout(document)
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'viewBox="0 0 {width:.0f} {height:.0f}" font-family="Fira Code,Consolas,monospace" font-size="11">',
+        '<defs>',
+        f'<marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="7" markerHeight="7" '
+        f'orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10 z" fill="{_EDGE_COLOR}"/></marker>',
+    ]
+    for kind, (top, bottom, _, _) in _NODE_COLORS.items():
+        out.append(f'<linearGradient id="fill-{kind}" x1="0" y1="0" x2="0" y2="1">'
+                   f'<stop offset="0" stop-color="{top}"/><stop offset="1" stop-color="{bottom}"/></linearGradient>')
+    out.append('</defs>')
+    out.append(f'<rect width="100%" height="100%" fill="{_BACKGROUND}"/>')
+
+    out.append(f'<g stroke="{_EDGE_COLOR}" stroke-opacity="0.55" stroke-width="2" fill="none">')
+    for edge in document['edges']:
+        src, dst = placed[edge['from']], placed[edge['to']]
+        if edge['from'] == edge['to']:
+            x, y = src[0] + src[2] / 2, src[1]
+            out.append(f'<path d="M{x:.1f},{y - 8:.1f} C{x + 30:.1f},{y - 24:.1f} {x + 30:.1f},{y + 24:.1f} '
+                       f'{x:.1f},{y + 8:.1f}" marker-end="url(#arrow)"/>')
+            continue
+        x1, y1 = _border_point(src, dst[0], dst[1])
+        x2, y2 = _border_point(dst, src[0], src[1])
+        out.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" marker-end="url(#arrow)"/>')
+    out.append('</g>')
+
+    for node in document['nodes']:
+        cx, cy, w = placed[node['id']]
+        kind = node.get('kind') if node.get('kind') in _NODE_COLORS else 'unnamed'
+        _, _, stroke, font = _NODE_COLORS[kind]
+        lines = _labels(node)
+        out.append(f'<g><title>{escape(" ".join(lines))}</title>'
+                   f'<rect x="{cx - w / 2:.1f}" y="{cy - _NODE_HEIGHT / 2:.1f}" width="{w:.1f}" '
+                   f'height="{_NODE_HEIGHT}" rx="8" fill="url(#fill-{kind})" '
+                   f'stroke="{stroke}" stroke-width="2"/>')
+        first = cy - (len(lines) - 1) * _LINE_HEIGHT / 2
+        for i, line in enumerate(lines):
+            out.append(f'<text x="{cx:.1f}" y="{first + i * _LINE_HEIGHT:.1f}" fill="{font}" '
+                       f'text-anchor="middle" dominant-baseline="central">{escape(line)}</text>')
+        out.append('</g>')
+    out.append('</svg>')
+    return '\n'.join(out) + '\n'
+
+
+def write_svg(document: dict, path: str) -> None:
+    markup = render_svg(document)
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write(markup)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Render a call graph JSON document to SVG.')
+    parser.add_argument('document', help='<prefix>.callgraph.json from extract_callgraph.py --json')
+    parser.add_argument('-o', '--output', help='SVG path (default: next to the document)')
+    args = parser.parse_args()
+    with open(args.document, 'r', encoding='utf-8') as fh:
+        document = json.load(fh)
+    output = args.output or (args.document[:-len('.json')] if args.document.endswith('.json')
+                             else args.document) + '.svg'
+    try:
+        write_svg(document, output)
+    except ValueError as exc:
+        print(f'[!] {exc}')
+        return 1
+    print(f'[+] SVG written to {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Compare the exact RBF SVC with its kernel-approximated variants.
+
+Reports test-split accuracy/ROC AUC, fit time and scoring latency (one row
+and the whole test split) for each candidate::
+
+    python -m ensemble_pipeline.benchmark_rbf_svm --n-components 128 256 512
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from sklearn.base import clone
+
+from ensemble_pipeline.common import (ROOT, compute_metrics, load_dataset,
+                                      predict_with_scores)
+from ensemble_pipeline.pipelines.rbf_svm import (DEFAULT_COMPONENTS, KERNEL_MAPS,
+                                                 build_approx_estimator,
+                                                 build_estimator)
+
+
+def _best_time(fn, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(name: str, estimator: object, dataset, repeats: int) -> Dict[str, object]:
+    X_train, y_train, X_test, y_test, _ = dataset
+    model = clone(estimator)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    labels, scores = predict_with_scores(model, X_test)
+    result: Dict[str, object] = {'model': name, **compute_metrics(y_test, labels, scores)}
+    result['fit_seconds'] = fit_seconds
+    result['single_row_ms'] = 1000 * _best_time(lambda: predict_with_scores(model, X_test[:1]), repeats)
+    result['test_split_ms'] = 1000 * _best_time(lambda: predict_with_scores(model, X_test), repeats)
+    result['rows'] = int(len(X_test))
+    svc = model.steps[-1][1]
+    if hasattr(svc, 'n_support_'):
+        result['support_vectors'] = int(svc.n_support_.sum())
+    return result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark the exact and approximated RBF SVM.')
+    parser.add_argument('--results-dir', type=Path, default=ROOT / 'ensemble_results', help='Directory for per-model outputs')
+    parser.add_argument('--n-components', type=int, nargs='+', default=[DEFAULT_COMPONENTS],
+                        help='Feature-map sizes to try for each approximation')
+    parser.add_argument('--repeats', type=int, default=20, help='Timing repetitions (best is reported)')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    dataset = load_dataset()
+    candidates = [('svc', build_estimator())]
+    for kernel_map in KERNEL_MAPS:
+        for n_components in args.n_components:
+            candidates.append((f'{kernel_map}-{n_components}', build_approx_estimator(kernel_map, n_components)))
+
+    results: List[Dict[str, object]] = []
+    for name, estimator in candidates:
+        print(f'[+] Benchmarking {name}')
+        results.append(benchmark(name, estimator, dataset, args.repeats))
+
+    out_path = args.results_dir / 'rbf_svm_benchmark.json'
+    with open(out_path, 'w') as fh:
+        json.dump(results, fh, indent=2)
+
+    print(f"{'model':<16}{'accuracy':>10}{'roc_auc':>10}{'fit s':>10}{'1-row ms':>10}{'batch ms':>10}")
+    for r in results:
+        auc = r['roc_auc'] if r['roc_auc'] is not None else np.nan
+        print(f"{r['model']:<16}{r['accuracy']:>10.4f}{auc:>10.4f}{r['fit_seconds']:>10.3f}"
+              f"{r['single_row_ms']:>10.3f}{r['test_split_ms']:>10.3f}")
+    print(f'[+] Wrote {out_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 from pathlib import Path
 from typing import Dict, List, Sequence, Tuple
 
@@ -15,6 +16,7 @@ from sklearn.metrics import (accuracy_score, f1_score, precision_score,
                              recall_score, roc_auc_score)
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
 
 ROOT = Path(__file__).resolve().parent.parent
 MODEL_COLUMNS_PATH = ROOT / 'model_columns.json'
@@ -22,6 +24,11 @@ TRAIN_FILES = [ROOT / 'benign_train_no_meta.csv', ROOT / 'malware_train_no_meta.
 TEST_FILES = [ROOT / 'benign_test_no_meta.csv', ROOT / 'malware_test_no_meta.csv']
 RANDOM_STATE = 42
 N_JOBS = -1
+# Parsed training data, rebuilt when a CSV or model_columns.json changes.
+DATASET_CACHE_DIR = ROOT / 'dataset_cache'
+DATASET_CACHE_VERSION = 1
+# Candidate storage types for integral columns, smallest first.
+_INT_DTYPES = (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32)
 
 
 Dataset = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[str]]
@@ -55,7 +62,7 @@ def _prepare_df(df: pd.DataFrame) -> pd.DataFrame:
     return df.fillna(0)
 
 
-def load_dataset() -> Dataset:
+def _load_dataset_csv() -> Dataset:
     train_parts = []
     for path in TRAIN_FILES:
         if not path.exists():
@@ -81,6 +88,135 @@ def load_dataset() -> Dataset:
     return X_train, y_train, X_test, y_test, feature_columns
 
 
+def _source_stamps() -> Dict[str, List[int] | None]:
+    stamps: Dict[str, List[int] | None] = {}
+    for path in [*TRAIN_FILES, *TEST_FILES, MODEL_COLUMNS_PATH]:
+        try:
+            stat = path.stat()
+            stamps[path.name] = [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            stamps[path.name] = None
+    return stamps
+
+
+def _compact_dtype(values: np.ndarray) -> np.dtype:
+    """Smallest dtype that stores every value of a column exactly."""
+    if values.size == 0:
+        return np.dtype(np.uint8)
+    if np.issubdtype(values.dtype, np.integer) or (
+            np.all(np.isfinite(values)) and np.all(values == np.trunc(values))
+            and not np.any(np.signbit(values[values == 0]))):
+        low, high = values.min(), values.max()
+        for dtype in _INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return np.dtype(dtype)
+    if np.issubdtype(values.dtype, np.floating):
+        narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed.astype(values.dtype), values, equal_nan=True):
+            return np.dtype(np.float32)
+    return values.dtype
+
+
+def _cache_path(cache_dir: Path, split: str, dtype: str) -> Path:
+    return cache_dir / f'X_{split}.{dtype}.npy'
+
+
+def _save_npy_atomic(path: Path, array: np.ndarray) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as fh:
+        np.save(fh, array, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def _save_dataset_cache(dataset: Dataset, cache_dir: Path) -> None:
+    """Store each split column-grouped by compact dtype; meta.json is written last."""
+    X_train, y_train, X_test, y_test, feature_columns = dataset
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    both = np.vstack([X_train, X_test]) if len(X_test) else X_train
+    column_dtypes = [_compact_dtype(both[:, i]).name for i in range(both.shape[1])]
+    groups: Dict[str, List[int]] = {}
+    for i, dtype in enumerate(column_dtypes):
+        groups.setdefault(dtype, []).append(i)
+    for split, X in (('train', X_train), ('test', X_test)):
+        for dtype, columns in groups.items():
+            _save_npy_atomic(_cache_path(cache_dir, split, dtype),
+                             np.ascontiguousarray(X[:, columns], dtype=dtype))
+    current = {_cache_path(cache_dir, split, dtype).name for split in ('train', 'test') for dtype in groups}
+    for stale in cache_dir.glob('X_*.npy'):
+        if stale.name not in current:
+            stale.unlink()
+    labels = np.concatenate([y_train, y_test])
+    label_dtype = _compact_dtype(labels)
+    _save_npy_atomic(cache_dir / 'y_train.npy', y_train.astype(label_dtype))
+    _save_npy_atomic(cache_dir / 'y_test.npy', y_test.astype(label_dtype))
+    meta = {
+        'version': DATASET_CACHE_VERSION,
+        'sources': _source_stamps(),
+        'feature_columns': feature_columns,
+        'X_dtype': X_train.dtype.name,
+        # pandas hands back column-major X; estimators reduce in memory order,
+        # so keep the layout to reproduce their floating-point results.
+        'X_order': 'F' if X_train.flags.f_contiguous and not X_train.flags.c_contiguous else 'C',
+        'y_dtype': y_train.dtype.name,
+        'groups': groups,
+    }
+    tmp_path = cache_dir / 'meta.json.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(meta, fh)
+    os.replace(tmp_path, cache_dir / 'meta.json')
+
+
+def _load_dataset_cache(cache_dir: Path) -> Dataset | None:
+    try:
+        with open(cache_dir / 'meta.json', 'r') as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != DATASET_CACHE_VERSION or meta.get('sources') != _source_stamps():
+        return None
+    n_columns = len(meta['feature_columns'])
+    try:
+        splits = []
+        for split in ('train', 'test'):
+            X = None
+            for dtype, columns in meta['groups'].items():
+                block = np.load(_cache_path(cache_dir, split, dtype), mmap_mode='r')
+                if X is None:
+                    X = np.empty((block.shape[0], n_columns), dtype=meta['X_dtype'], order=meta['X_order'])
+                X[:, columns] = block
+            y = np.load(cache_dir / f'y_{split}.npy').astype(meta['y_dtype'])
+            if X is None:
+                X = np.empty((len(y), 0), dtype=meta['X_dtype'])
+            splits.append((X, y))
+    except (OSError, ValueError):
+        return None
+    (X_train, y_train), (X_test, y_test) = splits
+    return X_train, y_train, X_test, y_test, meta['feature_columns']
+
+
+def load_dataset(use_cache: bool = True, cache_dir: Path = DATASET_CACHE_DIR) -> Dataset:
+    """Return ``(X_train, y_train, X_test, y_test, feature_columns)``.
+
+    The first call parses the CSVs and stores every feature column in the
+    smallest dtype that holds it exactly (see ``_compact_dtype``); later
+    calls rebuild the same arrays, values and memory layout alike, from
+    those memory-mapped ``.npy`` files until a CSV or model_columns.json
+    changes.
+    """
+    if use_cache:
+        cached = _load_dataset_cache(cache_dir)
+        if cached is not None:
+            return cached
+    dataset = _load_dataset_csv()
+    if use_cache:
+        try:
+            _save_dataset_cache(dataset, cache_dir)
+        except OSError as exc:
+            print(f'[!] Warning: could not write dataset cache {cache_dir}: {exc}')
+    return dataset
+
+
 def _determine_feature_columns(train_df: pd.DataFrame) -> List[str]:
     """Return the ordered feature column list used for training/inference."""
     default_columns = [c for c in train_df.columns if c != 'label']
@@ -129,6 +265,75 @@ def extract_scores(model: BaseEstimator, X: np.ndarray) -> np.ndarray | None:
     return None
 
 
+def _final_estimator(model: BaseEstimator) -> BaseEstimator:
+    return model.steps[-1][1] if isinstance(model, Pipeline) else model
+
+
+def _argmax_labels(model: BaseEstimator, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    proba = model.predict_proba(X)
+    return model.classes_.take(np.argmax(proba, axis=1), axis=0), proba[:, 1]
+
+
+def _above_half_labels(model: BaseEstimator, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    proba = model.predict_proba(X)
+    return model.classes_.take((proba[:, 1] > 0.5).astype(int), axis=0), proba[:, 1]
+
+
+def _adaboost_labels(model: BaseEstimator, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # predict() and predict_proba() each sum every stage's decision; do it once.
+    decision = model.decision_function(X)
+    proba = type(model)._compute_proba_from_decision(decision, model.n_classes_)
+    return model.classes_.take(decision > 0, axis=0), proba[:, 1]
+
+
+# Estimators whose predict() and predict_proba() derive from one shared
+# computation by exactly these rules, so a single pass yields the label and
+# the score. Keyed by class name so lightgbm/xgboost need not be importable.
+_FUSED_SCORERS = {
+    'DecisionTreeClassifier': _argmax_labels,
+    'RandomForestClassifier': _argmax_labels,
+    'ExtraTreesClassifier': _argmax_labels,
+    'KNeighborsClassifier': _argmax_labels,
+    'CompactKNNClassifier': _argmax_labels,
+    'LGBMClassifier': _argmax_labels,
+    'XGBClassifier': _above_half_labels,
+    'AdaBoostClassifier': _adaboost_labels,
+}
+
+
+def predict_with_scores(model: BaseEstimator, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray | None]:
+    """Return ``(model.predict(X), extract_scores(model, X))``, in one pass where possible.
+
+    Binary tree ensembles, KNN and the boosted models share a single
+    inference pass between label and score; other models make both calls.
+    Models providing their own ``predict_with_scores`` (such as compiled
+    trees from tree_engine.py) are used as is.
+    """
+    if hasattr(model, 'predict_with_scores'):
+        return model.predict_with_scores(X)
+    fused = _FUSED_SCORERS.get(type(_final_estimator(model)).__name__)
+    if fused is not None and len(model.classes_) == 2:
+        return fused(model, X)
+    return model.predict(X), extract_scores(model, X)
+
+
+def apply_cpu_budget(models: Dict[str, BaseEstimator], threads_per_model: int) -> None:
+    """Cap the threads each model may use while scoring.
+
+    Sets ``n_jobs`` on every estimator that has it (forests, KNN, LightGBM,
+    XGBoost) and limits BLAS/OpenMP pools process-wide, so that running
+    several models at once stays within the budget instead of oversubscribing.
+    """
+    for model in models.values():
+        # Compiled trees run single-threaded; their sklearn fallback does not.
+        estimator = _final_estimator(getattr(model, 'fallback', model))
+        if estimator is None:
+            continue
+        if 'n_jobs' in estimator.get_params(deep=False):
+            estimator.set_params(n_jobs=threads_per_model)
+    threadpool_limits(limits=threads_per_model)
+
+
 def compute_metrics(y_true: np.ndarray, y_pred: np.ndarray, scores: np.ndarray | None) -> Dict[str, float | None]:
     metrics: Dict[str, float | None] = {
         'accuracy': float(accuracy_score(y_true, y_pred)),
@@ -167,6 +372,8 @@ def run_model_pipeline(
         print(f'[+] Training model {model_name}')
         model = clone(estimator)
         model.fit(X_train, y_train)
+        # Keep the dump uncompressed: compressed files cannot be memory-mapped
+        # by load_models(mmap_mode=...) at scoring time.
         joblib.dump(model, model_path)
         print(f'    Saved to {model_path}')
 
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Compact k-nearest-neighbours classifier with an inverted-file (IVF) index.
+
+Drop-in replacement for the KNeighborsClassifier step of the knn pipeline:
+- the reference set is stored as float32, half the size of sklearn's copy;
+- a k-means coarse quantizer splits it into ``n_lists`` cells stored
+  contiguously, and a query only scans the ``n_probe`` nearest cells;
+- optionally the reference set is condensed to per-class k-means prototypes,
+  using the fewest prototypes whose validation accuracy stays within
+  ``accuracy_budget`` of the full reference set.
+"""
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.cluster import KMeans
+from sklearn.model_selection import train_test_split
+from sklearn.utils.validation import check_is_fitted
+
+PROTOTYPE_FRACTIONS = (0.05, 0.1, 0.2, 0.35, 0.5, 0.75)
+_QUERY_CHUNK = 256
+
+
+def _kmeans(X: np.ndarray, n_clusters: int, random_state: int) -> KMeans:
+    return KMeans(n_clusters=n_clusters, n_init=1, random_state=random_state).fit(X)
+
+
+class CompactKNNClassifier(ClassifierMixin, BaseEstimator):
+    """KNN over a float32, IVF-indexed (and optionally condensed) reference set.
+
+    With ``n_probe >= n_lists`` and no condensing the neighbours are exact
+    and only float32 rounding separates the scores from sklearn's.
+    """
+
+    def __init__(self, n_neighbors: int = 5, weights: str = 'distance', n_lists: int | None = None,
+                 n_probe: int = 4, condense: bool = False, accuracy_budget: float = 0.01,
+                 random_state: int | None = None):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.condense = condense
+        self.accuracy_budget = accuracy_budget
+        self.random_state = random_state
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> 'CompactKNNClassifier':
+        X = np.asarray(X, dtype=np.float64)
+        self.classes_, y_idx = np.unique(y, return_inverse=True)
+        self.n_features_in_ = X.shape[1]
+        self.prototype_fraction_ = 1.0
+        if self.condense:
+            self.prototype_fraction_ = self._choose_fraction(X, y_idx)
+            X, y_idx = self._prototypes(X, y_idx, self.prototype_fraction_)
+        self._build_index(X, y_idx)
+        return self
+
+    def _prototypes(self, X: np.ndarray, y_idx: np.ndarray, fraction: float) -> Tuple[np.ndarray, np.ndarray]:
+        if fraction >= 1.0:
+            return X, y_idx
+        points, labels = [], []
+        for cls in np.unique(y_idx):
+            members = X[y_idx == cls]
+            n_proto = max(self.n_neighbors, int(round(len(members) * fraction)))
+            if n_proto >= len(members):
+                points.append(members)
+            else:
+                points.append(_kmeans(members, n_proto, self.random_state).cluster_centers_)
+            labels.append(np.full(len(points[-1]), cls))
+        return np.vstack(points), np.concatenate(labels)
+
+    def _choose_fraction(self, X: np.ndarray, y_idx: np.ndarray) -> float:
+        """Smallest prototype fraction within ``accuracy_budget`` of the full set on a held-out split."""
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X, y_idx, test_size=0.2, stratify=y_idx, random_state=self.random_state,
+        )
+        probe = self.get_params()
+        probe['condense'] = False
+        full = CompactKNNClassifier(**probe)
+        full.classes_ = np.arange(len(self.classes_))
+        full._build_index(X_fit, y_fit)
+        target = np.mean(full._predict_idx(X_val) == y_val)
+        for fraction in PROTOTYPE_FRACTIONS:
+            candidate = CompactKNNClassifier(**probe)
+            candidate.classes_ = full.classes_
+            candidate._build_index(*self._prototypes(X_fit, y_fit, fraction))
+            if np.mean(candidate._predict_idx(X_val) == y_val) >= target - self.accuracy_budget:
+                return fraction
+        return 1.0
+
+    def _build_index(self, X: np.ndarray, y_idx: np.ndarray) -> None:
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(X))))
+        n_lists = min(n_lists, len(X))
+        assign = _kmeans(X, n_lists, self.random_state).labels_ if n_lists > 1 else np.zeros(len(X), dtype=int)
+        order = np.argsort(assign, kind='stable')
+        self.reference_ = np.ascontiguousarray(X[order], dtype=np.float32)
+        self.reference_norms_ = np.einsum('ij,ij->i', self.reference_, self.reference_)
+        self.reference_labels_ = y_idx[order].astype(np.int32)
+        counts = np.bincount(assign, minlength=n_lists)
+        self.list_offsets_ = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        # Centroids of the actual cells, so probing matches what each list holds.
+        sums = np.add.reduceat(self.reference_.astype(np.float64), self.list_offsets_[:-1], axis=0)
+        self.centroids_ = (sums / np.maximum(counts, 1)[:, None]).astype(np.float32)
+
+    def _neighbours(self, Q: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(sq_distances, reference_rows)`` of the k nearest probed points per query."""
+        k = min(self.n_neighbors, len(self.reference_))
+        n_lists = len(self.centroids_)
+        n_probe = min(self.n_probe, n_lists)
+        centroid_d = (np.einsum('ij,ij->i', Q, Q)[:, None] - 2.0 * Q @ self.centroids_.T
+                      + np.einsum('ij,ij->i', self.centroids_, self.centroids_)[None, :])
+        probes = np.argpartition(centroid_d, n_probe - 1, axis=1)[:, :n_probe] if n_probe < n_lists \
+            else np.broadcast_to(np.arange(n_lists), (len(Q), n_lists))
+        probed = np.zeros((len(Q), n_lists), dtype=bool)
+        np.put_along_axis(probed, probes, True, axis=1)
+        # Scan cell by cell against just the queries that probed it, keeping a
+        # running top-k per query; each reference row is touched once per chunk.
+        q_norms = np.einsum('ij,ij->i', Q, Q)
+        best_d = np.full((len(Q), k), np.inf, dtype=np.float32)
+        best_i = np.zeros((len(Q), k), dtype=np.int64)
+        for cell in np.flatnonzero(probed.any(axis=0)):
+            lo, hi = self.list_offsets_[cell], self.list_offsets_[cell + 1]
+            if lo == hi:
+                continue
+            queries = np.flatnonzero(probed[:, cell])
+            d2 = (q_norms[queries, None] - 2.0 * Q[queries] @ self.reference_[lo:hi].T
+                  + self.reference_norms_[None, lo:hi])
+            np.maximum(d2, 0.0, out=d2)
+            cand_d = np.hstack([best_d[queries], d2])
+            cand_i = np.hstack([best_i[queries], np.broadcast_to(np.arange(lo, hi), d2.shape)])
+            top = np.argpartition(cand_d, k - 1, axis=1)[:, :k]
+            best_d[queries] = np.take_along_axis(cand_d, top, axis=1)
+            best_i[queries] = np.take_along_axis(cand_i, top, axis=1)
+        return best_d, best_i
+
+    def _proba_chunk(self, Q: np.ndarray) -> np.ndarray:
+        d2, idx = self._neighbours(Q)
+        d2 = d2.astype(np.float64)
+        labels = self.reference_labels_[idx]
+        found = np.isfinite(d2)
+        if self.weights == 'distance':
+            dist = np.sqrt(d2)
+            with np.errstate(divide='ignore'):
+                w = 1.0 / dist
+            # Like sklearn: an exact match takes all the weight.
+            exact = dist == 0
+            has_exact = exact.any(axis=1)
+            w[has_exact] = exact[has_exact]
+        else:
+            w = np.ones_like(d2)
+        w = np.where(found, w, 0.0)
+        proba = np.zeros((len(Q), len(self.classes_)))
+        for cls in range(len(self.classes_)):
+            proba[:, cls] = np.sum(w * (labels == cls), axis=1)
+        total = proba.sum(axis=1, keepdims=True)
+        total[total == 0] = 1.0
+        return proba / total
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        check_is_fitted(self, 'reference_')
+        Q = np.asarray(X, dtype=np.float32)
+        if len(Q) <= _QUERY_CHUNK:
+            return self._proba_chunk(Q)
+        return np.vstack([self._proba_chunk(Q[i:i + _QUERY_CHUNK]) for i in range(0, len(Q), _QUERY_CHUNK)])
+
+    def _predict_idx(self, X: np.ndarray) -> np.ndarray:
+        return np.argmax(self.predict_proba(X), axis=1)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_.take(self._predict_idx(X), axis=0)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Distill the voting ensemble's ensemble_score into one fast student model."""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from classification_utils import BENIGN_MAX, MALWARE_MIN, classify_prob_series
+from ensemble_pipeline.aggregate_predictions import DEFAULT_MODELS
+from ensemble_pipeline.common import RANDOM_STATE, ROOT, ensure_dirs, load_dataset
+from ensemble_predict_dir import (STUDENT_MODEL_NAME, load_models, run_models,
+                                  student_vote)
+from ensemble_vote import run_majority_voting
+
+
+def build_estimator() -> HistGradientBoostingRegressor:
+    return HistGradientBoostingRegressor(
+        max_iter=300,
+        learning_rate=0.05,
+        max_leaf_nodes=31,
+        l2_regularization=1.0,
+        random_state=RANDOM_STATE,
+    )
+
+
+def teacher_scores(X: np.ndarray, models: dict) -> np.ndarray:
+    predictions_df = run_models(X, DEFAULT_MODELS, Path('.'), models=models)
+    voting_df, _ = run_majority_voting(predictions_df, DEFAULT_MODELS)
+    return voting_df['ensemble_score'].to_numpy()
+
+
+def augment(X: np.ndarray, factor: int, rng: np.random.Generator) -> np.ndarray:
+    """Add ``factor`` x len(X) points interpolated between random pairs of rows.
+
+    The teacher labels them, so the student also learns the ensemble's
+    behaviour between the training samples, where its decision boundary is.
+    """
+    if factor <= 0:
+        return X
+    n = len(X) * factor
+    left = X[rng.integers(0, len(X), n)]
+    right = X[rng.integers(0, len(X), n)]
+    weight = rng.random((n, 1))
+    return np.vstack([X, left + weight * (right - left)])
+
+
+def agreement_report(student, models: dict, X: np.ndarray, margin: float) -> dict:
+    """How often the fast path reproduces the full ensemble's tri-state class."""
+    target = teacher_scores(X, models)
+    target_classes, _ = classify_prob_series(target.tolist(), (target >= 0.5).astype(int).tolist())
+    student_df, needs_ensemble = student_vote(student, X, margin)
+    final_classes = np.array(target_classes, dtype=object)
+    final_classes[student_df['sample_index'].to_numpy()] = student_df['ensemble_class'].to_numpy()
+    student_scores = np.clip(student.predict(X), 0.0, 1.0)
+    return {
+        'samples': int(len(X)),
+        'student_mae': float(np.mean(np.abs(student_scores - target))),
+        'routed_to_ensemble': float(needs_ensemble.mean()),
+        'fast_path_class_agreement': float(np.mean(final_classes == np.array(target_classes, dtype=object))),
+        'benign_max': BENIGN_MAX,
+        'malware_min': MALWARE_MIN,
+        'margin': margin,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Distill the ensemble into a single student model.')
+    parser.add_argument('--models-dir', type=Path, default=ROOT / 'ensemble_models', help='Directory for serialized models')
+    parser.add_argument('--results-dir', type=Path, default=ROOT / 'ensemble_results', help='Directory for per-model outputs')
+    parser.add_argument('--augment', type=int, default=10,
+                        help='Interpolated teacher-labelled points per training row (default: 10)')
+    parser.add_argument('--margin', type=float, default=0.0,
+                        help='Band margin used for the agreement report (see --fast-margin)')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    ensure_dirs(args.models_dir, args.results_dir)
+    X_train, _, X_test, _, _ = load_dataset()
+    models = load_models(DEFAULT_MODELS, args.models_dir)
+
+    rng = np.random.default_rng(RANDOM_STATE)
+    X_fit = augment(X_train, args.augment, rng)
+    print(f'[+] Labelling {len(X_fit)} rows with the {len(DEFAULT_MODELS)}-model ensemble')
+    y_fit = teacher_scores(X_fit, models)
+
+    print(f'[+] Training model {STUDENT_MODEL_NAME}')
+    student = build_estimator()
+    student.fit(X_fit, y_fit)
+    model_path = args.models_dir / f'{STUDENT_MODEL_NAME}.joblib'
+    joblib.dump(student, model_path)
+
+    metrics = agreement_report(student, models, X_test, args.margin)
+    metrics_path = args.results_dir / f'{STUDENT_MODEL_NAME}_metrics.json'
+    with open(metrics_path, 'w') as fh:
+        json.dump(metrics, fh, indent=2)
+
+    print('[+] Wrote outputs:')
+    print(f'    - {model_path}')
+    print(f'    - {metrics_path}')
+    print('[*] Student metrics (test split):')
+    for key, value in metrics.items():
+        print(f'    {key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,9 @@ from __future__ import annotations
 
 from sklearn.neighbors import KNeighborsClassifier
 
-from ensemble_pipeline.common import linear_pipeline, make_common_parser, run_model_pipeline
+from ensemble_pipeline.common import (RANDOM_STATE, linear_pipeline,
+                                      make_common_parser, run_model_pipeline)
+from ensemble_pipeline.compact_knn import CompactKNNClassifier
 
 MODEL_NAME = 'knn'
 
@@ -15,15 +17,43 @@ def build_estimator() -> KNeighborsClassifier:
     )
 
 
+def build_compact_estimator(condense: bool = False, accuracy_budget: float = 0.01,
+                            n_probe: int = 8) -> CompactKNNClassifier:
+    """Same neighbours and weighting over a float32 IVF index (see compact_knn)."""
+    return linear_pipeline(
+        CompactKNNClassifier(
+            n_neighbors=5,
+            weights='distance',
+            n_probe=n_probe,
+            condense=condense,
+            accuracy_budget=accuracy_budget,
+            random_state=RANDOM_STATE,
+        )
+    )
+
+
 def parse_args():
-    return make_common_parser('Train the KNN ensemble model.').parse_args()
+    parser = make_common_parser('Train the KNN ensemble model.')
+    parser.add_argument('--compact', action='store_true',
+                        help='Store a float32 reference set behind an IVF index (CompactKNNClassifier)')
+    parser.add_argument('--condense', action='store_true',
+                        help='With --compact, keep only per-class prototypes of the reference set')
+    parser.add_argument('--accuracy-budget', type=float, default=0.01,
+                        help='Validation accuracy --condense may give up (default: 0.01)')
+    parser.add_argument('--n-probe', type=int, default=8,
+                        help='Index cells scanned per query with --compact (default: 8)')
+    return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    if args.compact:
+        estimator = build_compact_estimator(args.condense, args.accuracy_budget, args.n_probe)
+    else:
+        estimator = build_estimator()
     run_model_pipeline(
         MODEL_NAME,
-        build_estimator(),
+        estimator,
         models_dir=args.models_dir,
         results_dir=args.results_dir,
         force_retrain=args.force_retrain,
@@ -2,11 +2,18 @@
 """Train an RBF-kernel SVM as part of the ensemble."""
 from __future__ import annotations
 
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
 from sklearn.svm import SVC
 
-from ensemble_pipeline.common import linear_pipeline, make_common_parser, run_model_pipeline
+from ensemble_pipeline.common import (RANDOM_STATE, linear_pipeline,
+                                      make_common_parser, run_model_pipeline)
 
 MODEL_NAME = 'rbf_svm'
+KERNEL_MAPS = ('nystroem', 'rff')
+DEFAULT_COMPONENTS = 256
 
 
 def build_estimator() -> SVC:
@@ -14,12 +21,41 @@ def build_estimator() -> SVC:
     return linear_pipeline(base)
 
 
+def build_approx_estimator(kernel_map: str = 'nystroem', n_components: int = DEFAULT_COMPONENTS) -> Pipeline:
+    """RBF kernel approximated by a fixed-size feature map, then a linear model.
+
+    Inference is one ``n_components`` x features projection plus a dot
+    product whatever the corpus size, and the logistic output is already a
+    probability, so no Platt cross-validation is needed. Both maps use the
+    same kernel width as SVC's ``gamma='scale'`` on standardized input.
+    """
+    if kernel_map == 'nystroem':
+        feature_map = Nystroem(kernel='rbf', n_components=n_components, random_state=RANDOM_STATE)
+    elif kernel_map == 'rff':
+        feature_map = RBFSampler(gamma='scale', n_components=n_components, random_state=RANDOM_STATE)
+    else:
+        raise ValueError(f'Unknown kernel map {kernel_map!r}; choose from {KERNEL_MAPS}')
+    return Pipeline([
+        ('scaler', StandardScaler()),
+        ('kernel_map', feature_map),
+        ('clf', LogisticRegression(C=3.0, max_iter=2000)),
+    ])
+
+
 def main() -> None:
     parser = make_common_parser('Train the RBF SVM ensemble model.')
+    parser.add_argument('--approx', choices=KERNEL_MAPS,
+                        help='Use a kernel approximation with a linear model instead of the exact SVC')
+    parser.add_argument('--n-components', type=int, default=DEFAULT_COMPONENTS,
+                        help='Size of the approximate feature map (default: %(default)s)')
     args = parser.parse_args()
+    if args.approx:
+        estimator = build_approx_estimator(args.approx, args.n_components)
+    else:
+        estimator = build_estimator()
     run_model_pipeline(
         MODEL_NAME,
-        build_estimator(),
+        estimator,
         models_dir=args.models_dir,
         results_dir=args.results_dir,
         force_retrain=args.force_retrain,
@@ -1,13 +1,32 @@
 #!/usr/bin/env python3
-"""Convenience wrapper to train all ensemble models sequentially."""
+"""Convenience wrapper to train all ensemble models.
+
+Models train one after another by default. With ``--parallel`` they run in
+worker processes under a global ``--cpu-budget``: the models whose fit is
+multi-threaded (PARALLEL_FIT_MODELS) share the free threads, every other
+model takes one, and the slowest models start first. The dataset is placed
+in shared memory once and every worker maps it instead of receiving a
+pickled copy::
+
+    python -m ensemble_pipeline.train_models --force-retrain --parallel --cpu-budget 16
+"""
 from __future__ import annotations
 
-from typing import Callable, List, Tuple
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
 
 from ensemble_pipeline.aggregate_predictions import DEFAULT_MODELS
-from ensemble_pipeline.common import (Dataset, aggregate_metrics, load_dataset,
-                                      make_common_parser, merge_prediction_files,
-                                      run_model_pipeline)
+from ensemble_pipeline.common import (Dataset, aggregate_metrics, apply_cpu_budget,
+                                      ensure_dirs, load_dataset, make_common_parser,
+                                      merge_prediction_files, run_model_pipeline)
 from ensemble_pipeline.pipelines import (ada_boost, decision_tree, extra_trees,
                                          gaussian_nb, gradient_boosting, knn,
                                          lgbm, linear_svc, log_reg,
@@ -30,21 +49,188 @@ MODEL_BUILDERS: List[Tuple[str, Callable[[], object]]] = [
     ('xgb', xgb.build_estimator),
 ]
 
+# Alternative builders selectable per model with --variant name=variant.
+MODEL_VARIANTS: Dict[str, Dict[str, Callable[[], object]]] = {
+    'knn': {
+        'compact': knn.build_compact_estimator,
+        'condensed': lambda: knn.build_compact_estimator(condense=True),
+    },
+    'rbf_svm': {
+        'nystroem': lambda: rbf_svm.build_approx_estimator('nystroem'),
+        'rff': lambda: rbf_svm.build_approx_estimator('rff'),
+    },
+}
+
+
+# Models whose fit uses n_jobs threads; the rest fit on one core.
+PARALLEL_FIT_MODELS = {'random_forest', 'extra_trees', 'lgbm', 'xgb'}
+# Relative single-core fit cost, used to start the slowest models first
+# until TRAIN_TIMES_FILE holds measured times from an earlier run.
+DEFAULT_TRAIN_COST = {
+    'rbf_svm': 10.0, 'gradient_boosting': 8.0, 'random_forest': 6.0, 'ada_boost': 5.0,
+    'xgb': 4.0, 'lgbm': 4.0, 'extra_trees': 4.0, 'linear_svc': 2.0, 'knn': 1.0,
+    'log_reg': 1.0, 'sgd_logistic': 1.0, 'decision_tree': 1.0, 'gaussian_nb': 0.1,
+}
+TRAIN_TIMES_FILE = 'train_times.json'
+
+
+def parse_variants(specs: List[str]) -> Dict[str, str]:
+    variants: Dict[str, str] = {}
+    for spec in specs:
+        name, _, variant = spec.partition('=')
+        if variant not in MODEL_VARIANTS.get(name, {}):
+            choices = ', '.join(f'{n}={v}' for n, vs in MODEL_VARIANTS.items() for v in vs)
+            raise SystemExit(f'[!] Unknown variant {spec!r}; choose from: {choices}')
+        variants[name] = variant
+    return variants
+
+
+def build_model(name: str, variants: Dict[str, str]) -> object:
+    if name in variants:
+        return MODEL_VARIANTS[name][variants[name]]()
+    return dict(MODEL_BUILDERS)[name]()
+
+
+def share_dataset(dataset: Dataset) -> Tuple[shared_memory.SharedMemory, dict]:
+    """Copy the four arrays into one shared block; return it and a picklable spec.
+
+    Each array keeps its memory order (load_dataset's X is column-major), so
+    estimators reduce in the same order and fit exactly as in-process.
+    """
+    arrays = list(dataset[:4])
+    layout, offset = [], 0
+    for array in arrays:
+        offset = -(-offset // 64) * 64  # keep every array cache-line aligned
+        order = 'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C'
+        layout.append((offset, array.shape, array.dtype.str, order))
+        offset += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for array, (start, shape, dtype, order) in zip(arrays, layout):
+        np.ndarray(shape, dtype, buffer=block.buf, offset=start, order=order)[...] = array
+    return block, {'name': block.name, 'layout': layout, 'feature_columns': dataset[4]}
+
+
+def attach_dataset(spec: dict) -> Tuple[shared_memory.SharedMemory, Dataset]:
+    """Map a shared dataset read-only; keep the block open while the arrays are used."""
+    block = shared_memory.SharedMemory(name=spec['name'])
+    arrays = []
+    for start, shape, dtype, order in spec['layout']:
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf, offset=start, order=order)
+        array.flags.writeable = False
+        arrays.append(array)
+    return block, (*arrays, spec['feature_columns'])
+
+
+def _train_worker(name: str, variants: Dict[str, str], threads: int, spec: dict,
+                  models_dir: Path, results_dir: Path, force_retrain: bool) -> Tuple[str, float, bool]:
+    """Run one model's pipeline; return ``(name, seconds, fitted)``.
+
+    ``fitted`` is False when run_model_pipeline only loaded the cached model.
+    """
+    block, dataset = attach_dataset(spec)
+    try:
+        estimator = build_model(name, variants)
+        apply_cpu_budget({name: estimator}, threads)
+        fitted = force_retrain or not (models_dir / f'{name}.joblib').exists()
+        start = time.time()
+        run_model_pipeline(name, estimator, models_dir=models_dir, results_dir=results_dir,
+                           force_retrain=force_retrain, dataset=dataset)
+        return name, time.time() - start, fitted
+    finally:
+        del dataset
+        block.close()
+
+
+def _load_train_times(results_dir: Path) -> Dict[str, float]:
+    try:
+        with open(results_dir / TRAIN_TIMES_FILE, 'r') as fh:
+            return {k: float(v) for k, v in json.load(fh).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def train_parallel(dataset: Dataset, variants: Dict[str, str], cpu_budget: int,
+                   models_dir: Path, results_dir: Path, force_retrain: bool) -> Dict[str, float]:
+    """Train every model in worker processes without exceeding ``cpu_budget`` threads.
+
+    Jobs start longest-first. A single-threaded model takes one thread; a
+    PARALLEL_FIT_MODELS model takes an even share of the free threads among
+    the multi-threaded models still waiting. Returns seconds per model;
+    only the models actually fitted update TRAIN_TIMES_FILE.
+    """
+    ensure_dirs(models_dir, results_dir)
+    measured = _load_train_times(results_dir)
+    pending = sorted((name for name, _ in MODEL_BUILDERS),
+                     key=lambda n: measured.get(n, DEFAULT_TRAIN_COST.get(n, 1.0)), reverse=True)
+    block, spec = share_dataset(dataset)
+    seconds: Dict[str, float] = {}
+    fit_seconds: Dict[str, float] = {}
+    running: Dict[object, Tuple[str, int]] = {}
+    free = cpu_budget
+    # spawn, not fork: forking after BLAS/OpenMP pools start can deadlock LightGBM.
+    ctx = mp.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=min(cpu_budget, len(pending)), mp_context=ctx) as executor:
+            while pending or running:
+                while pending and free > 0:
+                    name = pending.pop(0)
+                    if name in PARALLEL_FIT_MODELS:
+                        waiting = 1 + sum(1 for n in pending if n in PARALLEL_FIT_MODELS)
+                        threads = max(1, free // waiting)
+                    else:
+                        threads = 1
+                    free -= threads
+                    print(f'[*] Starting {name} on {threads} thread(s) ({free}/{cpu_budget} free)')
+                    future = executor.submit(_train_worker, name, variants, threads, spec,
+                                             models_dir, results_dir, force_retrain)
+                    running[future] = (name, threads)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, threads = running.pop(future)
+                    free += threads
+                    _, seconds[name], fitted = future.result()
+                    if fitted:
+                        fit_seconds[name] = seconds[name]
+                    print(f'[+] Finished {name} in {seconds[name]:.1f}s')
+    finally:
+        block.close()
+        block.unlink()
+
+    with open(results_dir / TRAIN_TIMES_FILE, 'w') as fh:
+        json.dump({**measured, **fit_seconds}, fh, indent=2)
+    return seconds
+
 
 def main() -> None:
-    parser = make_common_parser('Train all ensemble models sequentially.')
+    parser = make_common_parser('Train all ensemble models.')
+    parser.add_argument('--variant', action='append', default=[], metavar='MODEL=VARIANT',
+                        help='Train an alternative estimator for a model, e.g. knn=compact (repeatable)')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Train the models concurrently in worker processes')
+    parser.add_argument('--cpu-budget', type=int, default=0,
+                        help='With --parallel, total threads all models may use together (default: all cores)')
     args = parser.parse_args()
+    variants = parse_variants(args.variant)
 
     dataset: Dataset = load_dataset()
-    for name, builder in MODEL_BUILDERS:
-        run_model_pipeline(
-            name,
-            builder(),
-            models_dir=args.models_dir,
-            results_dir=args.results_dir,
-            force_retrain=args.force_retrain,
-            dataset=dataset,
-        )
+    if args.parallel:
+        cpu_budget = args.cpu_budget or os.cpu_count() or 1
+        start = time.time()
+        seconds = train_parallel(dataset, variants, cpu_budget, args.models_dir, args.results_dir,
+                                 args.force_retrain)
+        slowest = max(seconds, key=seconds.get)
+        print(f'[+] Trained {len(seconds)} models in {time.time() - start:.1f}s '
+              f'(sum {sum(seconds.values()):.1f}s, slowest {slowest} {seconds[slowest]:.1f}s)')
+    else:
+        for name, _ in MODEL_BUILDERS:
+            run_model_pipeline(
+                name,
+                build_model(name, variants),
+                models_dir=args.models_dir,
+                results_dir=args.results_dir,
+                force_retrain=args.force_retrain,
+                dataset=dataset,
+            )
 
     merge_prediction_files(DEFAULT_MODELS, args.results_dir)
     aggregate_metrics(DEFAULT_MODELS, args.results_dir)
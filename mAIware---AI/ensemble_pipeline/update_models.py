@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Update the incremental ensemble models with newly labeled samples.
+
+A full ``--force-retrain`` refits every model on the whole corpus. The
+models below can instead absorb a delta of new samples:
+
+- sgd_logistic: ``partial_fit`` epochs over the delta through the existing
+  scaler (the scaler is kept, so the learned weights stay meaningful);
+- gaussian_nb: ``partial_fit``, an exact update of the class statistics;
+- lgbm / xgb: ``--boost-rounds`` more trees fitted on the delta plus a
+  replayed sample of the original training rows, on top of the current
+  booster.
+
+Updates always start from the active ``<name>.joblib``. When it is not
+identical to the newest ``<name>.v<N>.joblib`` (the first update, a full
+retrain, a rollback) it is first kept as the next version. The update is
+written as the version after that and scored on the test split against
+the model it started from. ``--promote`` then makes the new versions
+active; copying an older version over ``<name>.joblib`` rolls back, and
+later updates build on the rolled-back model. Delta CSVs use the training
+CSV format, with the label taken from a ``label`` column, ``--label``, or
+the file name::
+
+    python -m ensemble_pipeline.update_models benign_delta.csv malware_delta.csv --promote
+"""
+from __future__ import annotations
+
+import argparse
+import filecmp
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.utils.class_weight import compute_class_weight
+
+from ensemble_pipeline.common import (RANDOM_STATE, ROOT, _prepare_df, compute_metrics,
+                                      ensure_dirs, extract_scores, load_dataset)
+
+DEFAULT_BOOST_ROUNDS = 50
+DEFAULT_SGD_EPOCHS = 5
+# Original training rows replayed per delta row when boosting continues, so
+# the new trees do not chase the delta alone.
+DEFAULT_REPLAY_RATIO = 1.0
+LABELS = {'benign': 0, 'malware': 1}
+
+
+def version_path(models_dir: Path, name: str, version: int) -> Path:
+    return models_dir / f'{name}.v{version}.joblib'
+
+
+def list_versions(models_dir: Path, name: str) -> List[int]:
+    pattern = re.compile(rf'^{re.escape(name)}\.v(\d+)\.joblib$')
+    return sorted(int(m.group(1)) for p in models_dir.glob(f'{name}.v*.joblib')
+                  if (m := pattern.match(p.name)))
+
+
+def _copy_atomic(src: Path, dst: Path) -> None:
+    tmp_path = dst.with_name(dst.name + '.tmp')
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def _file_label(path: Path, label: str | None) -> int | None:
+    if label is not None:
+        return LABELS[label]
+    for word, value in LABELS.items():
+        if word in path.name.lower():
+            return value
+    return None
+
+
+def load_delta(paths: List[Path], feature_columns: List[str],
+               label: str | None = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Read delta CSVs into ``(X, y)`` aligned to the training feature columns."""
+    parts = []
+    for path in paths:
+        df = pd.read_csv(path, low_memory=False)
+        if 'label' not in df.columns:
+            file_label = _file_label(path, label)
+            if file_label is None:
+                raise SystemExit(f'[!] {path}: no label column; pass --label or put benign/malware in the name')
+            df['label'] = file_label
+        parts.append(df)
+    df = _prepare_df(pd.concat(parts, ignore_index=True))
+    missing = [c for c in feature_columns if c not in df.columns]
+    if missing:
+        print(f'[!] Warning: {len(missing)} feature columns missing from the delta, filled with 0: {missing[:5]}...')
+    X = df.reindex(columns=feature_columns, fill_value=0).values
+    y = df['label'].values.astype(np.int64)
+    unknown = set(np.unique(y)) - set(LABELS.values())
+    if unknown:
+        raise SystemExit(f'[!] Delta labels must be 0 (benign) or 1 (malware), got {sorted(unknown)}')
+    return X, y
+
+
+def _update_sgd(model, X: np.ndarray, y: np.ndarray, context: dict):
+    scaler, clf = model.steps[0][1], model.steps[-1][1]
+    Z = scaler.transform(X)
+    sample_weight = None
+    class_weight = clf.class_weight
+    if class_weight == 'balanced':
+        # partial_fit cannot balance by itself; weight by the whole corpus.
+        labels = np.concatenate([context['y_train'], y])
+        weights = compute_class_weight('balanced', classes=clf.classes_, y=labels)
+        sample_weight = weights[np.searchsorted(clf.classes_, y)]
+        clf.set_params(class_weight=None)
+    rng = np.random.RandomState(RANDOM_STATE)
+    try:
+        for _ in range(context['sgd_epochs']):
+            order = rng.permutation(len(y))
+            clf.partial_fit(Z[order], y[order],
+                            sample_weight=None if sample_weight is None else sample_weight[order])
+    finally:
+        clf.set_params(class_weight=class_weight)
+    return model
+
+
+def _update_gaussian_nb(model, X: np.ndarray, y: np.ndarray, context: dict):
+    model.partial_fit(X, y)
+    return model
+
+
+def _replay(X: np.ndarray, y: np.ndarray, context: dict) -> Tuple[np.ndarray, np.ndarray]:
+    n = min(len(context['X_train']), int(round(len(y) * context['replay_ratio'])))
+    if n <= 0:
+        return X, y
+    rows = np.random.RandomState(RANDOM_STATE).choice(len(context['X_train']), n, replace=False)
+    return np.vstack([X, context['X_train'][rows]]), np.concatenate([y, context['y_train'][rows]])
+
+
+def _update_lgbm(model, X: np.ndarray, y: np.ndarray, context: dict):
+    X_fit, y_fit = _replay(X, y, context)
+    updated = clone(model).set_params(n_estimators=context['boost_rounds'])
+    # The result holds the init model's trees followed by the new ones.
+    updated.fit(X_fit, y_fit, init_model=model.booster_)
+    return updated
+
+
+def _update_xgb(model, X: np.ndarray, y: np.ndarray, context: dict):
+    X_fit, y_fit = _replay(X, y, context)
+    updated = clone(model).set_params(n_estimators=context['boost_rounds'])
+    updated.fit(X_fit, y_fit, xgb_model=model.get_booster())
+    return updated
+
+
+INCREMENTAL_MODELS: Dict[str, Callable] = {
+    'sgd_logistic': _update_sgd,
+    'gaussian_nb': _update_gaussian_nb,
+    'lgbm': _update_lgbm,
+    'xgb': _update_xgb,
+}
+
+
+def update_model(name: str, X: np.ndarray, y: np.ndarray, context: dict,
+                 models_dir: Path, results_dir: Path, promote: bool = False) -> Dict[str, object]:
+    """Write ``name``'s next version updated with ``(X, y)``; return its report."""
+    active = models_dir / f'{name}.joblib'
+    if not active.exists():
+        raise FileNotFoundError(f'Missing model file: {active}. Train it before updating.')
+    versions = list_versions(models_dir, name)
+    base_version = versions[-1] if versions else 0
+    if not versions or not filecmp.cmp(active, version_path(models_dir, name, base_version), shallow=False):
+        if versions:
+            base_version += 1
+        _copy_atomic(active, version_path(models_dir, name, base_version))
+        print(f'[*] Kept the active {name} model as v{base_version}')
+    new_version = base_version + 1
+
+    print(f'[+] Updating {name} v{base_version} -> v{new_version} with {len(y)} samples')
+    start = time.time()
+    base = joblib.load(active)
+    X_test, y_test = context['X_test'], context['y_test']
+    base_metrics = compute_metrics(y_test, base.predict(X_test), extract_scores(base, X_test))
+    updated = INCREMENTAL_MODELS[name](base, X, y, context)
+    seconds = time.time() - start
+    new_path = version_path(models_dir, name, new_version)
+    # Uncompressed, like run_model_pipeline, so scoring can memory-map it.
+    joblib.dump(updated, new_path)
+    metrics = compute_metrics(y_test, updated.predict(X_test), extract_scores(updated, X_test))
+
+    report = {
+        'model': name,
+        'base_version': base_version,
+        'version': new_version,
+        'delta_samples': int(len(y)),
+        'seconds': seconds,
+        'base_metrics': base_metrics,
+        'metrics': metrics,
+        'promoted': promote,
+    }
+    with open(results_dir / f'{name}_v{new_version}_metrics.json', 'w') as fh:
+        json.dump(report, fh, indent=2)
+    if promote:
+        _copy_atomic(new_path, active)
+    print(f'    {new_path} in {seconds:.1f}s; test f1 {base_metrics["f1"]:.4f} -> {metrics["f1"]:.4f}'
+          + (f' (promoted to {active.name})' if promote else ''))
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Update the incremental ensemble models with new labeled samples.')
+    parser.add_argument('delta', nargs='+', type=Path, help='CSV files of newly labeled samples')
+    parser.add_argument('--label', choices=sorted(LABELS),
+                        help='Label for delta files without a label column (default: from the file name)')
+    parser.add_argument('--models', nargs='+', choices=sorted(INCREMENTAL_MODELS), default=list(INCREMENTAL_MODELS),
+                        help='Models to update (default: all incremental models)')
+    parser.add_argument('--models-dir', type=Path, default=ROOT / 'ensemble_models', help='Directory for serialized models')
+    parser.add_argument('--results-dir', type=Path, default=ROOT / 'ensemble_results', help='Directory for per-model outputs')
+    parser.add_argument('--boost-rounds', type=int, default=DEFAULT_BOOST_ROUNDS,
+                        help=f'Trees added to lgbm/xgb per update (default: {DEFAULT_BOOST_ROUNDS})')
+    parser.add_argument('--replay-ratio', type=float, default=DEFAULT_REPLAY_RATIO,
+                        help='Original training rows mixed in per delta row when boosting (default: 1.0)')
+    parser.add_argument('--sgd-epochs', type=int, default=DEFAULT_SGD_EPOCHS,
+                        help=f'partial_fit passes over the delta for sgd_logistic (default: {DEFAULT_SGD_EPOCHS})')
+    parser.add_argument('--promote', action='store_true',
+                        help='Make the new versions the active <name>.joblib models')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    ensure_dirs(args.models_dir, args.results_dir)
+    X_train, y_train, X_test, y_test, feature_columns = load_dataset()
+    X, y = load_delta(args.delta, feature_columns, args.label)
+    print(f'[+] Loaded {len(y)} delta samples ({int(y.sum())} malware) from {len(args.delta)} file(s)')
+    context = {
+        'X_train': X_train, 'y_train': y_train, 'X_test': X_test, 'y_test': y_test,
+        'boost_rounds': args.boost_rounds, 'replay_ratio': args.replay_ratio, 'sgd_epochs': args.sgd_epochs,
+    }
+    for name in args.models:
+        update_model(name, X, y, context, args.models_dir, args.results_dir, promote=args.promote)
+    if args.promote:
+        print('[*] Promoted models invalidate cached verdicts; rerun distill_student.py '
+              'if the student should follow them.')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,29 +3,55 @@
 from __future__ import annotations
 
 import argparse
+import itertools
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Iterable, List, Sequence
+from typing import Dict, Iterable, List, Mapping, Sequence
 
 import joblib
 import numpy as np
 import pandas as pd
 
+import linear_engine
 import pe_to_features
+import tree_engine
 from ensemble_pipeline.aggregate_predictions import DEFAULT_MODELS
-from ensemble_pipeline.common import extract_scores
+from ensemble_pipeline.common import apply_cpu_budget, predict_with_scores
 from ensemble_vote import run_majority_voting
-from classification_utils import CLASS_NAMES, summarize_classes
+from classification_utils import (BENIGN_MAX, CLASS_NAMES, MALWARE_MIN,
+                                  classify_prob_series, summarize_classes)
 
 ROOT = Path(__file__).resolve().parent
 DEFAULT_MODELS_DIR = ROOT / 'ensemble_models'
 DEFAULT_MODEL_COLS = ROOT / 'model_columns.json'
+# joblib mmap mode for shared model loading. Copy-on-write rather than 'r'
+# because libsvm insists on writable buffers; pages stay shared as long as
+# nothing writes to them, which prediction never does.
+MODEL_MMAP_MODE = 'c'
+# Distilled single-model approximation of ensemble_score (see
+# ensemble_pipeline/distill_student.py), used by the --fast path.
+STUDENT_MODEL_NAME = 'student'
+SCORING_BACKENDS = ('sklearn', 'compiled')
 
 
-def iter_pe_files(directory: Path) -> Iterable[Path]:
-    for path in sorted(directory.iterdir()):
-        if path.is_file():
-            yield path
+def iter_pe_files(directory: Path, recursive: bool = False) -> Iterable[Path]:
+    """Yield files under ``directory`` in a stable (sorted) order."""
+    if not recursive:
+        for path in sorted(directory.iterdir()):
+            if path.is_file():
+                yield path
+        return
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        base = Path(dirpath)
+        for filename in sorted(filenames):
+            path = base / filename
+            if path.is_file():
+                yield path
 
 
 def load_model_columns(path: Path) -> List[str]:
@@ -38,21 +64,55 @@ def load_model_columns(path: Path) -> List[str]:
     return cols
 
 
-def extract_features(paths: Sequence[Path], model_cols: List[str]) -> pd.DataFrame:
+def _feature_row(file_path: Path, model_cols: List[str]) -> pd.Series | None:
+    try:
+        with pe_to_features.PEAnalysis(file_path) as ctx:
+            df = pe_to_features.to_features(ctx, model_cols)
+            sha256 = ctx.sha256
+    except Exception as exc:  # pragma: no cover - continue after logging
+        print(f"[!] Failed to extract features from {file_path}: {exc}")
+        return None
+    if df.empty:
+        return None
+    row = df.iloc[0].copy()
+    row['sha256'] = sha256
+    return row
+
+
+def extract_feature_rows(
+    paths: Sequence[Path],
+    model_cols: List[str],
+    workers: int = 1,
+    start_index: int = 0,
+) -> List[pd.Series]:
+    """Extract one feature row per path, in ``paths`` order.
+
+    With ``workers`` > 1 the PE parsing is spread over a process pool; rows
+    are still gathered in input order so ``sample_index`` stays stable.
+    Files that fail to parse are skipped; ``sample_index`` counts from
+    ``start_index`` over all of ``paths``.
+    """
+    extract = partial(_feature_row, model_cols=model_cols)
+    if workers > 1 and len(paths) > 1:
+        chunksize = max(1, min(64, len(paths) // (workers * 8)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(extract, paths, chunksize=chunksize))
+    else:
+        results = [extract(path) for path in paths]
+
     rows = []
-    for idx, file_path in enumerate(paths):
-        try:
-            df = pe_to_features.to_features(file_path, model_cols)
-        except Exception as exc:  # pragma: no cover - continue after logging
-            print(f"[!] Failed to extract features from {file_path}: {exc}")
-            continue
-        if df.empty:
+    for idx, (file_path, row) in enumerate(zip(paths, results), start=start_index):
+        if row is None:
             continue
-        row = df.iloc[0].copy()
         row['sample_index'] = idx
         row['sample_name'] = file_path.name
         row['sample_path'] = str(file_path)
         rows.append(row)
+    return rows
+
+
+def extract_features(paths: Sequence[Path], model_cols: List[str], workers: int = 1) -> pd.DataFrame:
+    rows = extract_feature_rows(paths, model_cols, workers=workers)
     if not rows:
         raise RuntimeError('No features were extracted from the directory.')
     return pd.DataFrame(rows)
@@ -66,24 +126,389 @@ def prepare_feature_matrix(df: pd.DataFrame, model_cols: List[str]) -> np.ndarra
     return feature_df.values
 
 
-def run_models(feature_matrix: np.ndarray, model_names: Sequence[str], models_dir: Path) -> pd.DataFrame:
-    predictions = pd.DataFrame({
-        'sample_index': np.arange(feature_matrix.shape[0], dtype=int),
-        'true_label': np.nan,
-    })
+def load_models(
+    model_names: Sequence[str],
+    models_dir: Path,
+    mmap_mode: str | None = None,
+    backend: str = 'sklearn',
+) -> Dict[str, object]:
+    """Deserialize the named models from ``models_dir``.
+
+    With ``mmap_mode`` (see MODEL_MMAP_MODE) the NumPy arrays inside each
+    uncompressed .joblib file (KNN reference points, SVM support vectors,
+    linear weights) are memory-mapped, so every process scoring with the
+    same files shares a single copy through the page cache.
+
+    With ``backend='compiled'`` tree models that have an up-to-date
+    ``.compiled.npz`` (see tree_engine.py) are swapped for their flat-array
+    form, and the scaled linear models and GaussianNB are evaluated together
+    by one LinearGroup (see linear_engine.py). Both give identical results
+    with far less per-call overhead.
+    """
+    if backend not in SCORING_BACKENDS:
+        raise ValueError(f'Unknown scoring backend {backend!r}; expected one of {SCORING_BACKENDS}')
+    models: Dict[str, object] = {}
     for name in model_names:
         model_path = models_dir / f'{name}.joblib'
         if not model_path.exists():
             raise FileNotFoundError(f'Missing model file: {model_path}')
-        model = joblib.load(model_path)
-        preds = model.predict(feature_matrix)
-        scores = extract_scores(model, feature_matrix)
+        models[name] = joblib.load(model_path, mmap_mode=mmap_mode)
+        if backend == 'compiled':
+            compiled = tree_engine.load_compiled(models_dir, name)
+            if compiled is not None:
+                compiled.fallback = models[name]
+                models[name] = compiled
+    if backend == 'compiled':
+        linear_engine.fuse_linear_models(models)
+    return models
+
+
+def run_models(
+    feature_matrix: np.ndarray,
+    model_names: Sequence[str],
+    models_dir: Path,
+    models: Mapping[str, object] | None = None,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """Score ``feature_matrix`` with every model in ``model_names``.
+
+    ``models`` may hold estimators returned by :func:`load_models`; long-lived
+    callers pass it to avoid deserializing the ensemble on every call. Each
+    model produces its label and score in one pass where its predict() allows
+    (see ``predict_with_scores``). With ``workers`` > 1 the models run
+    concurrently on threads; tree, boosting and neighbour inference release
+    the GIL. Pair this with :func:`configure_scoring_threads` to stay within
+    a CPU budget.
+    """
+    if models is None:
+        models = load_models(model_names, models_dir)
+    predictions = pd.DataFrame({
+        'sample_index': np.arange(feature_matrix.shape[0], dtype=int),
+        'true_label': np.nan,
+    })
+    def score(name: str):
+        return predict_with_scores(models[name], feature_matrix)
+
+    if workers > 1 and len(model_names) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(score, model_names))
+    else:
+        outputs = [score(name) for name in model_names]
+    # Columns are added in model_names order whatever order the models finish in.
+    for name, (preds, scores) in zip(model_names, outputs):
         predictions[f'{name}_pred'] = preds
         if scores is not None:
             predictions[f'{name}_score'] = scores
     return predictions
 
 
+def rank_models_by_cost(
+    models: Mapping[str, object],
+    model_names: Sequence[str],
+    n_features: int,
+    probe_rows: int = 256,
+) -> List[str]:
+    """Order ``model_names`` from cheapest to most expensive to evaluate.
+
+    Each model is timed once on a fixed random probe matrix; call this once
+    per process and reuse the order for every batch.
+    """
+    probe = np.random.default_rng(0).random((probe_rows, n_features))
+    costs = {}
+    for name in model_names:
+        start = time.perf_counter()
+        predict_with_scores(models[name], probe)
+        costs[name] = time.perf_counter() - start
+    return sorted(model_names, key=costs.__getitem__)
+
+
+def run_models_cascade(
+    feature_matrix: np.ndarray,
+    model_names: Sequence[str],
+    models: Mapping[str, object],
+    order: Sequence[str],
+) -> pd.DataFrame:
+    """Like :func:`run_models`, but stop scoring a sample once its vote is decided.
+
+    Models run in ``order`` (see :func:`rank_models_by_cost`). After each one,
+    samples where either class already holds a strict majority of all
+    ``model_names`` drop out, since the remaining votes cannot change
+    ``ensemble_label``. Models a sample never reached leave NaN in its
+    ``*_pred``/``*_score`` columns. Vote counts and ``ensemble_score`` then
+    cover the models that did run.
+    """
+    n_rows = feature_matrix.shape[0]
+    majority = len(model_names) // 2 + 1
+    votes_malware = np.zeros(n_rows, dtype=int)
+    votes_benign = np.zeros(n_rows, dtype=int)
+    active = np.arange(n_rows)
+    preds_by_model: Dict[str, np.ndarray] = {}
+    scores_by_model: Dict[str, np.ndarray] = {}
+    for name in order:
+        model = models[name]
+        preds = np.full(n_rows, np.nan)
+        scores = np.full(n_rows, np.nan)
+        has_scores = hasattr(model, 'predict_proba') or hasattr(model, 'decision_function')
+        if active.size:
+            model_preds, model_scores = predict_with_scores(model, feature_matrix[active])
+            preds[active] = model_preds
+            has_scores = model_scores is not None
+            if has_scores:
+                scores[active] = model_scores
+            is_malware = model_preds == 1
+            votes_malware[active] += is_malware
+            votes_benign[active] += ~is_malware
+            decided = (votes_malware[active] >= majority) | (votes_benign[active] >= majority)
+            active = active[~decided]
+        preds_by_model[name] = preds
+        if has_scores:
+            scores_by_model[name] = scores
+
+    predictions = pd.DataFrame({
+        'sample_index': np.arange(n_rows, dtype=int),
+        'true_label': np.nan,
+    })
+    for name in model_names:
+        predictions[f'{name}_pred'] = pd.array(preds_by_model[name], dtype='Int64')
+        if name in scores_by_model:
+            predictions[f'{name}_score'] = scores_by_model[name]
+    return predictions
+
+
+def ensemble_scored(output_df: pd.DataFrame) -> pd.DataFrame:
+    """The rows the ensemble voted on (all of them unless the student decided some)."""
+    if 'scored_by' not in output_df.columns:
+        return output_df
+    return output_df[output_df['scored_by'] != 'student']
+
+
+def count_skipped_evaluations(output_df: pd.DataFrame, model_names: Sequence[str]) -> int:
+    """Model evaluations the cascade saved on rows routed to the ensemble."""
+    scored = ensemble_scored(output_df)
+    votes_cast = scored['votes_benign'].sum() + scored['votes_malware'].sum()
+    return int(len(scored) * len(model_names) - votes_cast)
+
+
+def configure_scoring_threads(
+    models: Dict[str, object],
+    model_workers: int,
+    cpu_budget: int | None,
+) -> None:
+    """Split ``cpu_budget`` threads evenly across ``model_workers`` concurrent models."""
+    if cpu_budget:
+        apply_cpu_budget(models, max(1, cpu_budget // max(1, model_workers)))
+
+
+def load_student(models_dir: Path, mmap_mode: str | None = None) -> object:
+    student_path = models_dir / f'{STUDENT_MODEL_NAME}.joblib'
+    if not student_path.exists():
+        raise FileNotFoundError(
+            f'Missing student model: {student_path}. Run ensemble_pipeline/distill_student.py first.'
+        )
+    return joblib.load(student_path, mmap_mode=mmap_mode)
+
+
+def student_vote(
+    student: object,
+    feature_matrix: np.ndarray,
+    margin: float = 0.0,
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """Score rows with the distilled student; return ``(voting_df, needs_ensemble)``.
+
+    Rows whose student score is at most ``BENIGN_MAX - margin`` or at least
+    ``MALWARE_MIN + margin`` are decided here, in the same columns
+    run_majority_voting produces (no votes are cast). ``needs_ensemble`` marks
+    the rows in the suspicious band, which must go to the full ensemble.
+    ``sample_index`` in ``voting_df`` is the row position in ``feature_matrix``.
+    """
+    scores = np.clip(student.predict(feature_matrix), 0.0, 1.0)
+    needs_ensemble = (scores > BENIGN_MAX - margin) & (scores < MALWARE_MIN + margin)
+    decided = np.flatnonzero(~needs_ensemble)
+    labels = (scores[decided] >= MALWARE_MIN).astype(int)
+    classes, class_ids = classify_prob_series(scores[decided].tolist(), labels.tolist())
+    voting_df = pd.DataFrame({
+        'sample_index': decided,
+        'true_label': np.nan,
+        'votes_benign': 0,
+        'votes_malware': 0,
+        'ensemble_label': labels,
+        'ensemble_score': scores[decided],
+        'ensemble_class': classes,
+        'ensemble_class_id': class_ids,
+        'scored_by': 'student',
+    })
+    return voting_df, needs_ensemble
+
+
+def score_features(
+    features_df: pd.DataFrame,
+    model_cols: List[str],
+    model_names: Sequence[str],
+    models_dir: Path,
+    models: Mapping[str, object] | None = None,
+    model_workers: int = 1,
+    cascade_order: Sequence[str] | None = None,
+    student: object | None = None,
+    student_margin: float = 0.0,
+) -> pd.DataFrame:
+    """Run the ensemble and majority vote over extracted rows; return the output frame.
+
+    With ``cascade_order`` the models run as an early-exit cascade
+    (:func:`run_models_cascade`) instead of all on every row. With a
+    ``student`` only rows it leaves in the suspicious band reach the
+    ensemble, and a ``scored_by`` column says which path decided each row.
+    """
+    feature_matrix = prepare_feature_matrix(features_df, model_cols)
+    # Scoring numbers rows 0..n-1; map back to the scan-wide sample indices so
+    # skipped files (and chunk offsets) do not shift the metadata merge.
+    sample_index = features_df['sample_index'].to_numpy(dtype=int)
+    parts = []
+    rows = np.arange(feature_matrix.shape[0])
+    if student is not None:
+        student_df, needs_ensemble = student_vote(student, feature_matrix, student_margin)
+        if not student_df.empty:
+            parts.append(student_df)
+        rows = np.flatnonzero(needs_ensemble)
+
+    if rows.size:
+        matrix = feature_matrix if rows.size == feature_matrix.shape[0] else feature_matrix[rows]
+        if cascade_order is not None:
+            if models is None:
+                models = load_models(model_names, models_dir)
+            predictions_df = run_models_cascade(matrix, model_names, models, cascade_order)
+        else:
+            predictions_df = run_models(matrix, model_names, models_dir, models=models, workers=model_workers)
+        predictions_df['sample_index'] = rows
+        voting_df, _ = run_majority_voting(predictions_df, model_names)
+        if student is not None:
+            voting_df['scored_by'] = 'ensemble'
+        parts.append(voting_df)
+
+    voting_df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    if student is not None:
+        voting_df = voting_df.sort_values('sample_index', kind='stable').reset_index(drop=True)
+    voting_df['sample_index'] = sample_index[voting_df['sample_index'].to_numpy(dtype=int)]
+    return build_output_df(features_df, voting_df)
+
+
+def _checkpoint_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + '.checkpoint.json')
+
+
+def _write_checkpoint(path: Path, state: dict) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as fh:
+        json.dump(state, fh, indent=2)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def scan_streaming(
+    input_dir: Path,
+    output_path: Path,
+    model_cols: List[str],
+    model_names: Sequence[str],
+    models_dir: Path,
+    models: Mapping[str, object],
+    chunk_size: int,
+    recursive: bool = False,
+    workers: int = 1,
+    resume: bool = False,
+    feature_store=None,
+    model_workers: int = 1,
+    cascade_order: Sequence[str] | None = None,
+    student: object | None = None,
+    student_margin: float = 0.0,
+) -> Dict[str, int]:
+    """Score ``input_dir`` in chunks of ``chunk_size`` files, appending to ``output_path``.
+
+    After every chunk the CSV is fsynced and ``<output>.checkpoint.json``
+    records how many files are done and the CSV size at that point. With
+    ``resume`` a rerun truncates the CSV back to that size (dropping any
+    half-written chunk) and continues after the last finished file; a
+    checkpoint written with other inputs, models or ``--fast`` settings is
+    refused. Memory use is bounded by one chunk regardless of corpus size. Each chunk's
+    vectors also go to ``feature_store`` when one is given. Returns the class
+    counts for the whole scan.
+    """
+    checkpoint_path = _checkpoint_path(output_path)
+    state = {
+        'input_dir': str(input_dir),
+        'recursive': recursive,
+        'models': list(model_names),
+        # The student adds a scored_by column and its margin decides which
+        # rows reach the ensemble, so a resume must keep both.
+        'fast': student is not None,
+        'fast_margin': student_margin if student is not None else None,
+        'files_done': 0,
+        'last_path': None,
+        'output_bytes': 0,
+        'rows_written': 0,
+        'class_counts': {},
+        'skipped_evaluations': 0,
+        'ensemble_rows': 0,
+    }
+    if resume and checkpoint_path.exists():
+        with open(checkpoint_path, 'r') as fh:
+            saved = json.load(fh)
+        if (saved.get('input_dir') != str(input_dir) or saved.get('recursive') != recursive
+                or saved.get('models') != list(model_names) or saved.get('fast', False) != state['fast']
+                or saved.get('fast_margin') != state['fast_margin']):
+            raise ValueError(f'Checkpoint {checkpoint_path} belongs to a different scan; remove it or drop --resume')
+        state.update(saved)
+        print(f"[*] Resuming after {state['files_done']} files ({state['rows_written']} rows written)")
+
+    files = iter_pe_files(input_dir, recursive=recursive)
+    if state['files_done']:
+        done = list(itertools.islice(files, state['files_done']))
+        if done and str(done[-1]) != state['last_path']:
+            print(f"[!] Warning: directory contents changed since the checkpoint (expected {state['last_path']})")
+
+    with open(output_path, 'r+b' if state['output_bytes'] else 'wb') as out:
+        out.truncate(state['output_bytes'])
+        out.seek(state['output_bytes'])
+        while True:
+            chunk = list(itertools.islice(files, chunk_size))
+            if not chunk:
+                break
+            rows = extract_feature_rows(chunk, model_cols, workers=workers, start_index=state['files_done'])
+            if rows:
+                features_df = pd.DataFrame(rows)
+                if feature_store is not None:
+                    feature_store.append(features_df)
+                output_df = score_features(features_df, model_cols, model_names, models_dir, models,
+                                           model_workers=model_workers, cascade_order=cascade_order,
+                                           student=student, student_margin=student_margin)
+                output_df.to_csv(out, index=False, header=state['output_bytes'] == 0)
+                out.flush()
+                os.fsync(out.fileno())
+                state['rows_written'] += len(output_df)
+                state['skipped_evaluations'] += count_skipped_evaluations(output_df, model_names)
+                state['ensemble_rows'] += len(ensemble_scored(output_df))
+                for name, count in summarize_classes(output_df.get('ensemble_class', [])).items():
+                    state['class_counts'][name] = state['class_counts'].get(name, 0) + count
+            state['files_done'] += len(chunk)
+            state['last_path'] = str(chunk[-1])
+            state['output_bytes'] = out.tell()
+            _write_checkpoint(checkpoint_path, state)
+            print(f"[*] {state['files_done']} files scanned, {state['rows_written']} rows written")
+
+    checkpoint_path.unlink(missing_ok=True)
+    if cascade_order is not None:
+        _report_skipped(state['skipped_evaluations'], state['ensemble_rows'], len(model_names),
+                        state['rows_written'] - state['ensemble_rows'])
+    return state['class_counts']
+
+
+def _report_skipped(skipped: int, rows: int, n_models: int, student_rows: int = 0) -> None:
+    total = rows * n_models
+    share = 100.0 * skipped / total if total else 0.0
+    print(f'[*] Cascade skipped {skipped} of {total} model evaluations ({share:.1f}%)')
+    if student_rows:
+        print(f'[*] Student decided {student_rows} rows without the ensemble')
+
+
 def build_output_df(meta_df: pd.DataFrame, voting_df: pd.DataFrame) -> pd.DataFrame:
     merged = voting_df.merge(meta_df[['sample_index', 'sample_name', 'sample_path']], on='sample_index', how='left')
     # reorder columns for readability
@@ -107,6 +532,28 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--models-dir', type=Path, default=DEFAULT_MODELS_DIR, help='Directory holding trained ensemble models')
     parser.add_argument('--model-columns', type=Path, default=DEFAULT_MODEL_COLS, help='Path to model_columns.json')
     parser.add_argument('--models', nargs='*', default=DEFAULT_MODELS, help='Specific model names to use (default: all)')
+    parser.add_argument('--mmap-models', action='store_true', help='Memory-map model arrays instead of loading private copies')
+    parser.add_argument('--backend', choices=SCORING_BACKENDS, default='sklearn',
+                        help='Tree model inference: sklearn, or compiled flat arrays from tree_engine.py')
+    parser.add_argument('--recursive', action='store_true', help='Also scan files in subdirectories')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes used for feature extraction (0 = one per CPU, default: 1)')
+    parser.add_argument('--chunk-size', type=int, default=0,
+                        help='Stream results: score and append this many files at a time, with a checkpoint')
+    parser.add_argument('--resume', action='store_true',
+                        help='With --chunk-size, continue from <output>.checkpoint.json if present')
+    parser.add_argument('--model-workers', type=int, default=1,
+                        help='Models scored concurrently on threads (0 = one per model, default: 1)')
+    parser.add_argument('--cpu-budget', type=int, default=0,
+                        help='Total threads the models may use together (default: unlimited)')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Run models cheapest-first and stop once a sample\'s majority is decided')
+    parser.add_argument('--fast', action='store_true',
+                        help='Score with the distilled student; only its suspicious-band files go to the ensemble')
+    parser.add_argument('--fast-margin', type=float, default=0.0,
+                        help='Widen the band sent to the ensemble by this much on each side (default: 0)')
+    parser.add_argument('--feature-store', type=Path,
+                        help='Also save extracted vectors to this feature store for later rescoring')
     return parser.parse_args()
 
 
@@ -116,21 +563,53 @@ def main() -> None:
     if not input_dir.is_dir():
         raise NotADirectoryError(f'{input_dir} is not a directory')
 
-    files = list(iter_pe_files(input_dir))
-    if not files:
-        raise RuntimeError(f'No files found in {input_dir}')
-
+    output_path = args.output if args.output else Path(f'{input_dir.name}_voting_result.csv')
+    output_path = output_path.resolve()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    models_dir = args.models_dir.resolve()
     model_cols = load_model_columns(args.model_columns.resolve())
-    features_df = extract_features(files, model_cols)
-    feature_matrix = prepare_feature_matrix(features_df, model_cols)
+    models = load_models(args.models, models_dir,
+                         mmap_mode=MODEL_MMAP_MODE if args.mmap_models else None, backend=args.backend)
+    model_workers = args.model_workers if args.model_workers > 0 else len(args.models)
+    configure_scoring_threads(models, model_workers, args.cpu_budget)
+    cascade_order = None
+    if args.cascade:
+        cascade_order = rank_models_by_cost(models, args.models, len(model_cols))
+        print(f"[*] Cascade order: {', '.join(cascade_order)}")
+    student = load_student(models_dir) if args.fast else None
+    store = None
+    if args.feature_store:
+        from feature_store import FeatureStore  # imports this module
+        store = FeatureStore(args.feature_store.resolve(), model_cols)
 
-    predictions_df = run_models(feature_matrix, args.models, args.models_dir.resolve())
-    voting_df, _ = run_majority_voting(predictions_df, args.models)
-    output_df = build_output_df(features_df, voting_df)
+    if args.chunk_size > 0:
+        counts = scan_streaming(
+            input_dir, output_path, model_cols, args.models, models_dir, models,
+            chunk_size=args.chunk_size, recursive=args.recursive, workers=workers, resume=args.resume,
+            feature_store=store, model_workers=model_workers, cascade_order=cascade_order,
+            student=student, student_margin=args.fast_margin,
+        )
+        total = sum(counts.get(name, 0) for name in CLASS_NAMES)
+        summary = ', '.join(f"{name}={counts.get(name, 0)}" for name in CLASS_NAMES)
+        print(f'[+] Wrote {output_path} ({total} rows) — {summary}')
+        return
 
-    output_path = args.output if args.output else Path(f'{input_dir.name}_voting_result.csv')
-    output_path = output_path.resolve()
+    files = list(iter_pe_files(input_dir, recursive=args.recursive))
+    if not files:
+        raise RuntimeError(f'No files found in {input_dir}')
+
+    features_df = extract_features(files, model_cols, workers=workers)
+    if store is not None:
+        added = store.append(features_df)
+        print(f'[*] Feature store: {added} new vectors ({len(store)} total)')
+    output_df = score_features(features_df, model_cols, args.models, models_dir, models,
+                               model_workers=model_workers, cascade_order=cascade_order,
+                               student=student, student_margin=args.fast_margin)
     output_df.to_csv(output_path, index=False)
+    if cascade_order is not None:
+        scored = len(ensemble_scored(output_df))
+        _report_skipped(count_skipped_evaluations(output_df, args.models), scored, len(args.models),
+                        len(output_df) - scored)
 
     counts = summarize_classes(output_df.get('ensemble_class', []))
     summary = ', '.join(f"{name}={counts.get(name, 0)}" for name in CLASS_NAMES)
@@ -60,9 +60,11 @@ def run_majority_voting(
     sample_index_column: str = 'sample_index',
 ) -> tuple[pd.DataFrame, Dict[str, float | None]]:
     pred_cols = [f'{name}_pred' for name in model_names]
-    pred_matrix = predictions_df[pred_cols].values
-    votes_for_malware = pred_matrix.sum(axis=1)
-    votes_for_benign = pred_matrix.shape[1] - votes_for_malware
+    # Missing predictions (models a cascade never ran for a sample) cast no vote.
+    pred_matrix = predictions_df[pred_cols].to_numpy(dtype=float, na_value=np.nan)
+    votes_cast = np.count_nonzero(~np.isnan(pred_matrix), axis=1)
+    votes_for_malware = np.nansum(pred_matrix, axis=1).astype(int)
+    votes_for_benign = votes_cast - votes_for_malware
 
     ensemble_pred = np.where(votes_for_malware > votes_for_benign, 1, 0)
     ties = votes_for_malware == votes_for_benign
@@ -100,7 +102,7 @@ def run_majority_voting(
     if avg_scores is not None:
         ensemble_df['ensemble_score'] = avg_scores
     else:
-        ensemble_df['ensemble_score'] = votes_for_malware / pred_matrix.shape[1]
+        ensemble_df['ensemble_score'] = votes_for_malware / np.maximum(votes_cast, 1)
 
     classes, class_ids = classify_prob_series(
         ensemble_df['ensemble_score'].tolist(),
@@ -7,29 +7,40 @@ nodes (default 15) to keep the visualization readable.
 
 Usage:
   python3 extract_callgraph.py /path/to/binary -o out_prefix \
-      [--max-nodes 15] [--start START] [--render]
+      [--max-nodes 15] [--start START] [--selection ranked|bfs] [--render]
 
 Notes:
  - START can be a function name substring (case-insensitive) or an address
    literal like 0x401000 or 4198400. Defaults to the function containing the
    module entry point.
+ - ranked selection (default) prefers imported APIs, suspicious names and
+   busy functions within --max-hops of START over plain BFS order.
  - Rendering uses Graphviz (tries sfdp first, then dot).
 """
 
 from __future__ import annotations
 
 import argparse
+import gzip
+import hashlib
+import heapq
+import json
+import math
 import os
 import platform
 import subprocess
 import sys
 import time
 from collections import deque
-from typing import Iterable
+from itertools import chain
+from typing import TYPE_CHECKING, Iterable
 
-import angr
 import networkx as nx
 
+# angr is imported where a binary is loaded, so cache hits never pay for it.
+if TYPE_CHECKING:
+    import angr
+
 # Performance logging
 VERBOSE = os.environ.get('VERBOSE_TIMING', '').lower() in ('1', 'true', 'yes')
 
@@ -76,17 +87,20 @@ def bfs_limit(graph: nx.DiGraph, start: int, limit: int) -> set[int]:
         return set()
     selected: set[int] = set()
     queue: deque[int] = deque([start])
+    queued: set[int] = {start}
 
     def enqueue(nodes: Iterable[int]) -> None:
         for node in nodes:
-            if node in selected or node in queue:
+            if node in selected or node in queued:
                 continue
             if len(selected) + len(queue) >= limit:
                 return
             queue.append(node)
+            queued.add(node)
 
     while queue and len(selected) < limit:
         node = queue.popleft()
+        queued.discard(node)
         if node in selected:
             continue
         selected.add(node)
@@ -97,49 +111,157 @@ def bfs_limit(graph: nx.DiGraph, start: int, limit: int) -> set[int]:
     return selected
 
 
-def write_dot(graph: nx.DiGraph, cfg, path: str) -> None:
+SELECTIONS = ("ranked", "bfs")
+RANKED_MAX_HOPS = 3
+# ranked_limit weights: a function's score is the sum of the terms that apply
+# to it, minus SCORE_PER_HOP for each call edge between it and the start.
+SCORE_SUSPICIOUS = 4.0
+SCORE_ENTRY = 2.0
+SCORE_IMPORT = 1.5
+SCORE_PER_HOP = 1.0
+# SimProcedures angr adds for targets it could not resolve; not real imports.
+ANGR_PLACEHOLDERS = ("UnresolvableCallTarget", "UnresolvableJumpTarget")
+
+
+def function_score(snapshot: "CallgraphSnapshot", node: int) -> float:
+    """Interest of a function for the picture, before the hop penalty.
+
+    Callees (out-degree) count fully and callers half, so a thunk with one
+    jump scores near zero while a dispatcher stands out; imported APIs and
+    names write_dot flags as suspicious or entry points get fixed bonuses.
+    """
+    score = math.log1p(len(snapshot.succ[node])) + 0.5 * math.log1p(len(snapshot.pred[node]))
+    name = snapshot.raw_name(node)
+    if name is None:
+        return score  # sub_XXXX: no name to classify, never an import
+    if node in snapshot.imports and name not in ANGR_PLACEHOLDERS:
+        score += SCORE_IMPORT
+    kind = classify_function(name)
+    if kind == "suspicious":
+        score += SCORE_SUSPICIOUS
+    elif kind == "entry":
+        score += SCORE_ENTRY
+    return score
+
+
+def ranked_limit(snapshot: "CallgraphSnapshot", start: int, limit: int,
+                 max_hops: int = RANKED_MAX_HOPS) -> set[int]:
+    """Grow a connected selection from ``start``, best-scoring neighbour first.
+
+    Candidates are the callers and callees of the functions already picked,
+    at most ``max_hops`` calls from the start, ranked by ``function_score``
+    less the hop penalty. Work is proportional to the edges of the picked
+    functions, not to the size of the call graph.
+    """
+    if start not in snapshot:
+        return set()
+    selected: set[int] = set()
+    hops: dict[int, int] = {start: 0}
+    order = 0  # ties go to the candidate found first
+    heap: list[tuple[float, int, int, int]] = [(0.0, 0, order, start)]
+    while heap and len(selected) < limit:
+        _, hop, _, node = heapq.heappop(heap)
+        if node in selected or hop > hops[node]:
+            continue  # already picked, or a stale entry from a longer path
+        selected.add(node)
+        if hop == max_hops:
+            continue
+        found = []
+        for neighbour in chain(snapshot.successors(node), snapshot.predecessors(node)):
+            if neighbour in selected or hops.get(neighbour, max_hops + 1) <= hop + 1:
+                continue
+            hops[neighbour] = hop + 1
+            order += 1
+            found.append((-function_score(snapshot, neighbour), order, neighbour))
+        # Only the best ``room`` of one expansion can still be picked: the
+        # rest share their hop count and would lose to them. Keeps hubs with
+        # thousands of callers from flooding the heap.
+        room = limit - len(selected)
+        if len(found) > room:
+            found = heapq.nsmallest(room, found)
+        for neg_score, seq, neighbour in found:
+            heapq.heappush(heap, (neg_score + SCORE_PER_HOP * (hop + 1), hop + 1, seq, neighbour))
+    return selected
+
+
+# Name fragments write_dot and the JSON document flag as suspicious APIs.
+SUSPICIOUS_API_MARKERS = ("inject", "allocate", "remote", "virtual", "create", "write")
+GRAPH_DOCUMENT_VERSION = 1
+
+
+def classify_function(name: str | None) -> str:
+    """Node kind used for styling: entry, suspicious, unknown, standard or unnamed."""
+    if name is None:
+        return "unnamed"
+    lowered = name.lower()
+    if "main" in lowered or "entry" in lowered:
+        return "entry"
+    if any(suspicious in lowered for suspicious in SUSPICIOUS_API_MARKERS):
+        return "suspicious"
+    if name.startswith("sub_"):
+        return "unknown"
+    return "standard"
+
+
+# Modern graph styling with solid backgrounds, rounded corners, custom fonts
+_DOT_NODE_STYLES = {
+    # Entry point - vibrant cyan
+    "entry": 'fillcolor="#0d7377:#14919b", gradientangle=90, color="#2ec4b6", fontcolor="#ffffff", fontsize=12',
+    # Suspicious APIs - red gradient
+    "suspicious": 'fillcolor="#c1121f:#780000", gradientangle=90, color="#ff006e", fontcolor="#ffffff", fontsize=11',
+    # Unknown functions - dark blue
+    "unknown": 'fillcolor="#1e2749", color="#4361ee"',
+    # Standard functions - teal gradient
+    "standard": 'fillcolor="#1a535c:#264653", gradientangle=90, color="#4ecdc4"',
+    "unnamed": 'fillcolor="#1a1f3a", color="#3d5a80"',
+}
+
+
+def write_dot(graph: nx.DiGraph, names: dict[int, str], path: str) -> None:
+    """Write the styled DOT file; nodes missing from ``names`` are labelled by address."""
     with open(path, "w") as f:
-        # Modern graph styling with solid backgrounds, rounded corners, custom fonts
         f.write("digraph callgraph {\n")
         f.write("  // Graph-level styling\n")
         f.write('  graph [bgcolor="#0a0e27", pad="0.5", nodesep="1.0", ranksep="1.2", splines=ortho];\n')
         f.write('  node [shape=box, style="filled,rounded", fontname="Fira Code,Consolas,monospace", fontsize=11, fontcolor="#e0e0e0", penwidth=2];\n')
         f.write('  edge [color="#4a9eff88", penwidth=2.0, arrowsize=0.8];\n')
         f.write("\n")
-        
-        # Node styling with gradient-like colors
+
         for node in graph.nodes():
-            func = cfg.kb.functions.get(node)
-            if func is None:
-                label = hex(node)
-                node_style = 'fillcolor="#1a1f3a", color="#3d5a80"'
-            else:
-                name = func.name or "sub_" + hex(func.addr)[2:]
-                label = f"{name}\\n{hex(func.addr)}"
-                
-                # Color-code based on function type/name patterns
-                if "main" in name.lower() or "entry" in name.lower():
-                    # Entry point - vibrant cyan
-                    node_style = 'fillcolor="#0d7377:#14919b", gradientangle=90, color="#2ec4b6", fontcolor="#ffffff", fontsize=12'
-                elif any(suspicious in name.lower() for suspicious in ["inject", "allocate", "remote", "virtual", "create", "write"]):
-                    # Suspicious APIs - red gradient
-                    node_style = 'fillcolor="#c1121f:#780000", gradientangle=90, color="#ff006e", fontcolor="#ffffff", fontsize=11'
-                elif name.startswith("sub_"):
-                    # Unknown functions - dark blue
-                    node_style = 'fillcolor="#1e2749", color="#4361ee"'
-                else:
-                    # Standard functions - teal gradient
-                    node_style = 'fillcolor="#1a535c:#264653", gradientangle=90, color="#4ecdc4"'
-            
+            name = names.get(node)
+            label = hex(node) if name is None else f"{name}\\n{hex(node)}"
             label = label.replace('"', "'")
-            f.write(f'  "{hex(node)}" [label="{label}", {node_style}];\n')
-        
+            f.write(f'  "{hex(node)}" [label="{label}", {_DOT_NODE_STYLES[classify_function(name)]}];\n')
+
         f.write("\n  // Edges\n")
         for src, dst in graph.edges():
             f.write(f'  "{hex(src)}" -> "{hex(dst)}";\n')
         f.write("}\n")
 
 
+def graph_document(graph: nx.DiGraph, names: dict[int, str], entry: int | None = None) -> dict:
+    """The selected call graph as plain JSON data for client-side layout.
+
+    Nodes carry the same ``kind`` classification write_dot styles by;
+    parallel calls are folded into one edge with a ``count``.
+    """
+    counts: dict[tuple[int, int], int] = {}
+    for src, dst in graph.edges():
+        counts[(src, dst)] = counts.get((src, dst), 0) + 1
+    return {
+        "version": GRAPH_DOCUMENT_VERSION,
+        "entry": hex(entry) if entry is not None and entry in graph else None,
+        "nodes": [{"id": hex(node), "addr": node, "name": names.get(node),
+                   "kind": classify_function(names.get(node))} for node in graph.nodes()],
+        "edges": [{"from": hex(src), "to": hex(dst), "count": count} for (src, dst), count in counts.items()],
+    }
+
+
+def write_json(document: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(document, f, separators=(",", ":"))
+
+
 def render_png(dot_path: str, png_path: str) -> None:
     start = time.time()
     for engine in ("sfdp", "dot"):
@@ -172,31 +294,148 @@ def render_png(dot_path: str, png_path: str) -> None:
     raise RuntimeError("Graphviz rendering failed (engines tried: sfdp, dot)")
 
 
-def main() -> None:
-    global VERBOSE
-    parser = argparse.ArgumentParser(description="Extract a limited-size call graph with angr")
-    parser.add_argument("binary", help="Path to PE/ELF binary")
-    parser.add_argument("-o", "--out", default="callgraph", help="Output prefix")
-    parser.add_argument("--max-nodes", type=int, default=15, help="Maximum number of callgraph nodes to keep")
-    parser.add_argument("--start", default="", help="Start function (name substring or address)")
-    parser.add_argument("--accurate", action="store_true", help="Use CFGAccurate (slower)")
-    parser.add_argument("--render", action="store_true", help="Render PNG with graphviz")
-    parser.add_argument("--no-load-libs", action="store_true", help="Disable auto-loading shared libraries")
-    parser.add_argument("--verbose", action="store_true", help="Enable verbose timing output")
-    args = parser.parse_args()
-    
-    if args.verbose:
-        VERBOSE = True
+GRAPH_CACHE_SUFFIX = ".cg.json.gz"
+GRAPH_CACHE_VERSION = 2
+# Blocks lifted per function in bounded mode before the rest is ignored.
+BOUNDED_MAX_BLOCKS = 2000
+# Ranked selection on a bounded recovery chooses among up to this many times
+# --max-nodes functions within --max-hops of the start.
+BOUNDED_RANKED_FACTOR = 4
 
-    script_start = time.time()
-    bin_path = os.path.abspath(args.binary)
-    if not os.path.exists(bin_path):
-        print("[!] Binary not found:", bin_path)
-        sys.exit(1)
+
+def _resolve_jump(proj: angr.Project, irsb) -> int | None:
+    """Constant target of a call/jump, following ``[slot]`` through the import table."""
+    import pyvex
+
+    target = irsb.next
+    if isinstance(target, pyvex.expr.Const):
+        return target.con.value
+    if not isinstance(target, pyvex.expr.RdTmp):
+        return None
+    for stmt in irsb.statements:
+        if (isinstance(stmt, pyvex.stmt.WrTmp) and stmt.tmp == target.tmp
+                and isinstance(stmt.data, pyvex.expr.Load) and isinstance(stmt.data.addr, pyvex.expr.Const)):
+            try:
+                return proj.loader.memory.unpack_word(stmt.data.addr.con.value)
+            except KeyError:
+                return None
+    return None
+
+
+def _symbol_name(proj: angr.Project, addr: int) -> str | None:
+    symbol = proj.loader.find_symbol(addr)
+    if symbol is not None and symbol.name:
+        return symbol.name
+    if proj.is_hooked(addr):
+        return proj.hooked_by(addr).display_name
+    return None
+
+
+def _function_calls(proj: angr.Project, func_addr: int) -> list[int]:
+    """Callees of the function at ``func_addr``, in the order its blocks reach them.
+
+    Follows constant intra-procedural jumps and call fall-throughs; jumps
+    to imports (thunks) count as calls. Indirect jumps are not resolved.
+    """
+    calls: list[int] = []
+    seen: set[int] = set()
+    pending: deque[int] = deque([func_addr])
+    while pending and len(seen) < BOUNDED_MAX_BLOCKS:
+        addr = pending.popleft()
+        if addr in seen or proj.is_hooked(addr):
+            continue
+        seen.add(addr)
+        try:
+            block = proj.factory.block(addr)
+            irsb = block.vex
+        except Exception:
+            continue
+        if block.size == 0:
+            continue
+        jumpkind = irsb.jumpkind
+        if jumpkind == "Ijk_Call":
+            callee = _resolve_jump(proj, irsb)
+            if callee is not None and callee not in calls:
+                calls.append(callee)
+            no_return = callee is not None and proj.is_hooked(callee) and proj.hooked_by(callee).NO_RET
+            if not no_return:
+                pending.append(addr + block.size)
+        elif jumpkind == "Ijk_Boring":
+            targets = irsb.constant_jump_targets
+            if not targets:
+                callee = _resolve_jump(proj, irsb)
+                if callee is not None and proj.is_hooked(callee) and callee not in calls:
+                    calls.append(callee)
+            pending.extend(sorted(targets))
+    return calls
+
+
+def bounded_callgraph(proj: angr.Project, start: int, limit: int,
+                      max_hops: int | None = None) -> tuple[nx.DiGraph, dict[int, str]]:
+    """Recover the call graph around ``start`` one function at a time.
+
+    Functions are discovered breadth-first through their callees and
+    discovery stops once ``limit`` functions are known, so only those
+    functions are ever lifted. With ``max_hops`` only functions at most that
+    many calls from ``start`` are lifted; their callees are still added, so
+    each of them keeps its full callee count for ``function_score``. Unlike
+    ``bfs_limit`` on a full CFG, callers of ``start`` are not found.
+    """
+    selected: list[int] = [start]
+    known: set[int] = {start}
+    depth: dict[int, int] = {start: 0}
+    graph = nx.DiGraph()
+    graph.add_node(start)
+    for func_addr in selected:  # grows while we iterate
+        if proj.is_hooked(func_addr):
+            continue  # imports have no body to lift
+        if max_hops is not None and depth[func_addr] > max_hops:
+            continue
+        for callee in _function_calls(proj, func_addr):
+            if callee not in known:
+                if len(selected) >= limit:
+                    continue
+                known.add(callee)
+                selected.append(callee)
+                depth[callee] = depth[func_addr] + 1
+            graph.add_edge(func_addr, callee)
+
+    names = {}
+    for addr in graph.nodes():
+        name = _symbol_name(proj, addr)
+        if name is None:
+            name = "_start" if addr == proj.entry else "sub_" + hex(addr)[2:]
+        names[addr] = name
+    return graph, names
+
+
+def parse_start_symbol(start: str, proj: angr.Project) -> int | None:
+    """``parse_start`` without a CFG: address literals or exported symbol names."""
+    start = start.strip()
+    if not start:
+        return None
+    try:
+        if start.lower().startswith("0x"):
+            return int(start, 16)
+        return int(start)
+    except ValueError:
+        target = start.lower()
+        for symbol in proj.loader.main_object.symbols:
+            if symbol.name and target in symbol.name.lower() and symbol.is_function:
+                return symbol.rebased_addr
+    return None
+
+
+class CallgraphError(RuntimeError):
+    """The binary loaded but no call graph could be selected from it."""
+
+
+def load_project(bin_path: str, no_load_libs: bool = False) -> angr.Project:
+    import angr
 
     # Windows-specific optimizations to prevent hangs
     proj_kwargs = {}
-    if args.no_load_libs or IS_WINDOWS:
+    if no_load_libs or IS_WINDOWS:
         # On Windows, auto_load_libs causes severe performance issues and hangs
         # This is because Windows DLL loading is much slower than Linux .so loading
         proj_kwargs["auto_load_libs"] = False
@@ -213,11 +452,14 @@ def main() -> None:
     load_start = time.time()
     proj = angr.Project(bin_path, **proj_kwargs)
     log_time("angr.Project loading", load_start)
+    return proj
 
-    print("[*] Building CFG ({} mode)...".format("accurate" if args.accurate else "fast"))
+
+def build_cfg(proj: angr.Project, accurate: bool = False):
+    print("[*] Building CFG ({} mode)...".format("accurate" if accurate else "fast"))
     cfg_start = time.time()
     
-    if args.accurate:
+    if accurate:
         cfg = proj.analyses.CFGAccurate()
     else:
         # Windows-specific CFGFast optimizations
@@ -233,56 +475,422 @@ def main() -> None:
         else:
             cfg = proj.analyses.CFGFast()
     
-    log_time(f"CFG building ({'accurate' if args.accurate else 'fast'})", cfg_start)
+    log_time(f"CFG building ({'accurate' if accurate else 'fast'})", cfg_start)
+    return cfg
+
+
+class CallgraphSnapshot:
+    """A recovered function call graph, detached from angr.
+
+    Keeps what node selection and DOT writing need: nodes in recovery order,
+    ordered successor (with edge multiplicity) and predecessor lists, the
+    function names and the entry function. Saved to the graph cache, it
+    serves any new ``--max-nodes``/``--start`` selection or re-render
+    without loading the binary again, and selects exactly what a fresh
+    recovery would.
+    """
+
+    def __init__(self, mode: str, nodes: list[int], succ: dict[int, list[list[int]]],
+                 pred: dict[int, list[int]], functions: list[list], entry: int | None,
+                 start: str = "", limit: int | None = None, complete: bool = True,
+                 imports: Iterable[int] = (), max_hops: int | None = None):
+        self.mode = mode
+        self.nodes = nodes
+        self.succ = succ
+        self.pred = pred
+        # [addr, raw name or None] in the CFG's function order (parse_start's search order).
+        self.functions = functions
+        self.imports = set(imports)
+        self.entry = entry
+        # Bounded snapshots only hold the first ``limit`` functions found from
+        # ``start``, lifted up to ``max_hops`` calls away (None: no hop limit).
+        self.start = start
+        self.limit = limit
+        self.complete = complete
+        self.max_hops = max_hops
+        self._graph: nx.MultiDiGraph | None = None
+        self._names: dict[int, str | None] | None = None
+
+    @classmethod
+    def from_graph(cls, graph: nx.DiGraph, functions: list[list], entry: int | None, mode: str,
+                   **kwargs) -> "CallgraphSnapshot":
+        nodes = list(graph.nodes())
+        multi = graph.is_multigraph()
+        succ = {n: [[v, len(keys) if multi else 1] for v, keys in graph.adj[n].items()] for n in nodes}
+        pred = {n: list(graph.pred[n]) for n in nodes}
+        return cls(mode, nodes, succ, pred, functions, entry, **kwargs)
+
+    def __contains__(self, node: int) -> bool:
+        return node in self.succ
+
+    def successors(self, node: int) -> list[int]:
+        return [v for v, _ in self.succ[node]]
+
+    def predecessors(self, node: int) -> list[int]:
+        return self.pred[node]
+
+    def resolve_start(self, start: str) -> int | None:
+        """``parse_start`` over the snapshot's function names."""
+        start = start.strip()
+        if not start:
+            return None
+        try:
+            if start.lower().startswith("0x"):
+                return int(start, 16)
+            return int(start)
+        except ValueError:
+            target = start.lower()
+            for addr, name in self.functions:
+                if name and target in name.lower():
+                    return addr
+        return None
 
-    chosen_addr: int | None
-    if args.start:
-        chosen_addr = parse_start(args.start, cfg)
-        if chosen_addr is None:
-            print("[!] Could not resolve start function from:", args.start)
-            sys.exit(1)
-    else:
-        chosen_addr = find_entry_function(cfg, proj.entry)
-        if chosen_addr is None:
-            print("[!] Could not find function containing entry point; specify --start explicitly.")
-            sys.exit(1)
+    def raw_name(self, node: int) -> str | None:
+        """The recovered name, None for unnamed functions and non-functions."""
+        if self._names is None:
+            self._names = {addr: name for addr, name in self.functions}
+        return self._names.get(node)
+
+    def name(self, node: int) -> str | None:
+        """Display name as in the DOT labels; None for nodes that are not functions."""
+        name = self.raw_name(node)
+        if name is None and node not in self._names:
+            return None
+        return name or "sub_" + hex(node)[2:]
+
+    def names(self, nodes: Iterable[int]) -> dict[int, str]:
+        return {n: self.name(n) for n in nodes if self.name(n) is not None}
+
+    def graph(self) -> nx.MultiDiGraph:
+        """The call graph as networkx, with the recovered node and successor order."""
+        if self._graph is None:
+            graph = nx.MultiDiGraph()
+            graph.add_nodes_from(self.nodes)
+            graph.add_edges_from((node, dst) for node in self.nodes
+                                 for dst, count in self.succ[node] for _ in range(count))
+            self._graph = graph
+        return self._graph
+
+    def subgraph(self, selected: set[int]) -> nx.MultiDiGraph:
+        # The same view-and-copy as on the live CFG, so node and edge order match.
+        return self.graph().subgraph(selected).copy()
+
+    def save(self, path: str) -> None:
+        doc = {
+            "version": GRAPH_CACHE_VERSION,
+            "mode": self.mode,
+            "entry": self.entry,
+            "start": self.start,
+            "limit": self.limit,
+            "complete": self.complete,
+            "max_hops": self.max_hops,
+            "nodes": self.nodes,
+            "succ": [self.succ[n] for n in self.nodes],
+            "pred": [self.pred[n] for n in self.nodes],
+            "functions": self.functions,
+            "imports": sorted(self.imports),
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as fh:
+            json.dump(doc, fh, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CallgraphSnapshot | None":
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                doc = json.load(fh)
+        except (OSError, EOFError, ValueError):
+            return None
+        if doc.get("version") != GRAPH_CACHE_VERSION:
+            return None
+        nodes = doc["nodes"]
+        return cls(doc["mode"], nodes, dict(zip(nodes, doc["succ"])), dict(zip(nodes, doc["pred"])),
+                   doc["functions"], doc["entry"], start=doc["start"], limit=doc["limit"],
+                   complete=doc["complete"], imports=doc["imports"], max_hops=doc.get("max_hops"))
+
+
+def graph_cache_path(cache_dir: str, digest: str, mode: str) -> str:
+    return os.path.join(cache_dir, f"{digest}.{mode}{GRAPH_CACHE_SUFFIX}")
+
+
+def _snapshot_mode(accurate: bool, bounded: bool, no_load_libs: bool) -> str:
+    mode = "bounded" if bounded else ("accurate" if accurate else "fast")
+    return mode + ("-nolibs" if no_load_libs or IS_WINDOWS else "")
+
+
+def _bounded_recovery(max_nodes: int, selection: str, max_hops: int) -> tuple[int, int | None]:
+    """``(limit, max_hops)`` for ``bounded_callgraph`` to serve a selection."""
+    limit = max(max_nodes, 1)
+    if selection == "bfs":
+        return limit, None
+    return limit * BOUNDED_RANKED_FACTOR, max_hops
+
+
+def _covers(snapshot: CallgraphSnapshot, limit: int, max_hops: int | None) -> bool:
+    """Whether a bounded snapshot holds what a fresh ``_bounded_recovery`` would."""
+    if snapshot.max_hops is not None and (max_hops is None or max_hops > snapshot.max_hops):
+        return False  # lifted too few hops
+    if snapshot.complete:
+        return True
+    if max_hops is None:
+        # BFS discovery order: a smaller budget is a prefix.
+        return limit <= (snapshot.limit or 0)
+    return snapshot.max_hops == max_hops and snapshot.limit == limit
+
+
+def _cached_snapshot(path: str, bounded: bool, start: str, max_nodes: int,
+                     selection: str = "ranked", max_hops: int = RANKED_MAX_HOPS) -> CallgraphSnapshot | None:
+    snapshot = CallgraphSnapshot.load(path)
+    if snapshot is None:
+        return None
+    if bounded and (snapshot.start != start
+                    or not _covers(snapshot, *_bounded_recovery(max_nodes, selection, max_hops))):
+        return None  # recovered from another start, or stopped short of this budget
+    return snapshot
+
+
+def _snapshot_from_cfg(proj: angr.Project, accurate: bool, mode: str) -> CallgraphSnapshot:
+    cfg = build_cfg(proj, accurate)
+    functions = [[f.addr, f.name or None] for f in cfg.kb.functions.values()]
+    imports = [f.addr for f in cfg.kb.functions.values() if f.is_simprocedure or f.is_plt]
+    entry = find_entry_function(cfg, proj.entry)
+    return CallgraphSnapshot.from_graph(cfg.kb.callgraph, functions, entry, mode, imports=imports)
 
-    callgraph = cfg.kb.callgraph
-    if chosen_addr not in callgraph:
-        print(f"[!] Start function {hex(chosen_addr)} not present in call graph. Try --accurate or another start address.")
-        sys.exit(1)
 
-    print(f"[*] Starting at {hex(chosen_addr)}, limiting to {args.max_nodes} nodes")
-    bfs_start = time.time()
-    selected = bfs_limit(callgraph, chosen_addr, max(args.max_nodes, 1))
-    log_time("BFS node selection", bfs_start)
+def _snapshot_bounded(proj: angr.Project, start: str, max_nodes: int, mode: str,
+                      selection: str = "ranked", max_hops: int = RANKED_MAX_HOPS) -> CallgraphSnapshot:
+    if start:
+        chosen_addr = parse_start_symbol(start, proj)
+        if chosen_addr is None:
+            raise CallgraphError(f"Could not resolve start function from: {start} "
+                                 "(bounded mode knows addresses and exported names only)")
+    else:
+        chosen_addr = proj.entry
+
+    limit, hops = _bounded_recovery(max_nodes, selection, max_hops)
+    within = "" if hops is None else f" within {hops} hops"
+    print(f"[*] Bounded recovery from {hex(chosen_addr)}, stopping at {limit} nodes{within}")
+    recover_start = time.time()
+    graph, names = bounded_callgraph(proj, chosen_addr, limit, hops)
+    log_time("Bounded call graph recovery", recover_start)
+    functions = [[addr, names[addr]] for addr in graph.nodes()]
+    return CallgraphSnapshot.from_graph(graph, functions, chosen_addr, mode, start=start, limit=limit,
+                                        complete=graph.number_of_nodes() < limit,
+                                        imports=[addr for addr in graph.nodes() if proj.is_hooked(addr)],
+                                        max_hops=hops)
+
+
+def select_subgraph(snapshot: CallgraphSnapshot, start: str, max_nodes: int,
+                    selection: str = "ranked", max_hops: int = RANKED_MAX_HOPS):
+    """Pick the ``max_nodes`` neighbourhood of the start.
+
+    ``selection`` is ``ranked`` (``ranked_limit`` within ``max_hops``) or
+    ``bfs`` (``bfs_limit``, plain breadth-first order). A bounded snapshot
+    was recovered from its start for the same ``selection`` (see
+    ``_bounded_recovery``); ranked selection sees only the callers found
+    inside it.
+
+    Returns ``(subgraph, names, start_addr)``.
+    """
+    limit = max(max_nodes, 1)
+    chosen_addr: int | None
+    if snapshot.limit is not None:
+        chosen_addr = snapshot.entry  # resolved during recovery
+    else:
+        if start:
+            chosen_addr = snapshot.resolve_start(start)
+            if chosen_addr is None:
+                raise CallgraphError(f"Could not resolve start function from: {start}")
+        else:
+            chosen_addr = snapshot.entry
+            if chosen_addr is None:
+                raise CallgraphError("Could not find function containing entry point; specify --start explicitly.")
+
+        if chosen_addr not in snapshot:
+            raise CallgraphError(f"Start function {hex(chosen_addr)} not present in call graph. "
+                                 "Try --accurate or another start address.")
+
+    print(f"[*] Starting at {hex(chosen_addr)}, limiting to {max_nodes} nodes ({selection} selection)")
+    select_start = time.time()
+    if selection == "bfs" and snapshot.limit is not None:
+        # Bounded discovery order is BFS order, so a smaller budget is a prefix.
+        selected = set(snapshot.nodes[:limit])
+    elif selection == "bfs":
+        selected = bfs_limit(snapshot, chosen_addr, limit)
+    else:
+        selected = ranked_limit(snapshot, chosen_addr, limit, max_hops)
+    log_time(f"{selection} node selection", select_start)
 
     if not selected:
-        print("[!] No nodes selected. Exiting.")
-        sys.exit(1)
+        raise CallgraphError("No nodes selected.")
 
     subgraph_start = time.time()
-    subgraph = callgraph.subgraph(selected).copy()
+    subgraph = snapshot.subgraph(selected)
     log_time("Subgraph creation", subgraph_start)
+    return subgraph, snapshot.names(subgraph.nodes()), chosen_addr
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract(
+    binary: str,
+    out_prefix: str,
+    max_nodes: int = 15,
+    start: str = "",
+    accurate: bool = False,
+    render: bool = False,
+    no_load_libs: bool = False,
+    bounded: bool = False,
+    graph_cache: str | None = None,
+    json_doc: bool = False,
+    svg: bool = False,
+    selection: str = "ranked",
+    max_hops: int = RANKED_MAX_HOPS,
+) -> dict:
+    """Write ``<out_prefix>.callgraph.dot`` (and ``.png`` with ``render``).
+
+    ``json_doc`` also writes ``.callgraph.json`` (see ``graph_document``)
+    and ``svg`` draws ``.callgraph.svg`` in-process with callgraph_svg.py;
+    neither needs Graphviz.
+
+    ``bounded`` skips whole-program CFG recovery and lifts only the
+    functions near the start (see ``bounded_callgraph``); either way
+    ``selection`` picks the nodes (see ``select_subgraph``).
+    With a ``graph_cache`` directory the recovered call graph is stored as
+    ``<sha256>.<mode>.cg.json.gz`` and later selections reuse it.
+
+    Returns ``{"dot", "png", "json", "svg", "nodes", "edges", "graph_cached"}``;
+    outputs not written are None. Raises :class:`CallgraphError` when no graph can
+    be selected. Used by ``main`` and by the warm workers in callgraph_pool.py.
+    """
+    bin_path = os.path.abspath(binary)
+    if not os.path.exists(bin_path):
+        raise FileNotFoundError(f"Binary not found: {bin_path}")
+
+    mode = _snapshot_mode(accurate, bounded, no_load_libs)
+    cache_path = None
+    snapshot = None
+    if graph_cache:
+        cache_path = graph_cache_path(graph_cache, file_sha256(bin_path), mode)
+        cache_start = time.time()
+        snapshot = _cached_snapshot(cache_path, bounded, start, max_nodes, selection, max_hops)
+        if snapshot is not None:
+            os.utime(cache_path)  # LRU: last use, see callgraph_jobs.prune_cache
+            print("[*] Using cached call graph:", cache_path)
+            log_time("Graph cache load", cache_start)
+
+    graph_cached = snapshot is not None
+    if snapshot is None:
+        proj = load_project(bin_path, no_load_libs)
+        if bounded:
+            snapshot = _snapshot_bounded(proj, start, max_nodes, mode, selection, max_hops)
+        else:
+            snapshot = _snapshot_from_cfg(proj, accurate, mode)
+        if cache_path is not None:
+            try:
+                os.makedirs(graph_cache, exist_ok=True)
+                snapshot.save(cache_path)
+            except OSError as exc:
+                print("[!] Could not write graph cache:", exc)
+
+    subgraph, names, start_addr = select_subgraph(snapshot, start, max_nodes, selection, max_hops)
     print(f"[*] Subgraph nodes={subgraph.number_of_nodes()} edges={subgraph.number_of_edges()}")
 
-    dot_path = args.out + ".callgraph.dot"
+    dot_path = out_prefix + ".callgraph.dot"
     write_start = time.time()
-    write_dot(subgraph, cfg, dot_path)
+    write_dot(subgraph, names, dot_path)
     log_time("DOT file writing", write_start)
     print("[*] DOT written to", dot_path)
 
-    if args.render:
-        png_path = args.out + ".callgraph.png"
+    result = {
+        "dot": dot_path,
+        "png": None,
+        "json": None,
+        "svg": None,
+        "nodes": subgraph.number_of_nodes(),
+        "edges": subgraph.number_of_edges(),
+        "graph_cached": graph_cached,
+    }
+    if json_doc or svg:
+        document = graph_document(subgraph, names, start_addr)
+    if json_doc:
+        result["json"] = out_prefix + ".callgraph.json"
+        write_json(document, result["json"])
+        print("[*] JSON written to", result["json"])
+    if svg:
+        from callgraph_svg import write_svg
+
+        svg_start = time.time()
+        try:
+            write_svg(document, out_prefix + ".callgraph.svg")
+            result["svg"] = out_prefix + ".callgraph.svg"
+            print("[*] SVG written to", result["svg"])
+        except ValueError as exc:
+            print("[!] SVG not written:", exc)
+        log_time("SVG rendering", svg_start)
+    if render:
+        png_path = out_prefix + ".callgraph.png"
         try:
             render_png(dot_path, png_path)
             print("[*] PNG written to", png_path)
+            result["png"] = png_path
         except Exception as exc:
-            # Don't fail the entire script if rendering fails
+            # Don't fail the entire extraction if rendering fails
             print("[!] Rendering failed:", exc)
             if VERBOSE:
                 print("[!] DOT file was created successfully, but PNG rendering requires Graphviz", file=sys.stderr)
-            # Exit with 0 since DOT file was created successfully
+    return result
+
+
+def main() -> None:
+    global VERBOSE
+    parser = argparse.ArgumentParser(description="Extract a limited-size call graph with angr")
+    parser.add_argument("binary", help="Path to PE/ELF binary")
+    parser.add_argument("-o", "--out", default="callgraph", help="Output prefix")
+    parser.add_argument("--max-nodes", type=int, default=15, help="Maximum number of callgraph nodes to keep")
+    parser.add_argument("--start", default="", help="Start function (name substring or address)")
+    parser.add_argument("--selection", choices=SELECTIONS, default="ranked",
+                        help="ranked: most interesting functions near the start (default); bfs: breadth-first order")
+    parser.add_argument("--max-hops", type=int, default=RANKED_MAX_HOPS,
+                        help=f"Calls away from the start ranked selection may reach (default: {RANKED_MAX_HOPS})")
+    parser.add_argument("--accurate", action="store_true", help="Use CFGAccurate (slower)")
+    parser.add_argument("--bounded", action="store_true",
+                        help="Recover only the functions near the start (no full CFG)")
+    parser.add_argument("--render", action="store_true", help="Render PNG with graphviz")
+    parser.add_argument("--json", action="store_true",
+                        help="Also write <out>.callgraph.json (nodes, edges, names, kinds) for client-side layout")
+    parser.add_argument("--svg", action="store_true",
+                        help="Also draw <out>.callgraph.svg in-process (no Graphviz; small graphs only)")
+    parser.add_argument("--no-load-libs", action="store_true", help="Disable auto-loading shared libraries")
+    parser.add_argument("--graph-cache", metavar="DIR",
+                        help="Keep the recovered call graph in DIR and reuse it for later selections")
+    parser.add_argument("--verbose", action="store_true", help="Enable verbose timing output")
+    args = parser.parse_args()
+    
+    if args.verbose:
+        VERBOSE = True
+
+    script_start = time.time()
+    bin_path = os.path.abspath(args.binary)
+    if not os.path.exists(bin_path):
+        print("[!] Binary not found:", bin_path)
+        sys.exit(1)
+
+    try:
+        extract(bin_path, args.out, max_nodes=args.max_nodes, start=args.start, accurate=args.accurate,
+                render=args.render, no_load_libs=args.no_load_libs, bounded=args.bounded,
+                graph_cache=args.graph_cache, json_doc=args.json, svg=args.svg,
+                selection=args.selection, max_hops=args.max_hops)
+    except CallgraphError as exc:
+        print("[!]", exc)
+        sys.exit(1)
     
     log_time("TOTAL script execution", script_start)
     sys.exit(0)  # Explicit success exit
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""Persistent store of extracted feature vectors, keyed by file SHA-256.
+
+Feature rows are appended in ``model_columns`` order as fixed-width ``.npy``
+segments, so a retrained ensemble can rescore the whole history as matrix
+operations without reopening a single PE file::
+
+    python ensemble_predict_dir.py samples/ --feature-store feature_store/
+    python feature_store.py rescore feature_store/ --output rescored.csv
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from classification_utils import CLASS_NAMES, summarize_classes
+from ensemble_pipeline.aggregate_predictions import DEFAULT_MODELS
+from ensemble_predict_dir import (DEFAULT_MODEL_COLS, DEFAULT_MODELS_DIR,
+                                  MODEL_MMAP_MODE, build_output_df,
+                                  configure_scoring_threads,
+                                  count_skipped_evaluations,
+                                  load_model_columns, load_models,
+                                  prepare_feature_matrix, rank_models_by_cost,
+                                  run_models, run_models_cascade)
+from ensemble_vote import run_majority_voting
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_STORE_DIR = ROOT / 'feature_store'
+COLUMNS_FILE = 'columns.json'
+LOCK_FILE = 'store.lock'
+FEATURE_DTYPE = np.float64
+DEFAULT_RESCORE_BATCH = 65536
+
+
+def _segment_files(store_dir: Path, segment_id: int) -> Dict[str, Path]:
+    stem = f'segment-{segment_id:06d}'
+    return {
+        'features': store_dir / f'{stem}.features.npy',
+        'sha256': store_dir / f'{stem}.sha256.npy',
+        'paths': store_dir / f'{stem}.paths.npy',
+        # A merged segment's marker waits here until its sources are gone.
+        'pending': store_dir / f'{stem}.sha256.npy.pending',
+    }
+
+
+def _save_atomic(path: Path, array: np.ndarray) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as fh:
+        np.save(fh, array, allow_pickle=False)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def _concatenate_atomic(path: Path, sources: Sequence[Path]) -> None:
+    """Write the rows of the ``.npy`` ``sources`` to ``path``, one mmapped source at a time."""
+    parts = [np.load(source, mmap_mode='r') for source in sources]
+    shape = (sum(len(part) for part in parts),) + parts[0].shape[1:]
+    tmp_path = path.with_name(path.name + '.tmp')
+    merged = np.lib.format.open_memmap(tmp_path, mode='w+', shape=shape,
+                                       dtype=np.result_type(*[part.dtype for part in parts]))
+    start = 0
+    for part in parts:
+        merged[start:start + len(part)] = part
+        start += len(part)
+    merged.flush()
+    del merged, parts
+    with open(tmp_path, 'rb+') as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+class FeatureStore:
+    """Append-only directory of feature segments.
+
+    Each segment is three aligned arrays: ``features`` (n x columns, float64
+    so stored rows score exactly like freshly extracted ones), ``sha256``
+    (fixed-width ASCII digests) and ``paths`` (where each file was first
+    seen). The ``sha256`` array is written last and acts as the commit
+    marker; a segment interrupted before it is ignored and overwritten.
+    ``compact`` stages the merged marker as ``.pending`` and commits it only
+    after the merged segments are removed; opening the store finishes a
+    compaction a crash interrupted, so no row is ever visible twice.
+    Appends and compaction hold an ``fcntl`` lock on ``store.lock``, so a
+    scan can write to the store while another process compacts it.
+    """
+
+    def __init__(self, store_dir: Path, columns: Sequence[str] | None = None):
+        self.store_dir = store_dir
+        columns_path = store_dir / COLUMNS_FILE
+        if columns_path.exists():
+            with open(columns_path, 'r') as fh:
+                self.columns: List[str] = json.load(fh)
+            if columns is not None and list(columns) != self.columns:
+                raise ValueError(
+                    f'{store_dir} holds vectors for a different model_columns.json; '
+                    'use a new store directory for the new feature layout'
+                )
+        elif columns is not None:
+            store_dir.mkdir(parents=True, exist_ok=True)
+            self.columns = list(columns)
+            with open(columns_path, 'w') as fh:
+                json.dump(self.columns, fh, indent=2)
+        else:
+            raise FileNotFoundError(f'No feature store at {store_dir}')
+        self._known: Set[str] | None = None
+        with self._locked():
+            for pending in store_dir.glob('segment-*.sha256.npy.pending'):
+                self._commit_merged(int(pending.name.split('.')[0].split('-')[1]))
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the store's write lock, shared with every other process using it."""
+        try:
+            import fcntl
+        except ImportError:  # Windows: no advisory locks; run one writer at a time
+            yield
+            return
+        with open(self.store_dir / LOCK_FILE, 'a') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def segment_ids(self) -> List[int]:
+        ids = []
+        for path in self.store_dir.glob('segment-*.sha256.npy'):
+            ids.append(int(path.name.split('.')[0].split('-')[1]))
+        return sorted(ids)
+
+    def iter_segments(self) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Yield ``(features, sha256, paths)`` per segment; features are memory-mapped."""
+        for segment_id in self.segment_ids():
+            files = _segment_files(self.store_dir, segment_id)
+            features = np.load(files['features'], mmap_mode='r')
+            digests = np.load(files['sha256'])
+            paths = np.load(files['paths'])
+            yield features, digests, paths
+
+    def known_hashes(self) -> Set[str]:
+        if self._known is None:
+            self._known = set()
+            for _, digests, _ in self.iter_segments():
+                self._known.update(digests.astype(str).tolist())
+        return self._known
+
+    def __len__(self) -> int:
+        return len(self.known_hashes())
+
+    def append(self, features_df: pd.DataFrame) -> int:
+        """Store rows of ``features_df`` (needs ``sha256`` and ``sample_path``) not seen before.
+
+        Returns the number of new vectors written.
+        """
+        known = self.known_hashes()
+        digests = features_df['sha256'].astype(str).to_numpy()
+        keep = np.zeros(len(digests), dtype=bool)
+        for i, digest in enumerate(digests):
+            if digest not in known:
+                known.add(digest)
+                keep[i] = True
+        if not keep.any():
+            return 0
+
+        new_rows = features_df.loc[keep]
+        matrix = prepare_feature_matrix(new_rows.copy(), self.columns).astype(FEATURE_DTYPE)
+        # Locked so a concurrent scan or compact cannot pick the same segment id.
+        with self._locked():
+            ids = self.segment_ids()
+            files = _segment_files(self.store_dir, ids[-1] + 1 if ids else 0)
+            _save_atomic(files['features'], matrix)
+            _save_atomic(files['paths'], new_rows['sample_path'].astype(str).to_numpy().astype(np.str_))
+            _save_atomic(files['sha256'], digests[keep].astype('S64'))
+        return int(keep.sum())
+
+    def compact(self) -> None:
+        """Merge all segments into one, so rescoring reads a single file.
+
+        Appends from other processes wait until the merge is committed.
+        """
+        with self._locked():
+            ids = self.segment_ids()
+            if len(ids) < 2:
+                return
+            sources = [_segment_files(self.store_dir, segment_id) for segment_id in ids]
+            files = _segment_files(self.store_dir, ids[-1] + 1)
+            # Copy through memory maps so a store of millions of rows never sits in RAM.
+            for key in ('features', 'paths'):
+                _concatenate_atomic(files[key], [source[key] for source in sources])
+            _concatenate_atomic(files['pending'], [source['sha256'] for source in sources])
+            self._commit_merged(ids[-1] + 1)
+
+    def _commit_merged(self, merged_id: int) -> None:
+        """Remove the segments merged into ``merged_id``, then commit its marker."""
+        merged = {int(path.name.split('.')[0].split('-')[1])
+                  for path in self.store_dir.glob('segment-*.npy')}
+        for segment_id in sorted(i for i in merged if i < merged_id):
+            # Drop the commit marker first so a half-removed segment stays invisible.
+            for key in ('sha256', 'features', 'paths'):
+                _segment_files(self.store_dir, segment_id)[key].unlink(missing_ok=True)
+        files = _segment_files(self.store_dir, merged_id)
+        os.replace(files['pending'], files['sha256'])
+
+
+def _align_columns(features: np.ndarray, store_columns: List[str], model_cols: List[str]) -> np.ndarray:
+    if store_columns == model_cols:
+        return features
+    index = {name: i for i, name in enumerate(store_columns)}
+    aligned = np.zeros((features.shape[0], len(model_cols)), dtype=features.dtype)
+    for j, name in enumerate(model_cols):
+        if name in index:
+            aligned[:, j] = features[:, index[name]]
+    return aligned
+
+
+def rescore(
+    store: FeatureStore,
+    output_path: Path,
+    model_cols: List[str],
+    model_names: Sequence[str],
+    models_dir: Path,
+    models: Dict[str, object],
+    batch_size: int = DEFAULT_RESCORE_BATCH,
+    model_workers: int = 1,
+    cascade_order: Sequence[str] | None = None,
+) -> Dict[str, int]:
+    """Score every stored vector with the current ensemble and write a voting CSV.
+
+    Columns the models expect but the store lacks are scored as 0, the same
+    default ``prepare_feature_matrix`` applies to fresh extractions. With
+    ``cascade_order`` each batch goes through ``run_models_cascade``.
+    """
+    missing = [c for c in model_cols if c not in store.columns]
+    if missing:
+        print(f"[!] Warning: {len(missing)} model columns are not in the store and score as 0: {missing[:5]}")
+
+    counts: Dict[str, int] = {}
+    skipped = 0
+    sample_index = 0
+    with open(output_path, 'w', newline='') as out:
+        for features, digests, paths in store.iter_segments():
+            for start in range(0, features.shape[0], batch_size):
+                matrix = _align_columns(np.asarray(features[start:start + batch_size]), store.columns, model_cols)
+                n = matrix.shape[0]
+                indices = np.arange(sample_index, sample_index + n, dtype=int)
+                if cascade_order is not None:
+                    predictions_df = run_models_cascade(matrix, model_names, models, cascade_order)
+                else:
+                    predictions_df = run_models(matrix, model_names, models_dir, models=models,
+                                                workers=model_workers)
+                predictions_df['sample_index'] = indices
+                voting_df, _ = run_majority_voting(predictions_df, model_names)
+                batch_paths = paths[start:start + n].astype(str)
+                meta_df = pd.DataFrame({
+                    'sample_index': indices,
+                    'sample_name': [Path(p).name for p in batch_paths],
+                    'sample_path': batch_paths,
+                })
+                output_df = build_output_df(meta_df, voting_df)
+                output_df.insert(3, 'sha256', digests[start:start + n].astype(str))
+                output_df.to_csv(out, index=False, header=sample_index == 0)
+                skipped += count_skipped_evaluations(output_df, model_names)
+                for name, count in summarize_classes(output_df.get('ensemble_class', [])).items():
+                    counts[name] = counts.get(name, 0) + count
+                sample_index += n
+    if cascade_order is not None:
+        total = sample_index * len(model_names)
+        print(f'[*] Cascade skipped {skipped} of {total} model evaluations')
+    return counts
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Inspect or rescore the persistent feature store.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    info = sub.add_parser('info', help='Show store size and feature layout')
+    info.add_argument('store_dir', type=Path, nargs='?', default=DEFAULT_STORE_DIR)
+
+    compact = sub.add_parser('compact', help='Merge all segments into one')
+    compact.add_argument('store_dir', type=Path, nargs='?', default=DEFAULT_STORE_DIR)
+
+    rescore_p = sub.add_parser('rescore', help='Score stored vectors with the current ensemble')
+    rescore_p.add_argument('store_dir', type=Path, nargs='?', default=DEFAULT_STORE_DIR)
+    rescore_p.add_argument('--output', type=Path, default=Path('rescored_voting_result.csv'),
+                           help='Where to write the voting CSV')
+    rescore_p.add_argument('--models-dir', type=Path, default=DEFAULT_MODELS_DIR,
+                           help='Directory holding trained ensemble models')
+    rescore_p.add_argument('--model-columns', type=Path, default=DEFAULT_MODEL_COLS,
+                           help='Path to model_columns.json')
+    rescore_p.add_argument('--models', nargs='*', default=DEFAULT_MODELS,
+                           help='Specific model names to use (default: all)')
+    rescore_p.add_argument('--mmap-models', action='store_true',
+                           help='Memory-map model arrays instead of loading private copies')
+    rescore_p.add_argument('--batch-size', type=int, default=DEFAULT_RESCORE_BATCH,
+                           help='Vectors scored per matrix batch')
+    rescore_p.add_argument('--model-workers', type=int, default=1,
+                           help='Models scored concurrently on threads (0 = one per model, default: 1)')
+    rescore_p.add_argument('--cpu-budget', type=int, default=0,
+                           help='Total threads the models may use together (default: unlimited)')
+    rescore_p.add_argument('--cascade', action='store_true',
+                           help='Run models cheapest-first and stop once a sample\'s majority is decided')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    store = FeatureStore(args.store_dir.resolve())
+
+    if args.command == 'info':
+        print(f'[+] {store.store_dir}: {len(store)} vectors, {len(store.columns)} columns, '
+              f'{len(store.segment_ids())} segments')
+        return
+    if args.command == 'compact':
+        store.compact()
+        print(f'[+] Compacted {store.store_dir} into {len(store.segment_ids())} segment(s)')
+        return
+
+    output_path = args.output.resolve()
+    models_dir = args.models_dir.resolve()
+    model_cols = load_model_columns(args.model_columns.resolve())
+    models = load_models(args.models, models_dir,
+                         mmap_mode=MODEL_MMAP_MODE if args.mmap_models else None)
+    model_workers = args.model_workers if args.model_workers > 0 else len(args.models)
+    configure_scoring_threads(models, model_workers, args.cpu_budget)
+    cascade_order = rank_models_by_cost(models, args.models, len(model_cols)) if args.cascade else None
+    counts = rescore(store, output_path, model_cols, args.models, models_dir, models,
+                     batch_size=args.batch_size, model_workers=model_workers,
+                     cascade_order=cascade_order)
+    total = sum(counts.get(name, 0) for name in CLASS_NAMES)
+    summary = ', '.join(f"{name}={counts.get(name, 0)}" for name in CLASS_NAMES)
+    print(f'[+] Wrote {output_path} ({total} rows) — {summary}')
+
+
+if __name__ == '__main__':
+    main()
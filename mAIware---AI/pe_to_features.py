@@ -12,13 +12,13 @@ fields like `Packed` and some LoadConfig fields if not available.
 Requires: pefile
   pip install pefile
 """
+import hashlib
 import json
-import math
-import os
 import sys
-from collections import Counter
 from pathlib import Path
+from typing import List, Optional, Tuple, Union
 
+import numpy as np
 import pefile
 import pandas as pd
 
@@ -26,14 +26,176 @@ import pandas as pd
 ROOT = Path(__file__).resolve().parent
 MODEL_COLS = ROOT / 'model_columns.json'
 
+# Default window for the sliding entropy profile, in bytes.
+ENTROPY_WINDOW = 4096
+# Bytes per bincount call; bincount widens its input to intp, so large
+# buffers are counted in cache-sized slices.
+_HISTOGRAM_CHUNK_BYTES = 1 << 18
+
+
+# Data directories needed by the ML features and the report extractors.
+PARSED_DIRECTORIES = [
+    pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_IMPORT'],
+    pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_RESOURCE'],
+    pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_DEBUG'],
+    pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_TLS'],
+    pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_LOAD_CONFIG'],
+]
+
+
+class PEAnalysis:
+    """Read a sample once and parse it with pefile once.
+
+    Every extractor (ML features, sections, imports, strings, hashes) works
+    off the shared ``data`` buffer and ``pe`` object instead of reopening the
+    file. ``pe`` is None when parsing failed; ``parse_error`` says why.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path, 'rb') as fh:
+            self.data: bytes = fh.read()
+        self.pe: Optional[pefile.PE] = None
+        self.parse_error: Optional[Exception] = None
+        self._sha256: Optional[str] = None
+        self._buffer: Optional[np.ndarray] = None
+        self._entropy_total: Optional[float] = None
+        self._sections: Optional[List[dict]] = None
+        try:
+            pe = pefile.PE(data=self.data, fast_load=True)
+            pe.parse_data_directories(directories=PARSED_DIRECTORIES)
+            self.pe = pe
+        except Exception as exc:
+            self.parse_error = exc
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @property
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    @property
+    def buffer(self) -> np.ndarray:
+        """Zero-copy uint8 view of ``data`` shared by the entropy routines."""
+        if self._buffer is None:
+            self._buffer = np.frombuffer(self.data, dtype=np.uint8)
+        return self._buffer
+
+    @property
+    def entropy_total(self) -> float:
+        if self._entropy_total is None:
+            self._entropy_total = histogram_entropy(byte_histogram(self.buffer))
+        return self._entropy_total
+
+    def section_entropy(self) -> List[dict]:
+        """Return ``{'name', 'entropy', 'size'}`` for every section (cached).
+
+        Sections are views into ``buffer`` covering the same bytes as
+        ``section.get_data()``, so nothing is copied.
+        """
+        if self._sections is None:
+            if self.pe is None:
+                raise self.parse_error or ValueError('PE not parsed')
+            sections = []
+            for section in self.pe.sections:
+                start, end = section_range(section)
+                view = self.buffer[start:end]
+                sections.append({
+                    'name': section.Name.decode('utf-8', errors='ignore').strip('\x00'),
+                    'entropy': histogram_entropy(byte_histogram(view)),
+                    'size': len(view),
+                })
+            self._sections = sections
+        return self._sections
+
+    def entropy_profile(self, window: int = ENTROPY_WINDOW, step: Optional[int] = None) -> np.ndarray:
+        return windowed_entropy(self.buffer, window, step)
+
+    def close(self) -> None:
+        if self.pe is not None:
+            self.pe.close()
+            self.pe = None
+
+    def __enter__(self) -> 'PEAnalysis':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def byte_histogram(buf: np.ndarray) -> np.ndarray:
+    """Count occurrences of each byte value in a uint8 array."""
+    counts = np.zeros(256, dtype=np.int64)
+    for first in range(0, len(buf), _HISTOGRAM_CHUNK_BYTES):
+        counts += np.bincount(buf[first:first + _HISTOGRAM_CHUNK_BYTES], minlength=256)
+    return counts
+
+
+def histogram_entropy(counts: np.ndarray) -> float:
+    """Shannon entropy (bits per byte) of a 256-bin byte histogram."""
+    total = int(counts.sum())
+    if total == 0:
+        return 0.0
+    probs = counts[counts > 0] / total
+    return float(-(probs * np.log2(probs)).sum())
+
 
 def entropy(data: bytes) -> float:
     if not data:
         return 0.0
-    counts = Counter(data)
-    probs = [c / len(data) for c in counts.values()]
-    ent = -sum(p * math.log2(p) for p in probs if p > 0)
-    return float(ent)
+    return histogram_entropy(byte_histogram(np.frombuffer(data, dtype=np.uint8)))
+
+
+def _row_entropy(counts: np.ndarray, total: int) -> np.ndarray:
+    probs = counts / float(total)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(probs > 0, probs * np.log2(probs), 0.0)
+    return -terms.sum(axis=1)
+
+
+def windowed_entropy(buf: np.ndarray, window: int = ENTROPY_WINDOW, step: Optional[int] = None) -> np.ndarray:
+    """Entropy of every ``window``-byte window, advancing ``step`` bytes at a time.
+
+    ``window`` must be a multiple of ``step`` (default: non-overlapping
+    windows). Per-step histograms are built with one bincount per chunk and
+    summed into windows with a running cumulative sum, so memory stays
+    bounded by the chunk size rather than the file size. A trailing partial
+    window is ignored.
+    """
+    step = window if step is None else step
+    if window <= 0 or step <= 0 or window % step:
+        raise ValueError('window must be a positive multiple of step')
+    per_window = window // step
+    n_blocks = len(buf) // step
+    if n_blocks < per_window:
+        return np.zeros(0, dtype=float)
+
+    chunk_blocks = max(per_window, _HISTOGRAM_CHUNK_BYTES // step)
+    carry = np.zeros((0, 256), dtype=np.int64)
+    profile = []
+    for first in range(0, n_blocks, chunk_blocks):
+        last = min(n_blocks, first + chunk_blocks)
+        blocks = buf[first * step:last * step].reshape(last - first, step)
+        keys = blocks + (np.arange(last - first, dtype=np.int64)[:, None] << 8)
+        hist = np.bincount(keys.ravel(), minlength=(last - first) * 256).reshape(-1, 256)
+        hist = np.concatenate([carry, hist])
+        cumulative = np.concatenate([np.zeros((1, 256), dtype=np.int64), np.cumsum(hist, axis=0)])
+        profile.append(_row_entropy(cumulative[per_window:] - cumulative[:-per_window], window))
+        carry = hist[len(hist) - (per_window - 1):]
+    return np.concatenate(profile)
+
+
+def section_range(section) -> Tuple[int, int]:
+    """File offsets ``[start, end)`` of the bytes ``section.get_data()`` returns."""
+    start = section.get_PointerToRawData_adj()
+    end = start + (section.SizeOfRawData or 0)
+    if section.PointerToRawData is not None and section.SizeOfRawData is not None:
+        end = min(end, section.PointerToRawData + section.SizeOfRawData)
+    return start, max(start, end)
 
 
 def count_resources(pe: pefile.PE) -> int:
@@ -75,30 +237,42 @@ def get_load_config_values(pe: pefile.PE):
     return size, security_cookie, se_handler_table
 
 
-def to_features(path: Path, model_cols: list) -> pd.DataFrame:
-    p = str(path)
+def to_features(source: Union[Path, PEAnalysis], model_cols: list) -> pd.DataFrame:
+    """Build the feature row for ``source`` (a path or an existing PEAnalysis)."""
+    if isinstance(source, PEAnalysis):
+        ctx = source
+        owned = False
+    else:
+        ctx = PEAnalysis(source)
+        owned = True
+    try:
+        row = _feature_row(ctx, model_cols)
+    finally:
+        if owned:
+            ctx.close()
+    df = pd.DataFrame([row], columns=model_cols)
+    return df
+
+
+def _feature_row(ctx: PEAnalysis, model_cols: list) -> dict:
     row = {c: 0 for c in model_cols}
 
     # File size
-    try:
-        row['FileSize'] = os.path.getsize(p)
-    except Exception:
-        row['FileSize'] = 0
+    row['FileSize'] = ctx.size
 
-    try:
-        pe = pefile.PE(p, fast_load=True)
-        pe.parse_data_directories(directories=[
-            pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_IMPORT'],
-            pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_RESOURCE'],
-            pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_DEBUG'],
-            pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_TLS'],
-            pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_LOAD_CONFIG'],
-        ])
+    pe = ctx.pe
+    if pe is None:
+        if isinstance(ctx.parse_error, pefile.PEFormatError):
+            # not a valid PE; leave defaults (zeros) except FileSize and entropy
+            row['Entropy_Total'] = ctx.entropy_total
+            row['Packed'] = 1 if row['Entropy_Total'] > 7.5 else 0
+        else:
+            print(f"Warning: error parsing PE {ctx.path}: {ctx.parse_error}", file=sys.stderr)
+        return row
 
+    try:
         # entropy total (file-level)
-        with open(p, 'rb') as fh:
-            data = fh.read()
-        row['Entropy_Total'] = entropy(data)
+        row['Entropy_Total'] = ctx.entropy_total
 
         # DOS header fields
         dos = pe.DOS_HEADER
@@ -168,34 +342,20 @@ def to_features(path: Path, model_cols: list) -> pd.DataFrame:
 
         # Packed heuristic: high entropy in file or in any section
         try:
-            max_sec_entropy = 0.0
-            for s in pe.sections:
-                sec_data = s.get_data() or b''
-                max_sec_entropy = max(max_sec_entropy, entropy(sec_data))
+            max_sec_entropy = max((s['entropy'] for s in ctx.section_entropy()), default=0.0)
             row['Packed'] = 1 if (row.get('Entropy_Total', 0) > 7.5 or max_sec_entropy > 7.5) else 0
         except Exception:
             row['Packed'] = 0
 
-        pe.close()
-    except pefile.PEFormatError:
-        # not a valid PE; leave defaults (zeros) except FileSize and maybe compute entropy
-        try:
-            with open(p, 'rb') as fh:
-                data = fh.read()
-            row['Entropy_Total'] = entropy(data)
-            row['Packed'] = 1 if row['Entropy_Total'] > 7.5 else 0
-        except Exception:
-            pass
     except Exception as e:
-        # any other error, return zeros but include FileSize
-        print(f"Warning: error parsing PE {p}: {e}", file=sys.stderr)
+        # any other error, keep what was filled so far
+        print(f"Warning: error parsing PE {ctx.path}: {e}", file=sys.stderr)
 
     # ensure all keys present and numeric
     for k in list(row.keys()):
         if row[k] is None:
             row[k] = 0
-    df = pd.DataFrame([row], columns=model_cols)
-    return df
+    return row
 
 
 def main():
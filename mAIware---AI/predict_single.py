@@ -1,30 +1,51 @@
 #!/usr/bin/env python3
 """Predict a single PE file and output comprehensive JSON with features."""
-import hashlib
+import argparse
+import contextlib
+import heapq
 import json
 import os
-import platform
-import subprocess
+import re
+import signal
+import socketserver
 import sys
 import time
 from pathlib import Path
-from typing import Optional
-import pefile
+from typing import Dict, List, NamedTuple, Optional, TextIO, Tuple
 
 from ensemble_predict_dir import (
-    load_model_columns, extract_features, prepare_feature_matrix,
-    run_models, DEFAULT_MODELS_DIR, DEFAULT_MODEL_COLS, DEFAULT_MODELS
+    load_model_columns, load_models, load_student, prepare_feature_matrix, run_models, student_vote,
+    DEFAULT_MODELS_DIR, DEFAULT_MODEL_COLS, DEFAULT_MODELS, MODEL_MMAP_MODE, SCORING_BACKENDS,
+    STUDENT_MODEL_NAME
 )
+import callgraph_jobs
+from callgraph_jobs import CallgraphQueue, generate_callgraph_image, is_cache_key
+from callgraph_pool import (CallgraphPool, DEFAULT_JOB_TIMEOUT, DEFAULT_MAX_JOBS,
+                            DEFAULT_MEMORY_LIMIT_MB)
 from ensemble_vote import run_majority_voting
+from verdict_cache import VerdictCache, ensemble_fingerprint
 import pe_to_features
 
 BASE_DIR = Path(__file__).resolve().parent
-CALLGRAPH_SCRIPT = BASE_DIR / "extract_callgraph.py"
-CALLGRAPH_CACHE = BASE_DIR / "tmp_cfg_cache"
 
 # Performance logging
 VERBOSE = os.environ.get('VERBOSE_TIMING', '').lower() in ('1', 'true', 'yes')
-IS_WINDOWS = platform.system() == 'Windows'
+
+# String extraction: printable runs of at least MIN_STRING_LENGTH characters,
+# kept when they contain any of the keywords (case-insensitive).
+MIN_STRING_LENGTH = 4
+INTERESTING_KEYWORDS = ('http', 'www', '.exe', '.dll', 'cmd', 'shell',
+                        'download', 'install', 'registry', 'temp', 'system')
+# Keyword matchers run case-sensitively over lowercased slices of the file:
+# bytes.lower() is far cheaper than an IGNORECASE alternation.
+_ASCII_KEYWORDS = re.compile(b'|'.join(re.escape(kw.encode('ascii')) for kw in INTERESTING_KEYWORDS))
+_WIDE_KEYWORDS = re.compile(b'|'.join(re.escape(kw.encode('utf-16-le')) for kw in INTERESTING_KEYWORDS))
+_KEYWORD_SCAN_CHUNK = 1 << 24
+_KEYWORD_OVERLAP = 2 * max(len(kw) for kw in INTERESTING_KEYWORDS)
+_ASCII_CHARS = re.compile(rb'[\x20-\x7e]*')
+_WIDE_CHARS = re.compile(rb'(?:[\x20-\x7e]\x00)*')
+_WIDE_CHARS_REVERSED = re.compile(rb'(?:\x00[\x20-\x7e])*')
+_RUN_SCAN_WINDOW = 4096
 
 def log_time(msg: str, start_time: float) -> None:
     if VERBOSE:
@@ -32,22 +53,14 @@ def log_time(msg: str, start_time: float) -> None:
         print(f"[TIMING] {msg}: {elapsed:.3f}s", file=sys.stderr)
 
 
-def extract_pe_sections(file_path: Path) -> list:
+def extract_pe_sections(ctx: pe_to_features.PEAnalysis) -> list:
     """Extract section names and entropy from PE file."""
     start = time.time()
     try:
-        pe = pefile.PE(str(file_path), fast_load=True)
-        sections = []
-        for section in pe.sections:
-            name = section.Name.decode('utf-8', errors='ignore').strip('\x00')
-            data = section.get_data() or b''
-            section_entropy = pe_to_features.entropy(data)
-            sections.append({
-                'name': name,
-                'entropy': round(section_entropy, 2),
-                'size': len(data)
-            })
-        pe.close()
+        sections = [
+            {'name': s['name'], 'entropy': round(s['entropy'], 2), 'size': s['size']}
+            for s in ctx.section_entropy()
+        ]
         log_time("extract_pe_sections", start)
         return sections
     except Exception as e:
@@ -55,15 +68,14 @@ def extract_pe_sections(file_path: Path) -> list:
         return []
 
 
-def extract_pe_imports(file_path: Path) -> list:
+def extract_pe_imports(ctx: pe_to_features.PEAnalysis) -> list:
     """Extract imported DLL and function names."""
     start = time.time()
     try:
-        pe = pefile.PE(str(file_path), fast_load=True)
-        pe.parse_data_directories(directories=[
-            pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_IMPORT']
-        ])
-        
+        pe = ctx.pe
+        if pe is None:
+            raise ctx.parse_error or ValueError("PE not parsed")
+
         imports = []
         if hasattr(pe, 'DIRECTORY_ENTRY_IMPORT'):
             for entry in pe.DIRECTORY_ENTRY_IMPORT:
@@ -72,7 +84,6 @@ def extract_pe_imports(file_path: Path) -> list:
                     if imp.name:
                         func_name = imp.name.decode('utf-8', errors='ignore')
                         imports.append(func_name)
-        pe.close()
         log_time("extract_pe_imports", start)
         return imports[:20]  # Limit total to 20
     except Exception as e:
@@ -80,43 +91,75 @@ def extract_pe_imports(file_path: Path) -> list:
         return []
 
 
-def extract_pe_strings(file_path: Path, max_strings: int = 10) -> list:
-    """Extract interesting strings from PE file."""
+def _expand_run(data: bytes, pos: int, chars: 're.Pattern[bytes]',
+                chars_reversed: 're.Pattern[bytes]') -> Tuple[int, int]:
+    """Grow the printable run around ``pos`` to its first and last byte."""
+    start = pos
+    while start > 0:
+        window = data[max(0, start - _RUN_SCAN_WINDOW):start][::-1]
+        matched = chars_reversed.match(window).end()
+        start -= matched
+        if matched < len(window):
+            break
+    return start, chars.match(data, pos).end()
+
+
+def _keyword_runs(data: bytes, keywords: 're.Pattern[bytes]', chars: 're.Pattern[bytes]',
+                  chars_reversed: 're.Pattern[bytes]', width: int):
+    """Yield ``(offset, raw_run)`` for printable runs that contain a keyword.
+
+    The keyword matcher scans the whole buffer in C; only the (rare) hits
+    are grown into their surrounding runs, so uninteresting text is never
+    materialized as Python objects.
+    """
+    last_end = -1
+    for base in range(0, len(data), _KEYWORD_SCAN_CHUNK):
+        lowered = data[base:base + _KEYWORD_SCAN_CHUNK + _KEYWORD_OVERLAP].lower()
+        for hit in keywords.finditer(lowered):
+            pos = base + hit.start()
+            if hit.start() >= _KEYWORD_SCAN_CHUNK:
+                break  # starts in the overlap; the next slice reports it
+            if pos < last_end:
+                continue  # another keyword inside a run we already emitted
+            start, end = _expand_run(data, pos, chars, chars_reversed)
+            last_end = end
+            if (end - start) // width >= MIN_STRING_LENGTH:
+                yield start, data[start:end]
+
+
+def _iter_interesting_strings(data: bytes):
+    """Yield keyword-bearing ASCII and UTF-16LE strings in file order."""
+    ascii_runs = ((offset, raw.decode('ascii'))
+                  for offset, raw in _keyword_runs(data, _ASCII_KEYWORDS, _ASCII_CHARS, _ASCII_CHARS, 1))
+    wide_runs = ((offset, raw.decode('utf-16-le'))
+                 for offset, raw in _keyword_runs(data, _WIDE_KEYWORDS, _WIDE_CHARS, _WIDE_CHARS_REVERSED, 2))
+    for _, text in heapq.merge(ascii_runs, wide_runs, key=lambda run: run[0]):
+        yield text
+
+
+def extract_pe_strings(ctx: pe_to_features.PEAnalysis, max_strings: int = 10) -> list:
+    """Extract interesting ASCII and UTF-16LE strings from PE file."""
     start = time.time()
     try:
-        with open(file_path, 'rb') as f:
-            data = f.read()
-        
-        # Simple string extraction (ASCII printable, min length 4)
         strings = []
-        current = []
-        
-        for byte in data:
-            if 32 <= byte <= 126:  # Printable ASCII
-                current.append(chr(byte))
-            else:
-                if len(current) >= 4:
-                    s = ''.join(current)
-                    # Filter interesting strings
-                    interesting_keywords = ['http', 'www', '.exe', '.dll', 'cmd', 'shell', 
-                                          'download', 'install', 'registry', 'temp', 'system']
-                    if any(kw in s.lower() for kw in interesting_keywords):
-                        strings.append(s)
-                        if len(strings) >= max_strings:
-                            break
-                current = []
-        
+        for text in _iter_interesting_strings(ctx.data):
+            strings.append(text)
+            if len(strings) >= max_strings:
+                break
+
         log_time("extract_pe_strings", start)
-        return strings[:max_strings]
+        return strings
     except Exception as e:
         print(f"Warning: Failed to extract strings: {e}", file=sys.stderr)
         return []
 
 
-def get_pe_type(file_path: Path) -> str:
+def get_pe_type(ctx: pe_to_features.PEAnalysis) -> str:
     """Determine PE type (PE32/PE32+)."""
     try:
-        pe = pefile.PE(str(file_path), fast_load=True)
+        pe = ctx.pe
+        if pe is None:
+            return 'PE Executable'
         if pe.OPTIONAL_HEADER.Magic == 0x20b:
             result = 'PE64 Executable (PE32+)'
         elif pe.OPTIONAL_HEADER.Magic == 0x10b:
@@ -127,14 +170,13 @@ def get_pe_type(file_path: Path) -> str:
         # Check if it's a DLL
         if pe.FILE_HEADER.Characteristics & 0x2000:
             result = result.replace('Executable', 'DLL')
-        
-        pe.close()
+
         return result
     except Exception:
         return 'PE Executable'
 
 
-def detect_packer(file_path: Path, sections: list) -> str:
+def detect_packer(ctx: pe_to_features.PEAnalysis, sections: list) -> str:
     """Detect common packers based on section names and entropy."""
     try:
         # Check for high entropy sections (packed indicator)
@@ -159,129 +201,73 @@ def detect_packer(file_path: Path, sections: list) -> str:
         return 'Unknown'
 
 
-def _hash_file_for_cache(file_path: Path) -> str:
+def _hash_file_for_cache(ctx: pe_to_features.PEAnalysis) -> str:
     start = time.time()
-    hasher = hashlib.sha256()
-    with open(file_path, 'rb') as handle:
-        for chunk in iter(lambda: handle.read(1024 * 1024), b''):
-            if not chunk:
-                break
-            hasher.update(chunk)
+    digest = ctx.sha256
     log_time("_hash_file_for_cache", start)
-    return hasher.hexdigest()
-
+    return digest
 
-def generate_callgraph_image(file_path: Path) -> Optional[str]:
-    """Generate (or reuse cached) call graph image for the binary."""
-    start = time.time()
-    if not CALLGRAPH_SCRIPT.exists():
-        return None
-
-    try:
-        CALLGRAPH_CACHE.mkdir(parents=True, exist_ok=True)
-    except OSError as exc:
-        print(f"Warning: Unable to create CFG cache directory: {exc}", file=sys.stderr)
-        return None
 
-    try:
-        cache_key = _hash_file_for_cache(file_path)
-    except OSError as exc:
-        print(f"Warning: Unable to hash file for CFG cache: {exc}", file=sys.stderr)
-        return None
+def _attach_callgraph(result: dict, file_path: Path, cache_key: str,
+                      callgraph: Optional[CallgraphQueue] = None,
+                      cfg_pool: Optional[CallgraphPool] = None) -> None:
+    if callgraph is not None:
+        # Queue the image and answer now; clients poll with the cfg_key.
+        start = time.time()
+        result.update(callgraph.submit(file_path, cache_key))
+        log_time("queue callgraph job", start)
+        return
+    cfg_image = generate_callgraph_image(file_path, cache_key, cfg_pool)
+    if cfg_image:
+        result["cfg_image"] = cfg_image
+        cfg_graph = callgraph_jobs.graph_document_path(cache_key)
+        if cfg_graph:
+            result["cfg_graph"] = cfg_graph
 
-    prefix = CALLGRAPH_CACHE / cache_key
-    png_path = prefix.with_suffix('.callgraph.png')
-    if png_path.exists():
-        log_time("generate_callgraph_image (cached)", start)
-        return str(png_path)
-
-    dot_path = prefix.with_suffix('.callgraph.dot')
-    
-    # Pass verbose flag if enabled
-    cmd = [
-        sys.executable,
-        str(CALLGRAPH_SCRIPT),
-        str(file_path),
-        '-o',
-        str(prefix),
-        '--render',
-        '--max-nodes',
-        '20',
-    ]
-    if VERBOSE:
-        cmd.append('--verbose')
-    
-    # On Windows, ensure no-load-libs is used to prevent DLL loading hangs
-    if IS_WINDOWS:
-        cmd.append('--no-load-libs')
-        if VERBOSE:
-            print(f"[TIMING] Adding --no-load-libs for Windows", file=sys.stderr)
 
-    try:
-        subprocess_start = time.time()
-        if VERBOSE:
-            print(f"[TIMING] Starting callgraph subprocess...", file=sys.stderr)
-        
-        # Windows-specific subprocess flags to prevent hanging
-        if IS_WINDOWS:
-            # CREATE_NO_WINDOW prevents console window creation issues on Windows
-            creationflags = subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
-            completed = subprocess.run(
-                cmd,
-                cwd=str(BASE_DIR),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=False,
-                creationflags=creationflags
-            )
-        else:
-            completed = subprocess.run(
-                cmd,
-                cwd=str(BASE_DIR),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=False,
-            )
-        log_time("callgraph subprocess execution", subprocess_start)
-    except OSError as exc:
-        print(f"Warning: Failed to execute callgraph helper: {exc}", file=sys.stderr)
-        return None
+def predict_single_file(file_path: Path,
+                        model_cols: Optional[List[str]] = None,
+                        models: Optional[Dict[str, object]] = None,
+                        cache: Optional[VerdictCache] = None,
+                        student: Optional[object] = None,
+                        callgraph: Optional[CallgraphQueue] = None,
+                        cfg_pool: Optional[CallgraphPool] = None) -> dict:
+    """Predict a single file and return comprehensive result dict.
 
-    # Check if DOT file was generated (PNG rendering may fail if graphviz not installed)
-    if os.path.exists(dot_path):
-        # Prefer PNG if it exists
-        if png_path.exists():
-            log_time("generate_callgraph_image (generated PNG)", start)
-            return str(png_path)
-        else:
-            # Return DOT file if PNG rendering failed
-            if VERBOSE or completed.returncode != 0:
-                print("Info: Callgraph DOT generated successfully. PNG not created (Graphviz may not be installed).", file=sys.stderr)
-            log_time("generate_callgraph_image (generated DOT)", start)
-            return str(dot_path)
-    
-    # Complete failure - no DOT file generated
-    if completed.returncode != 0:
-        msg = completed.stderr.strip() or completed.stdout.strip()
-        if msg and VERBOSE:
-            print(f"Warning: Callgraph generation failed: {msg}", file=sys.stderr)
-
-    return None
-
-
-def predict_single_file(file_path: Path) -> dict:
-    """Predict a single file and return comprehensive result dict."""
+    ``model_cols`` and ``models`` let a long-lived caller (see ``--serve``)
+    reuse the column list and deserialized ensemble across files. With a
+    ``cache``, a file whose SHA-256 was already scored by the same ensemble
+    is answered from the stored verdict. With a distilled ``student`` the
+    ensemble only runs when the student's score is in the suspicious band.
+    With a ``callgraph`` queue the call graph is built in the background and
+    the result carries ``cfg_status``/``cfg_key`` instead of waiting for it;
+    otherwise it is built inline, on ``cfg_pool``'s warm workers if given.
+    """
     total_start = time.time()
+    ctx = None
     try:
-        load_start = time.time()
-        model_cols = load_model_columns(DEFAULT_MODEL_COLS)
-        log_time("load_model_columns", load_start)
+        if model_cols is None:
+            load_start = time.time()
+            model_cols = load_model_columns(DEFAULT_MODEL_COLS)
+            log_time("load_model_columns", load_start)
         
+        # Read and parse the binary once for every extractor below
+        parse_start = time.time()
+        ctx = pe_to_features.PEAnalysis(file_path)
+        log_time("PEAnalysis (read + parse)", parse_start)
+
+        cache_key = _hash_file_for_cache(ctx)
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                cached["verdict_cached"] = True
+                _attach_callgraph(cached, file_path, cache_key, callgraph, cfg_pool)
+                log_time("TOTAL predict_single_file (verdict cache hit)", total_start)
+                return cached
+
         # Extract features
         feat_start = time.time()
-        features_df = extract_features([file_path], model_cols)
+        features_df = pe_to_features.to_features(ctx, model_cols)
         log_time("extract_features (ML features)", feat_start)
         
         if features_df.empty:
@@ -295,14 +281,25 @@ def predict_single_file(file_path: Path) -> dict:
         feature_matrix = prepare_feature_matrix(features_df, model_cols)
         log_time("prepare_feature_matrix", matrix_start)
         
-        # Run models
-        models_start = time.time()
-        predictions_df = run_models(feature_matrix, DEFAULT_MODELS, DEFAULT_MODELS_DIR)
-        log_time("run_models (13 ensemble models)", models_start)
-        
-        voting_start = time.time()
-        voting_df, _ = run_majority_voting(predictions_df, DEFAULT_MODELS)
-        log_time("run_majority_voting", voting_start)
+        voting_df = None
+        if student is not None:
+            student_start = time.time()
+            voting_df, _ = student_vote(student, feature_matrix)
+            log_time("student fast path", student_start)
+            if voting_df.empty:
+                voting_df = None
+
+        if voting_df is None:
+            # Run models
+            models_start = time.time()
+            predictions_df = run_models(feature_matrix, DEFAULT_MODELS, DEFAULT_MODELS_DIR, models=models)
+            log_time("run_models (13 ensemble models)", models_start)
+
+            voting_start = time.time()
+            voting_df, _ = run_majority_voting(predictions_df, DEFAULT_MODELS)
+            log_time("run_majority_voting", voting_start)
+            if student is not None:
+                voting_df['scored_by'] = 'ensemble'
         
         # Get ensemble result
         row = voting_df.iloc[0]
@@ -310,16 +307,16 @@ def predict_single_file(file_path: Path) -> dict:
         ensemble_score = float(row.get('ensemble_score', 0.5))
         
         # Extract PE metadata
-        sections = extract_pe_sections(file_path)
-        imports = extract_pe_imports(file_path)
-        strings = extract_pe_strings(file_path)
+        sections = extract_pe_sections(ctx)
+        imports = extract_pe_imports(ctx)
+        strings = extract_pe_strings(ctx)
         
         type_start = time.time()
-        file_type = get_pe_type(file_path)
+        file_type = get_pe_type(ctx)
         log_time("get_pe_type", type_start)
         
         packer_start = time.time()
-        packer = detect_packer(file_path, sections)
+        packer = detect_packer(ctx, sections)
         log_time("detect_packer", packer_start)
         
         # Get feature values for additional context
@@ -348,10 +345,13 @@ def predict_single_file(file_path: Path) -> dict:
                 "is_packed": int(feature_row.get('Packed', 0)) == 1
             }
         }
+        if student is not None:
+            result["scored_by"] = row['scored_by']  # student/ensemble
 
-        cfg_image = generate_callgraph_image(file_path)
-        if cfg_image:
-            result["cfg_image"] = cfg_image
+        if cache is not None:
+            cache.put(cache_key, result)
+
+        _attach_callgraph(result, file_path, cache_key, callgraph, cfg_pool)
         
         log_time("TOTAL predict_single_file", total_start)
         return result
@@ -365,22 +365,263 @@ def predict_single_file(file_path: Path) -> dict:
             "classification": "Suspicious",
             "confidence_score": 0.5
         }
+    finally:
+        if ctx is not None:
+            ctx.close()
+
+
+class ScoringState(NamedTuple):
+    """Everything a long-lived service keeps warm between requests."""
+    model_cols: List[str]
+    models: Dict[str, object]
+    cache: Optional[VerdictCache]
+    student: Optional[object] = None
+    callgraph: Optional[CallgraphQueue] = None
+    cfg_pool: Optional[CallgraphPool] = None
+
+
+def open_verdict_cache(fast: bool = False) -> Optional[VerdictCache]:
+    # Fast-path verdicts depend on the student too, so they never mix with full
+    # ones; a separate mode keeps either kind of process from evicting the other.
+    model_names = list(DEFAULT_MODELS) + [STUDENT_MODEL_NAME] if fast else DEFAULT_MODELS
+    try:
+        fingerprint = ensemble_fingerprint(model_names, DEFAULT_MODELS_DIR, DEFAULT_MODEL_COLS)
+        return VerdictCache(fingerprint, mode='fast' if fast else 'full')
+    except Exception as exc:
+        print(f"Warning: Verdict cache unavailable: {exc}", file=sys.stderr)
+        return None
+
+
+def handle_request(request: dict, state: ScoringState) -> dict:
+    """Answer one scoring-service request of the form ``{"id": ..., "path": ...}``.
+
+    ``{"id": ..., "cfg": <cfg_key>[, "wait": seconds]}`` instead reports (or
+    waits for) the call graph job of an earlier ``--async-cfg`` verdict.
+    """
+    response: dict = {}
+    if 'id' in request:
+        response['id'] = request['id']
+    if 'cfg' in request:
+        cache_key = str(request['cfg'])
+        if not is_cache_key(cache_key):
+            response['error'] = "Invalid cfg_key"
+            return response
+        timeout = request.get('wait')
+        if timeout is None:
+            response.update(callgraph_jobs.status(cache_key))
+        elif isinstance(timeout, bool) or not isinstance(timeout, (int, float)):
+            response['error'] = "Invalid wait: expected a number of seconds"
+        else:
+            response.update(callgraph_jobs.wait(cache_key, float(timeout)))
+        return response
+    path = request.get('path')
+    if not path:
+        response['error'] = "No file path provided"
+        return response
+    if not isinstance(path, str):
+        response['error'] = "Invalid path: expected a string"
+        return response
+    file_path = Path(path)
+    response['path'] = str(file_path)
+    if not file_path.exists():
+        response['error'] = "File not found"
+        return response
+    response.update(predict_single_file(file_path, state.model_cols, state.models, state.cache, state.student,
+                                        state.callgraph, state.cfg_pool))
+    return response
+
+
+def _parse_request_line(line: str) -> dict:
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as exc:
+        return {'error': f"Invalid request: {exc}"}
+    if not isinstance(request, dict):
+        return {'error': "Invalid request: expected a JSON object"}
+    return request
+
+
+def serve_lines(reader, writer: TextIO, state: ScoringState) -> None:
+    """Read JSON-lines requests from ``reader`` and write one JSON line per reply."""
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        request = _parse_request_line(line)
+        if 'error' in request:
+            response = request
+        else:
+            # Keep stray prints from the extractors off the response stream.
+            with contextlib.redirect_stdout(sys.stderr):
+                try:
+                    response = handle_request(request, state)
+                except Exception as exc:
+                    # One bad request must not end the service or its connection.
+                    print(f"Error handling request: {exc}", file=sys.stderr)
+                    response = {'id': request['id']} if 'id' in request else {}
+                    response['error'] = str(exc)
+        writer.write(json.dumps(response) + "\n")
+        writer.flush()
+
+
+def load_scoring_state(mmap_models: bool = False, use_cache: bool = True, fast: bool = False,
+                       backend: str = 'sklearn', async_cfg: bool = False,
+                       cfg_pool: Optional[CallgraphPool] = None) -> ScoringState:
+    start = time.time()
+    model_cols = load_model_columns(DEFAULT_MODEL_COLS)
+    mmap_mode = MODEL_MMAP_MODE if mmap_models else None
+    # Fingerprint before loading so the cache describes the models we hold.
+    cache = open_verdict_cache(fast) if use_cache else None
+    models = load_models(DEFAULT_MODELS, DEFAULT_MODELS_DIR, mmap_mode=mmap_mode, backend=backend)
+    student = load_student(DEFAULT_MODELS_DIR, mmap_mode=mmap_mode) if fast else None
+    log_time("load scoring state (columns + ensemble)", start)
+    callgraph = None
+    if async_cfg:
+        callgraph = CallgraphQueue(workers=cfg_pool.workers if cfg_pool else 1, pool=cfg_pool)
+    return ScoringState(model_cols, models, cache, student, callgraph, cfg_pool)
+
+
+class _SocketWriter:
+    def __init__(self, wfile) -> None:
+        self._wfile = wfile
+
+    def write(self, text: str) -> None:
+        self._wfile.write(text.encode('utf-8'))
+
+    def flush(self) -> None:
+        self._wfile.flush()
+
+
+def _run_forked_worker(server: socketserver.BaseServer) -> None:
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os._exit(0)
+
+
+def serve_socket(socket_path: Path, state: ScoringState, workers: int = 1) -> None:
+    """Serve JSON-lines requests on a local Unix socket until interrupted.
+
+    With ``workers`` > 1 the listening socket is shared by that many forked
+    worker processes. The ensemble is loaded once in the parent before
+    forking, so the workers share its pages instead of holding N copies.
+    """
+    if socket_path.exists():
+        socket_path.unlink()
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            reader = (raw.decode('utf-8', errors='replace') for raw in self.rfile)
+            writer = _SocketWriter(self.wfile)
+            serve_lines(reader, writer, state)
+
+    # Turn SIGTERM into a normal exit so workers are reaped and the socket removed.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    children: List[int] = []
+    with socketserver.ThreadingUnixStreamServer(str(socket_path), _Handler) as server:
+        print(f"[*] Scoring service listening on {socket_path}", file=sys.stderr)
+        try:
+            if workers > 1 and hasattr(os, 'fork'):
+                for _ in range(workers):
+                    pid = os.fork()
+                    if pid == 0:
+                        if state.cfg_pool is not None:
+                            state.cfg_pool.start()
+                        _run_forked_worker(server)
+                    children.append(pid)
+                print(f"[*] Started {workers} scoring workers", file=sys.stderr)
+                for _ in children:
+                    os.wait()
+            else:
+                if state.cfg_pool is not None:
+                    state.cfg_pool.start()
+                server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for pid in children:
+                with contextlib.suppress(OSError):
+                    os.kill(pid, signal.SIGTERM)
+            with contextlib.suppress(OSError):
+                socket_path.unlink()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Predict a single PE file and print a JSON report.')
+    parser.add_argument('file', nargs='?', help='PE file to analyse')
+    parser.add_argument('--verbose', action='store_true', help='Print per-stage timings to stderr')
+    parser.add_argument('--serve', action='store_true',
+                        help='Keep the ensemble loaded and answer JSON-lines requests on stdin')
+    parser.add_argument('--socket', type=Path,
+                        help='Keep the ensemble loaded and answer JSON-lines requests on this Unix socket')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Forked worker processes sharing the --socket listener (default: 1)')
+    parser.add_argument('--mmap-models', action='store_true',
+                        help='Memory-map model arrays so several services share one copy in RAM')
+    parser.add_argument('--backend', choices=SCORING_BACKENDS, default='sklearn',
+                        help='Tree model inference: sklearn, or compiled flat arrays from tree_engine.py')
+    parser.add_argument('--fast', action='store_true',
+                        help='Score with the distilled student; run the full ensemble only for suspicious-band files')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always rescore instead of reusing verdicts from the SHA-256 verdict cache')
+    parser.add_argument('--async-cfg', action='store_true',
+                        help='Return the verdict at once with cfg_status/cfg_key; build the call graph in the background')
+    parser.add_argument('--cfg-workers', type=int, default=1,
+                        help='Warm angr worker processes in --serve/--socket mode (0 = a new subprocess per graph)')
+    parser.add_argument('--cfg-timeout', type=float, default=DEFAULT_JOB_TIMEOUT,
+                        help='Seconds a warm worker may spend on one call graph (default: %(default)s)')
+    parser.add_argument('--cfg-memory-mb', type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help='Address-space ceiling per warm worker in MB, POSIX only (default: %(default)s)')
+    parser.add_argument('--cfg-max-jobs', type=int, default=DEFAULT_MAX_JOBS,
+                        help='Call graphs a warm worker builds before it is replaced (default: %(default)s)')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
+    args = parse_args()
     # Enable verbose timing if requested
-    if '--verbose' in sys.argv:
+    if args.verbose:
         VERBOSE = True
-        sys.argv.remove('--verbose')
-    
-    if len(sys.argv) < 2:
+        callgraph_jobs.VERBOSE = True
+
+    if args.serve or args.socket:
+        cfg_pool = None
+        if args.cfg_workers > 0:
+            cfg_pool = CallgraphPool(args.cfg_workers, job_timeout=args.cfg_timeout,
+                                     memory_limit_mb=args.cfg_memory_mb, max_jobs=args.cfg_max_jobs,
+                                     verbose=VERBOSE)
+        state = load_scoring_state(args.mmap_models, use_cache=not args.no_cache, fast=args.fast,
+                                   backend=args.backend, async_cfg=args.async_cfg, cfg_pool=cfg_pool)
+        try:
+            if args.socket:
+                serve_socket(args.socket, state, workers=args.workers)
+            else:
+                if cfg_pool is not None:
+                    cfg_pool.start()
+                print("[*] Scoring service ready on stdin", file=sys.stderr)
+                serve_lines(sys.stdin, sys.stdout, state)
+        finally:
+            if state.callgraph is not None:
+                state.callgraph.shutdown()
+            if cfg_pool is not None:
+                cfg_pool.close()
+        sys.exit(0)
+
+    if not args.file:
         print(json.dumps({"error": "No file path provided"}))
         sys.exit(1)
-    
-    file_path = Path(sys.argv[1])
+
+    file_path = Path(args.file)
     if not file_path.exists():
         print(json.dumps({"error": "File not found"}))
         sys.exit(1)
-    
-    result = predict_single_file(file_path)
+
+    cache = None if args.no_cache else open_verdict_cache(args.fast)
+    student = load_student(DEFAULT_MODELS_DIR) if args.fast else None
+    models = load_models(DEFAULT_MODELS, DEFAULT_MODELS_DIR, backend=args.backend) if args.backend != 'sklearn' else None
+    # A one-shot run exits after printing, so its job must outlive this process.
+    callgraph = CallgraphQueue(detached=True) if args.async_cfg else None
+    result = predict_single_file(file_path, models=models, cache=cache, student=student, callgraph=callgraph)
     print(json.dumps(result, indent=2))
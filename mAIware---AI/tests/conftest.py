@@ -0,0 +1,23 @@
+"""Shared fixtures; the scripts live at the repository root, not in a package."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope='session')
+def dataset():
+    """A small binary problem with integral and continuous PE-like features."""
+    rng = np.random.default_rng(7)
+    counts = rng.integers(0, 50, size=(600, 4)).astype(np.float64)
+    ratios = rng.random((600, 4)) * 8.0
+    X = np.hstack([counts, ratios])
+    y = ((counts[:, 0] > 20) ^ (ratios[:, 1] > 5.0)).astype(int)
+    return X[:400], y[:400], X[400:], y[400:]
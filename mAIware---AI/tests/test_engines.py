@@ -0,0 +1,89 @@
+"""The compiled tree and fused linear backends must score exactly like sklearn."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+import linear_engine
+import tree_engine
+from ensemble_pipeline.common import predict_with_scores
+from ensemble_pipeline.pipelines import (ada_boost, decision_tree, extra_trees,
+                                         gaussian_nb, gradient_boosting, linear_svc,
+                                         log_reg, random_forest, sgd_logistic)
+
+TREE_BUILDERS = {
+    'decision_tree': decision_tree.build_estimator,
+    'random_forest': lambda: random_forest.build_estimator().set_params(n_estimators=15, n_jobs=1),
+    'extra_trees': lambda: extra_trees.build_estimator().set_params(n_estimators=15, n_jobs=1),
+    'gradient_boosting': lambda: gradient_boosting.build_estimator().set_params(n_estimators=25),
+    'ada_boost': lambda: ada_boost.build_estimator().set_params(n_estimators=25),
+}
+# One row, a batch the compiled walk handles, and one past COMPILED_MAX_ROWS.
+ROW_COUNTS = [1, tree_engine.COMPILED_MAX_ROWS, tree_engine.COMPILED_MAX_ROWS + 100]
+
+
+def _assert_same(expected, actual):
+    labels, scores = expected
+    fast_labels, fast_scores = actual
+    assert np.array_equal(labels, fast_labels)
+    assert np.array_equal(scores, fast_scores)
+
+
+@pytest.fixture(scope='module')
+def tree_models(dataset):
+    X_train, y_train, _, _ = dataset
+    return {name: build().fit(X_train, y_train) for name, build in TREE_BUILDERS.items()}
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+@pytest.mark.parametrize('name', list(TREE_BUILDERS))
+def test_compiled_trees_match_sklearn(tree_models, dataset, name, rows):
+    model = tree_models[name]
+    X = dataset[2][:rows]
+    compiled = tree_engine.CompiledTrees.from_model(model)
+    _assert_same(predict_with_scores(model, X), compiled.predict_with_scores(X))
+
+
+@pytest.mark.parametrize('name', list(TREE_BUILDERS))
+def test_compiled_trees_fall_back_above_max_rows(tree_models, dataset, name):
+    model = tree_models[name]
+    X = dataset[2][:tree_engine.COMPILED_MAX_ROWS + 100]
+    compiled = tree_engine.CompiledTrees.from_model(model)
+    compiled.fallback = model
+    _assert_same(predict_with_scores(model, X), compiled.predict_with_scores(X))
+
+
+def test_compiled_trees_survive_save_and_load(tree_models, dataset, tmp_path):
+    model = tree_models['gradient_boosting']
+    path = tmp_path / f'gradient_boosting{tree_engine.COMPILED_SUFFIX}'
+    tree_engine.CompiledTrees.from_model(model).save(path)
+    X = dataset[2][:10]
+    _assert_same(predict_with_scores(model, X), tree_engine.CompiledTrees.load(path).predict_with_scores(X))
+
+
+@pytest.fixture(scope='module')
+def linear_models(dataset):
+    X_train, y_train, _, _ = dataset
+    builders = {
+        'log_reg': log_reg.build_estimator,
+        'linear_svc': linear_svc.build_estimator,
+        'sgd_logistic': sgd_logistic.build_estimator,
+        'gaussian_nb': gaussian_nb.build_estimator,
+    }
+    return {name: build().fit(X_train, y_train) for name, build in builders.items()}
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_fused_linear_models_match_sklearn(linear_models, dataset, rows):
+    X = dataset[2][:rows]
+    models = dict(linear_models)
+    fused = linear_engine.fuse_linear_models(models)
+    assert sorted(fused) == sorted(linear_models)
+    for name, original in linear_models.items():
+        _assert_same(predict_with_scores(original, X), models[name].predict_with_scores(X))
+
+
+def test_fusing_needs_two_models(linear_models):
+    models = {'log_reg': linear_models['log_reg']}
+    assert linear_engine.fuse_linear_models(models) == []
+    assert models['log_reg'] is linear_models['log_reg']
@@ -0,0 +1,127 @@
+"""The persistent feature store."""
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_store import FeatureStore, _segment_files
+
+SHA_A = 'a' * 64
+SHA_B = 'b' * 64
+SHA_C = 'c' * 64
+
+
+def _rows(digests, offset=0.0):
+    return pd.DataFrame({
+        'f0': [offset + i for i in range(len(digests))],
+        'f1': [offset - i for i in range(len(digests))],
+        'sha256': digests,
+        'sample_path': [f'/samples/{d[:4]}.exe' for d in digests],
+    })
+
+
+def _contents(store):
+    rows = {}
+    for features, digests, paths in store.iter_segments():
+        for vector, digest, path in zip(features, digests.astype(str), paths):
+            assert digest not in rows
+            rows[digest] = (vector.tolist(), str(path))
+    return rows
+
+
+def test_feature_store_appends_each_file_once(tmp_path):
+    store = FeatureStore(tmp_path / 'store', ['f0', 'f1'])
+    assert store.append(_rows([SHA_A, SHA_B])) == 2
+    # A later sighting of SHA_A keeps the first vector and path.
+    assert store.append(_rows([SHA_A, SHA_C], offset=10.0)) == 1
+    assert store.append(_rows([SHA_C])) == 0
+    assert len(store) == 3
+    assert store.segment_ids() == [0, 1]
+    contents = _contents(FeatureStore(tmp_path / 'store'))
+    assert contents[SHA_A] == ([0.0, 0.0], '/samples/aaaa.exe')
+    assert contents[SHA_C] == ([11.0, 9.0], '/samples/cccc.exe')
+
+
+def test_feature_store_rejects_a_different_layout(tmp_path):
+    FeatureStore(tmp_path / 'store', ['f0', 'f1'])
+    with pytest.raises(ValueError):
+        FeatureStore(tmp_path / 'store', ['f0', 'f2'])
+
+
+def test_compact_merges_segments_without_changing_rows(tmp_path):
+    store = FeatureStore(tmp_path / 'store', ['f0', 'f1'])
+    store.append(_rows([SHA_A]))
+    store.append(_rows([SHA_B, SHA_C], offset=5.0))
+    before = _contents(store)
+    store.compact()
+    assert store.segment_ids() == [2]
+    assert _contents(FeatureStore(tmp_path / 'store')) == before
+
+
+def test_compact_streams_segments_of_different_path_widths(tmp_path, monkeypatch):
+    store = FeatureStore(tmp_path / 'store', ['f0', 'f1'])
+    store.append(_rows([SHA_A]).assign(sample_path='/a.exe'))
+    store.append(_rows([SHA_B]).assign(sample_path='/a/much/longer/path/b.exe'))
+    before = _contents(store)
+
+    def no_concatenate(*args, **kwargs):
+        raise AssertionError('compact must not build the merged arrays in memory')
+
+    monkeypatch.setattr(np, 'concatenate', no_concatenate)
+    store.compact()
+    monkeypatch.undo()
+    assert _contents(FeatureStore(tmp_path / 'store')) == before
+
+
+def test_interrupted_compaction_is_finished_on_open(tmp_path, monkeypatch):
+    store_dir = tmp_path / 'store'
+    store = FeatureStore(store_dir, ['f0', 'f1'])
+    store.append(_rows([SHA_A]))
+    store.append(_rows([SHA_B]))
+    before = _contents(store)
+
+    removed = []
+    unlink = Path.unlink
+
+    def crash_after_first_removal(self, missing_ok=False):
+        if removed:
+            raise KeyboardInterrupt
+        removed.append(self)
+        unlink(self, missing_ok=missing_ok)
+
+    # Dies after dropping the first merged segment's marker.
+    monkeypatch.setattr(Path, 'unlink', crash_after_first_removal)
+    with pytest.raises(KeyboardInterrupt):
+        store.compact()
+    monkeypatch.undo()
+
+    assert _segment_files(store_dir, 2)['pending'].exists()
+    reopened = FeatureStore(store_dir)
+    assert reopened.segment_ids() == [2]
+    assert _contents(reopened) == before
+    assert sorted(p.name for p in store_dir.glob('segment-*')) == [
+        'segment-000002.features.npy', 'segment-000002.paths.npy', 'segment-000002.sha256.npy',
+    ]
+
+
+def test_append_waits_for_a_running_compaction(tmp_path):
+    store_dir = tmp_path / 'store'
+    FeatureStore(store_dir, ['f0', 'f1']).append(_rows([SHA_A]))
+    compacting = FeatureStore(store_dir)
+    appended = threading.Event()
+
+    def append():
+        FeatureStore(store_dir).append(_rows([SHA_B]))
+        appended.set()
+
+    with compacting._locked():
+        worker = threading.Thread(target=append)
+        worker.start()
+        assert not appended.wait(0.3)
+    worker.join(5)
+    assert appended.is_set()
+    assert len(FeatureStore(store_dir)) == 2
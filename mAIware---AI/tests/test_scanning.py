@@ -0,0 +1,159 @@
+"""Early-exit cascade voting and checkpoint/resume of streamed directory scans."""
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ensemble_predict_dir as scan
+from ensemble_vote import run_majority_voting
+
+
+class ColumnVoter:
+    """Votes malware when its feature column exceeds ``threshold``."""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, column: int, threshold: float = 0.5):
+        self.column = column
+        self.threshold = threshold
+        self.rows_seen = 0
+
+    def predict_with_scores(self, X):
+        self.rows_seen += X.shape[0]
+        scores = np.asarray(X[:, self.column], dtype=float)
+        return (scores > self.threshold).astype(int), scores
+
+
+def test_cascade_decides_like_the_full_vote():
+    rng = np.random.default_rng(3)
+    X = rng.integers(0, 2, size=(300, 5)).astype(float)
+    names = [f'm{i}' for i in range(5)]
+    full = run_majority_voting(
+        scan.run_models(X, names, None, models={n: ColumnVoter(i) for i, n in enumerate(names)}), names)[0]
+    models = {n: ColumnVoter(i) for i, n in enumerate(names)}
+    predictions = scan.run_models_cascade(X, names, models, order=names)
+    cascade = run_majority_voting(predictions, names)[0]
+
+    assert np.array_equal(cascade['ensemble_label'], full['ensemble_label'])
+    # The first three models agreeing decide a row; the last two never see it.
+    unanimous = (X[:, :3].sum(axis=1) == 3) | (X[:, :3].sum(axis=1) == 0)
+    assert predictions.loc[unanimous, 'm3_pred'].isna().all()
+    assert predictions.loc[~unanimous, 'm4_pred'].notna().any()
+    assert models['m0'].rows_seen == len(X)
+    assert models['m3'].rows_seen == int((~unanimous).sum())
+
+    output = cascade.assign(scored_by='ensemble')
+    skipped = int(predictions[[f'{n}_pred' for n in names]].isna().to_numpy().sum())
+    assert scan.count_skipped_evaluations(output, names) == skipped
+
+
+def test_student_rows_are_not_counted_as_cascade_skips():
+    output = pd.DataFrame({
+        'votes_benign': [0, 0, 1],
+        'votes_malware': [0, 0, 2],
+        'scored_by': ['student', 'student', 'ensemble'],
+    })
+    assert len(scan.ensemble_scored(output)) == 1
+    assert scan.count_skipped_evaluations(output, ['a', 'b', 'c', 'd', 'e']) == 2
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """Five one-feature 'PE files' and an extractor that reads them without pefile."""
+    input_dir = tmp_path / 'samples'
+    input_dir.mkdir()
+    for i, value in enumerate([0.1, 0.9, 0.4, 0.8, 0.7]):
+        (input_dir / f'sample{i}.exe').write_text(str(value))
+    calls = []
+
+    def fake_rows(paths, model_cols, workers=1, start_index=0):
+        calls.append(start_index)
+        return [pd.Series({'f0': float(p.read_text()), 'sha256': f'{idx:064d}', 'sample_index': idx,
+                           'sample_name': p.name, 'sample_path': str(p)})
+                for idx, p in enumerate(paths, start=start_index)]
+
+    monkeypatch.setattr(scan, 'extract_feature_rows', fake_rows)
+    return input_dir, calls
+
+
+class ColumnStudent:
+    """A student whose malware score is the first feature."""
+
+    def predict(self, X):
+        return np.asarray(X[:, 0], dtype=float)
+
+
+def _scan(input_dir, output_path, resume=False, recursive=False, student=None, student_margin=0.0):
+    names = ['low', 'mid', 'high']
+    models = {'low': ColumnVoter(0, 0.3), 'mid': ColumnVoter(0, 0.5), 'high': ColumnVoter(0, 0.75)}
+    return scan.scan_streaming(input_dir, output_path, ['f0'], names, None, models,
+                               chunk_size=2, recursive=recursive, resume=resume,
+                               student=student, student_margin=student_margin)
+
+
+def test_resume_truncates_the_half_written_chunk(corpus, tmp_path, monkeypatch):
+    input_dir, calls = corpus
+    reference = tmp_path / 'reference.csv'
+    _scan(input_dir, reference)
+    expected = reference.read_bytes()
+
+    output = tmp_path / 'resumed.csv'
+    extract = scan.extract_feature_rows
+
+    def crash_on_last_chunk(paths, model_cols, workers=1, start_index=0):
+        if start_index == 4:
+            raise KeyboardInterrupt
+        return extract(paths, model_cols, workers, start_index)
+
+    monkeypatch.setattr(scan, 'extract_feature_rows', crash_on_last_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        _scan(input_dir, output)
+    with open(output, 'ab') as fh:
+        fh.write(b'4,sample4.exe,partial')  # a chunk cut off mid-write
+    checkpoint = scan._checkpoint_path(output)
+    assert json.loads(checkpoint.read_text())['files_done'] == 4
+
+    monkeypatch.setattr(scan, 'extract_feature_rows', extract)
+    calls.clear()
+    _scan(input_dir, output, resume=True)
+    assert calls == [4]
+    assert output.read_bytes() == expected
+    assert not checkpoint.exists()
+
+
+def test_resume_rejects_a_different_scan(corpus, tmp_path):
+    input_dir, _ = corpus
+    output = tmp_path / 'out.csv'
+    checkpoint = scan._checkpoint_path(output)
+    checkpoint.write_text(json.dumps({'input_dir': str(input_dir), 'recursive': False,
+                                      'models': ['low', 'mid', 'high'], 'files_done': 2}))
+    with pytest.raises(ValueError):
+        _scan(input_dir, output, resume=True, recursive=True)
+
+
+@pytest.mark.parametrize('first, second', [
+    ({}, {'student': ColumnStudent()}),
+    ({'student': ColumnStudent()}, {}),
+    ({'student': ColumnStudent()}, {'student': ColumnStudent(), 'student_margin': 0.1}),
+])
+def test_resume_rejects_different_fast_settings(corpus, tmp_path, monkeypatch, first, second):
+    input_dir, _ = corpus
+    output = tmp_path / 'out.csv'
+    extract = scan.extract_feature_rows
+
+    def crash_on_last_chunk(paths, model_cols, workers=1, start_index=0):
+        if start_index == 4:
+            raise KeyboardInterrupt
+        return extract(paths, model_cols, workers, start_index)
+
+    monkeypatch.setattr(scan, 'extract_feature_rows', crash_on_last_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        _scan(input_dir, output, **first)
+    monkeypatch.setattr(scan, 'extract_feature_rows', extract)
+    with pytest.raises(ValueError):
+        _scan(input_dir, output, resume=True, **second)
+    _scan(input_dir, output, resume=True, **first)
+    assert len(pd.read_csv(output)) == 5
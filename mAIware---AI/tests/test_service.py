@@ -0,0 +1,43 @@
+"""The JSON-lines scoring service of predict_single.py."""
+from __future__ import annotations
+
+import io
+import json
+
+import predict_single
+from predict_single import ScoringState, serve_lines
+
+CFG_KEY = 'a' * 64
+
+
+def _serve(lines, state=None):
+    state = state or ScoringState(model_cols=[], models={}, cache=None)
+    out = io.StringIO()
+    serve_lines(iter(lines), out, state)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_malformed_requests_get_errors_and_the_service_keeps_serving(tmp_path):
+    responses = _serve([
+        '{"id": 1, "path": 5}',
+        json.dumps({'id': 2, 'cfg': CFG_KEY, 'wait': 'soon'}),
+        'not json',
+        json.dumps({'id': 3, 'path': str(tmp_path / 'missing.exe')}),
+    ])
+    assert [r.get('id') for r in responses] == [1, 2, None, 3]
+    assert all('error' in r for r in responses)
+    assert responses[3]['error'] == 'File not found'
+
+
+def test_a_failing_request_is_answered_with_its_error(tmp_path, monkeypatch):
+    sample = tmp_path / 'sample.exe'
+    sample.write_bytes(b'MZ')
+
+    def explode(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(predict_single, 'predict_single_file', explode)
+    responses = _serve([json.dumps({'id': 'a', 'path': str(sample)}),
+                        json.dumps({'id': 'b', 'path': 7})])
+    assert responses == [{'id': 'a', 'error': 'boom'},
+                         {'id': 'b', 'error': 'Invalid path: expected a string'}]
@@ -0,0 +1,42 @@
+"""The persistent verdict cache."""
+from __future__ import annotations
+
+from verdict_cache import VerdictCache, ensemble_fingerprint
+
+SHA_A = 'a' * 64
+
+
+def test_verdict_cache_round_trip(tmp_path):
+    path = tmp_path / 'verdicts.sqlite3'
+    cache = VerdictCache('fp1', path)
+    assert cache.get(SHA_A) is None
+    cache.put(SHA_A, {'label': 'malware', 'confidence': 0.9})
+    assert cache.get(SHA_A) == {'label': 'malware', 'confidence': 0.9}
+    cache.close()
+    assert VerdictCache('fp1', path).get(SHA_A) == {'label': 'malware', 'confidence': 0.9}
+
+
+def test_verdict_cache_drops_verdicts_of_other_fingerprints(tmp_path):
+    path = tmp_path / 'verdicts.sqlite3'
+    VerdictCache('fp1', path).put(SHA_A, {'label': 'benign'})
+    assert VerdictCache('fp2', path).get(SHA_A) is None
+    assert VerdictCache('fp1', path).get(SHA_A) is None
+
+
+def test_fingerprint_follows_model_files(tmp_path):
+    columns = tmp_path / 'model_columns.json'
+    columns.write_text('["f0"]')
+    model = tmp_path / 'log_reg.joblib'
+    model.write_bytes(b'one')
+    before = ensemble_fingerprint(['log_reg'], tmp_path, columns)
+    assert ensemble_fingerprint(['log_reg'], tmp_path, columns) == before
+    model.write_bytes(b'retrained')
+    assert ensemble_fingerprint(['log_reg'], tmp_path, columns) != before
+
+
+def test_verdict_cache_modes_do_not_evict_each_other(tmp_path):
+    path = tmp_path / 'verdicts.sqlite3'
+    VerdictCache('ensemble', path, mode='full').put(SHA_A, {'label': 'malware'})
+    VerdictCache('student', path, mode='fast').put(SHA_A, {'label': 'benign'})
+    assert VerdictCache('ensemble', path, mode='full').get(SHA_A) == {'label': 'malware'}
+    assert VerdictCache('student', path, mode='fast').get(SHA_A) == {'label': 'benign'}
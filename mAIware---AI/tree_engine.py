@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Compile fitted tree models into flat NumPy arrays for low-latency scoring.
+
+sklearn's predict_proba spends most of a one-row call on input validation
+and per-tree dispatch. The compiled form stores every node of every tree in
+a few flat arrays and walks all trees for all rows at once, reproducing
+sklearn's probabilities bit for bit::
+
+    python tree_engine.py            # compile and verify the tree models
+    python ensemble_predict_dir.py samples/ --backend compiled
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import joblib
+import numpy as np
+from scipy.special import expit
+from sklearn.utils.extmath import softmax
+
+from ensemble_pipeline.common import predict_with_scores
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_MODELS_DIR = ROOT / 'ensemble_models'
+COMPILED_SUFFIX = '.compiled.npz'
+COMPILABLE_MODELS = ['decision_tree', 'random_forest', 'extra_trees', 'gradient_boosting', 'ada_boost']
+# Rows walked per traversal pass; bounds the (rows x trees) working arrays.
+_ROW_BLOCK = 2048
+# Above this many rows sklearn's compiled loops beat the vectorized walk (the
+# per-call overhead it saves is amortized), so batches go to the fallback model.
+COMPILED_MAX_ROWS = 64
+
+
+def compiled_path(models_dir: Path, name: str) -> Path:
+    return models_dir / f'{name}{COMPILED_SUFFIX}'
+
+
+def _source_stamp(model_path: Path) -> List[int]:
+    stat = model_path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _flatten_trees(trees: Sequence[object], leaf_values: Sequence[np.ndarray]) -> Dict[str, np.ndarray]:
+    """Concatenate sklearn ``Tree`` objects into one node table.
+
+    Leaves point to themselves with an infinite threshold, so a fixed number
+    of traversal steps leaves every row parked on its leaf.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree, leaf_value in zip(trees, leaf_values):
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        own = np.arange(offset, offset + n, dtype=np.int32)
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, own, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, own, tree.children_right + offset).astype(np.int32))
+        values.append(leaf_value)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.int64(max_depth),
+    }
+
+
+def compile_model(model: object) -> Tuple[str, Dict[str, np.ndarray], dict]:
+    """Return ``(kind, arrays, meta)`` for a supported binary tree model."""
+    kind = type(model).__name__
+    classes = np.asarray(model.classes_)
+    if len(classes) != 2:
+        raise ValueError(f'{kind}: only binary classifiers can be compiled')
+    meta: dict = {'kind': kind, 'classes': classes.tolist()}
+
+    if kind == 'DecisionTreeClassifier':
+        trees = [model.tree_]
+    elif kind in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        trees = [est.tree_ for est in model.estimators_]
+    elif kind == 'GradientBoostingClassifier':
+        if model.init_ == 'zero':
+            meta['baseline'] = 0.0
+        elif type(model.init_).__name__ == 'DummyClassifier':
+            # A prior-only init estimator gives the same raw score for every row.
+            meta['baseline'] = float(model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0])
+        else:
+            raise ValueError(f'{kind}: unsupported init estimator {model.init_!r}')
+        trees = [est.tree_ for est in model.estimators_[:, 0]]
+        # predict_stages adds learning_rate * value, computed in double.
+        values = [model.learning_rate * tree.value[:, 0, 0] for tree in trees]
+        return kind, _flatten_trees(trees, values), meta
+    elif kind == 'AdaBoostClassifier':
+        trees = [est.tree_ for est in model.estimators_]
+        weights = model.estimator_weights_[:len(trees)]
+        meta['weight_sum'] = float(model.estimator_weights_.sum())
+        # Each stage votes +w for classes_[1] and -w for classes_[0].
+        values = []
+        for est, tree, w in zip(model.estimators_, trees, weights):
+            leaf_class = est.classes_.take(np.argmax(tree.value[:, 0, :], axis=1))
+            values.append(np.where(leaf_class == classes[1], w, -w))
+        return kind, _flatten_trees(trees, values), meta
+    else:
+        raise ValueError(f'{kind} is not a supported tree model')
+
+    values = [tree.value[:, 0, :2] for tree in trees]
+    return kind, _flatten_trees(trees, values), meta
+
+
+class CompiledTrees:
+    """Flat-array form of a tree classifier with sklearn's binary predict API.
+
+    ``fallback`` may hold the original estimator; batches larger than
+    ``COMPILED_MAX_ROWS`` are then scored by it instead.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: dict):
+        self.kind: str = meta['kind']
+        self.meta = meta
+        self.classes_ = np.asarray(meta['classes'])
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.fallback: object | None = None
+
+    @classmethod
+    def from_model(cls, model: object) -> 'CompiledTrees':
+        _, arrays, meta = compile_model(model)
+        return cls(arrays, meta)
+
+    @classmethod
+    def load(cls, path: Path) -> 'CompiledTrees':
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files if key != 'meta'}
+            meta = json.loads(str(data['meta']))
+        return cls(arrays, meta)
+
+    def save(self, path: Path, source: Path | None = None) -> None:
+        meta = dict(self.meta)
+        if source is not None:
+            meta['source'] = _source_stamp(source)
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots, max_depth=np.int64(self.max_depth),
+            meta=np.asarray(json.dumps(meta)),
+        )
+
+    def _leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf value reached in every tree, shape (rows, trees[, classes])."""
+        # Trees compare float32 features against float64 thresholds.
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.roots.size))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def _scores_block(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        leaves = self._leaf_values(X)
+        # cumsum adds left to right like sklearn's per-tree accumulation;
+        # np.sum's pairwise summation could differ in the last bit.
+        if self.kind in ('DecisionTreeClassifier', 'RandomForestClassifier', 'ExtraTreesClassifier'):
+            proba = np.cumsum(leaves, axis=1)[:, -1, :] / leaves.shape[1]
+            return self.classes_.take(np.argmax(proba, axis=1), axis=0), proba[:, 1]
+        if self.kind == 'GradientBoostingClassifier':
+            baseline = np.full((leaves.shape[0], 1), self.meta['baseline'])
+            raw = np.cumsum(np.hstack([baseline, leaves]), axis=1)[:, -1]
+            return self.classes_[(raw >= 0).astype(int)], expit(raw)
+        # AdaBoostClassifier (SAMME)
+        half = np.cumsum(leaves, axis=1)[:, -1] / self.meta['weight_sum']
+        decision = half + half
+        proba = softmax(np.vstack([-decision, decision]).T / 2, copy=False)
+        return self.classes_.take(decision > 0, axis=0), proba[:, 1]
+
+    def predict_with_scores(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        X = np.asarray(X)
+        if self.fallback is not None and X.shape[0] > COMPILED_MAX_ROWS:
+            return predict_with_scores(self.fallback, X)
+        if X.shape[0] <= _ROW_BLOCK:
+            return self._scores_block(X)
+        parts = [self._scores_block(X[i:i + _ROW_BLOCK]) for i in range(0, X.shape[0], _ROW_BLOCK)]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.predict_with_scores(X)[0]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        scores = self.predict_with_scores(X)[1]
+        return np.column_stack([1.0 - scores, scores])
+
+
+def load_compiled(models_dir: Path, name: str) -> CompiledTrees | None:
+    """Load ``name``'s compiled form if it exists and matches the current .joblib."""
+    path = compiled_path(models_dir, name)
+    if not path.exists():
+        return None
+    compiled = CompiledTrees.load(path)
+    source = models_dir / f'{name}.joblib'
+    if source.exists() and compiled.meta.get('source') != _source_stamp(source):
+        print(f'[!] Warning: {path.name} is older than {source.name}; using the sklearn model. '
+              'Rerun tree_engine.py to recompile.')
+        return None
+    return compiled
+
+
+def verify(model: object, compiled: CompiledTrees, X: np.ndarray) -> bool:
+    labels, scores = predict_with_scores(model, X)
+    fast_labels, fast_scores = compiled.predict_with_scores(X)
+    return np.array_equal(labels, fast_labels) and np.array_equal(scores, fast_scores)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Compile tree models into flat arrays for fast inference.')
+    parser.add_argument('--models-dir', type=Path, default=DEFAULT_MODELS_DIR, help='Directory holding trained ensemble models')
+    parser.add_argument('--models', nargs='*', default=COMPILABLE_MODELS, help='Tree models to compile')
+    parser.add_argument('--skip-verify', action='store_true',
+                        help='Do not check the compiled models against sklearn on the test split')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    X_check = None
+    if not args.skip_verify:
+        from ensemble_pipeline.common import load_dataset
+
+        X_train, _, X_test, _, _ = load_dataset()
+        X_check = np.vstack([X_train, X_test])
+
+    for name in args.models:
+        model_path = args.models_dir / f'{name}.joblib'
+        if not model_path.exists():
+            raise FileNotFoundError(f'Missing model file: {model_path}')
+        model = joblib.load(model_path)
+        compiled = CompiledTrees.from_model(model)
+        if X_check is not None and not verify(model, compiled, X_check):
+            raise RuntimeError(f'Compiled {name} does not reproduce sklearn\'s predictions')
+        out_path = compiled_path(args.models_dir, name)
+        compiled.save(out_path, source=model_path)
+        print(f'[+] Compiled {name}: {compiled.roots.size} trees, {compiled.feature.size} nodes -> {out_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Persistent verdict cache keyed by file SHA-256 and ensemble fingerprint."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Sequence
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CACHE_PATH = ROOT / 'tmp_verdict_cache.sqlite3'
+
+
+def ensemble_fingerprint(model_names: Sequence[str], models_dir: Path, model_columns_path: Path) -> str:
+    """Identify the scoring setup a verdict was produced with.
+
+    Covers the contents of ``model_columns.json`` and the name, size and
+    modification time of every model file, so retraining or swapping a
+    model changes the fingerprint without hashing large .joblib files.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(model_columns_path.read_bytes())
+    for name in sorted(model_names):
+        model_path = models_dir / f'{name}.joblib'
+        try:
+            stat = model_path.stat()
+            hasher.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+        except OSError:
+            hasher.update(f'{name}:missing\n'.encode())
+    return hasher.hexdigest()
+
+
+class VerdictCache:
+    """SQLite store of result JSON, one row per (sha256, fingerprint).
+
+    Rows of the same ``mode`` written under any other fingerprint are
+    dropped when the cache is opened, so a model update invalidates old
+    verdicts automatically. Scoring modes with different fingerprints (the
+    full ensemble and the ``--fast`` student path) share the file without
+    evicting each other. The connection is reopened in forked children,
+    which must not share it.
+    """
+
+    def __init__(self, fingerprint: str, path: Path = DEFAULT_CACHE_PATH, mode: str = 'full'):
+        self.fingerprint = fingerprint
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._pid = -1
+        self._conn: sqlite3.Connection | None = None
+        conn = self._connection()
+        with self._lock, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS verdicts ('
+                ' sha256 TEXT NOT NULL,'
+                ' fingerprint TEXT NOT NULL,'
+                ' result TEXT NOT NULL,'
+                ' created REAL NOT NULL,'
+                " mode TEXT NOT NULL DEFAULT 'full',"
+                ' PRIMARY KEY (sha256, fingerprint))'
+            )
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(verdicts)')}
+            if 'mode' not in columns:  # cache files from before modes existed
+                conn.execute("ALTER TABLE verdicts ADD COLUMN mode TEXT NOT NULL DEFAULT 'full'")
+            conn.execute('DELETE FROM verdicts WHERE mode = ? AND fingerprint != ?', (mode, fingerprint))
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, sha256: str) -> dict | None:
+        conn = self._connection()
+        with self._lock:
+            row = conn.execute(
+                'SELECT result FROM verdicts WHERE sha256 = ? AND fingerprint = ?',
+                (sha256, self.fingerprint),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, sha256: str, result: dict) -> None:
+        conn = self._connection()
+        with self._lock, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO verdicts (sha256, fingerprint, result, created, mode) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (sha256, self.fingerprint, json.dumps(result), time.time(), self.mode),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None